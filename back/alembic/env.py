@@ -29,6 +29,9 @@ from src.consultas import models as consultas_models
 from src.faturacao import models as faturacao_models
 from src.caixa import models as caixa_models
 from src.mensagens import models as mensagens_models
+from src.email import models as email_models
+from src.scheduler import models as scheduler_models
+from src.pdf import models as pdf_models
 
 # Carrega a config do .ini
 config = context.config
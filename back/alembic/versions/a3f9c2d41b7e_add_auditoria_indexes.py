@@ -0,0 +1,32 @@
+"""add composite indexes to Auditoria
+
+Revision ID: a3f9c2d41b7e
+Revises: 728213e8bb5b
+Create Date: 2026-10-18 00:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a3f9c2d41b7e'
+down_revision: Union[str, None] = '728213e8bb5b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_auditoria_clinica_data', 'Auditoria', ['clinica_id', 'data'], unique=False)
+    op.create_index('ix_auditoria_clinica_objeto_acao_data', 'Auditoria', ['clinica_id', 'objeto', 'acao', 'data'], unique=False)
+    op.create_index('ix_auditoria_utilizador_data', 'Auditoria', ['utilizador_id', 'data'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_auditoria_utilizador_data', table_name='Auditoria')
+    op.drop_index('ix_auditoria_clinica_objeto_acao_data', table_name='Auditoria')
+    op.drop_index('ix_auditoria_clinica_data', table_name='Auditoria')
@@ -0,0 +1,44 @@
+"""add ExecucaoJob (histórico e coordenação dos jobs do scheduler)
+
+Revision ID: a9d4e2b7c1f8
+Revises: f3c8a1d6b9e2
+Create Date: 2026-10-18 05:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a9d4e2b7c1f8'
+down_revision: Union[str, None] = 'f3c8a1d6b9e2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('ExecucaoJob',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('job_id', sa.String(length=100), nullable=False),
+    sa.Column('agendado_para', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('iniciado_em', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('terminado_em', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('duracao_ms', sa.Integer(), nullable=True),
+    sa.Column('estado', sa.String(length=20), nullable=False),
+    sa.Column('erro', sa.Text(), nullable=True),
+    sa.Column('instancia', sa.String(length=100), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('job_id', 'agendado_para', name='uq_execucaojob_job_agendado')
+    )
+    op.create_index(op.f('ix_ExecucaoJob_id'), 'ExecucaoJob', ['id'], unique=False)
+    op.create_index('ix_execucaojob_job_inicio', 'ExecucaoJob', ['job_id', 'iniciado_em'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_execucaojob_job_inicio', table_name='ExecucaoJob')
+    op.drop_index(op.f('ix_ExecucaoJob_id'), table_name='ExecucaoJob')
+    op.drop_table('ExecucaoJob')
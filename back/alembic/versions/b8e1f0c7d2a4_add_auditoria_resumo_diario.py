@@ -0,0 +1,50 @@
+"""add AuditoriaResumoDiario rollup table
+
+Revision ID: b8e1f0c7d2a4
+Revises: a3f9c2d41b7e
+Create Date: 2026-10-18 00:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8e1f0c7d2a4'
+down_revision: Union[str, None] = 'a3f9c2d41b7e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'AuditoriaResumoDiario',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('clinica_id', sa.Integer(), nullable=False),
+        sa.Column('dia', sa.Date(), nullable=False),
+        sa.Column('objeto', sa.String(length=100), nullable=False),
+        sa.Column('acao', sa.String(length=100), nullable=False),
+        sa.Column('utilizador_id', sa.Integer(), nullable=True),
+        sa.Column('total', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['clinica_id'], ['Clinica.id'], ),
+        sa.ForeignKeyConstraint(['utilizador_id'], ['Utilizador.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_auditoria_resumo_dia_clinica', 'AuditoriaResumoDiario', ['dia', 'clinica_id'], unique=False)
+    # Chave do resumo: (clinica_id, dia, objeto, acao, utilizador_id), com NULL = 0
+    op.create_index(
+        'uq_auditoria_resumo_chave',
+        'AuditoriaResumoDiario',
+        ['clinica_id', 'dia', 'objeto', 'acao', sa.text('COALESCE(utilizador_id, 0)')],
+        unique=True,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('uq_auditoria_resumo_chave', table_name='AuditoriaResumoDiario')
+    op.drop_index('ix_auditoria_resumo_dia_clinica', table_name='AuditoriaResumoDiario')
+    op.drop_table('AuditoriaResumoDiario')
@@ -0,0 +1,103 @@
+"""add ItemStockSaldo materialized stock balance
+
+Revision ID: c4d2e9a1f7b3
+Revises: b8e1f0c7d2a4
+Create Date: 2026-10-18 01:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4d2e9a1f7b3'
+down_revision: Union[str, None] = 'b8e1f0c7d2a4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+BACKFILL = """
+INSERT INTO "ItemStockSaldo" (item_id, clinica_id, quantidade, atualizado_em)
+SELECT i.id, i.clinica_id, COALESCE(SUM(il.quantidade), 0), now()
+FROM   "ItemStock" i
+LEFT   JOIN "ItemLote" il ON il.item_id = i.id
+GROUP  BY i.id, i.clinica_id;
+"""
+
+# Stock crítico passa a ler o saldo materializado em vez de somar todo o
+# histórico de MovimentoStock a cada pedido
+VIEW_STOCK_CRITICAL = """
+CREATE OR REPLACE VIEW vw_stock_critical AS
+SELECT
+    i.id,
+    i.nome,
+    COALESCE(s.quantidade, 0) AS quantidade_atual,
+    i.quantidade_minima,
+    MIN(il.validade) FILTER (WHERE il.quantidade > 0) AS validade_proxima
+FROM       "ItemStock" i
+LEFT JOIN  "ItemStockSaldo" s ON s.item_id = i.id
+LEFT JOIN  "ItemLote" il ON il.item_id = i.id
+GROUP BY i.id, i.nome, s.quantidade, i.quantidade_minima
+HAVING COALESCE(s.quantidade, 0) < i.quantidade_minima
+   OR  MIN(il.validade) FILTER (WHERE il.quantidade > 0)
+       <= CURRENT_DATE + INTERVAL '30 day';
+"""
+
+VIEW_STOCK_CRITICAL_ANTIGA = """
+CREATE OR REPLACE VIEW vw_stock_critical AS
+WITH saldo AS (
+    SELECT
+        i.id,
+        SUM(
+            CASE
+                WHEN ms.tipo_movimento ILIKE ANY (ARRAY['entrada','ajuste_pos','devolucao'])
+                     THEN  ms.quantidade
+                ELSE - ms.quantidade
+            END
+        ) AS quantidade_atual
+    FROM   "ItemStock" i
+    LEFT   JOIN "MovimentoStock" ms ON ms.item_id = i.id
+    GROUP  BY i.id
+)
+SELECT
+    i.id,
+    i.nome,
+    s.quantidade_atual,
+    i.quantidade_minima,
+    MIN(il.validade) FILTER (WHERE il.quantidade > 0) AS validade_proxima
+FROM       "ItemStock" i
+JOIN       saldo s  ON s.id = i.id
+LEFT JOIN  "ItemLote" il ON il.item_id = i.id
+GROUP BY i.id, i.nome, s.quantidade_atual, i.quantidade_minima
+HAVING s.quantidade_atual < i.quantidade_minima
+   OR  MIN(il.validade) FILTER (WHERE il.quantidade > 0)
+       <= CURRENT_DATE + INTERVAL '30 day';
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'ItemStockSaldo',
+        sa.Column('item_id', sa.Integer(), nullable=False),
+        sa.Column('clinica_id', sa.Integer(), nullable=True),
+        sa.Column('quantidade', sa.Integer(), nullable=False),
+        sa.Column('atualizado_em', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['item_id'], ['ItemStock.id'], ),
+        sa.ForeignKeyConstraint(['clinica_id'], ['Clinica.id'], ),
+        sa.PrimaryKeyConstraint('item_id')
+    )
+    op.create_index(op.f('ix_ItemStockSaldo_clinica_id'), 'ItemStockSaldo', ['clinica_id'], unique=False)
+    op.execute(BACKFILL)
+    op.execute("DROP VIEW IF EXISTS vw_stock_critical;")
+    op.execute(VIEW_STOCK_CRITICAL)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP VIEW IF EXISTS vw_stock_critical;")
+    op.execute(VIEW_STOCK_CRITICAL_ANTIGA)
+    op.drop_index(op.f('ix_ItemStockSaldo_clinica_id'), table_name='ItemStockSaldo')
+    op.drop_table('ItemStockSaldo')
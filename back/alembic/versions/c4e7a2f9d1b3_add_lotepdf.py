@@ -0,0 +1,43 @@
+"""add LotePdf (estado partilhado das exportações de PDFs em ZIP)
+
+Revision ID: c4e7a2f9d1b3
+Revises: a9d4e2b7c1f8
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4e7a2f9d1b3'
+down_revision: Union[str, None] = 'a9d4e2b7c1f8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('LotePdf',
+    sa.Column('id', sa.String(length=32), nullable=False),
+    sa.Column('tipo', sa.String(length=20), nullable=False),
+    sa.Column('ids', sa.JSON(), nullable=False),
+    sa.Column('estado', sa.String(length=20), nullable=False),
+    sa.Column('concluidos', sa.Integer(), nullable=False),
+    sa.Column('falhados', sa.JSON(), nullable=False),
+    sa.Column('erro', sa.Text(), nullable=True),
+    sa.Column('instancia', sa.String(length=100), nullable=True),
+    sa.Column('criado_em', sa.DateTime(), nullable=False),
+    sa.Column('atualizado_em', sa.DateTime(), nullable=False),
+    sa.Column('concluido_em', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_lotepdf_criado_em', 'LotePdf', ['criado_em'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_lotepdf_criado_em', table_name='LotePdf')
+    op.drop_table('LotePdf')
@@ -0,0 +1,48 @@
+"""add unique (item_id, lote, validade) to ItemLote
+
+Revision ID: d7a3b5c8e2f1
+Revises: c4d2e9a1f7b3
+Create Date: 2026-10-18 01:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd7a3b5c8e2f1'
+down_revision: Union[str, None] = 'c4d2e9a1f7b3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Junta lotes repetidos (mesmo item, lote e validade) na linha mais antiga
+MERGE_DUPLICADOS = """
+UPDATE "ItemLote" il
+SET    quantidade = d.total
+FROM  (SELECT MIN(id) AS id, SUM(quantidade) AS total
+       FROM   "ItemLote"
+       GROUP  BY item_id, lote, validade
+       HAVING COUNT(*) > 1) d
+WHERE  il.id = d.id;
+
+DELETE FROM "ItemLote" il
+USING  "ItemLote" o
+WHERE  il.item_id = o.item_id
+  AND  il.lote = o.lote
+  AND  il.validade = o.validade
+  AND  il.id > o.id;
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(MERGE_DUPLICADOS)
+    op.create_unique_constraint('uq_itemlote_item_lote_validade', 'ItemLote', ['item_id', 'lote', 'validade'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('uq_itemlote_item_lote_validade', 'ItemLote', type_='unique')
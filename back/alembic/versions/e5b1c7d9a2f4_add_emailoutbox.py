@@ -0,0 +1,51 @@
+"""add EmailOutbox (fila persistente de e-mails)
+
+Revision ID: e5b1c7d9a2f4
+Revises: d7a3b5c8e2f1
+Create Date: 2026-10-18 03:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5b1c7d9a2f4'
+down_revision: Union[str, None] = 'd7a3b5c8e2f1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('EmailOutbox',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('clinica_id', sa.Integer(), nullable=False),
+    sa.Column('tipo', sa.String(length=30), nullable=False),
+    sa.Column('parametros', sa.JSON(), nullable=False),
+    sa.Column('estado', sa.String(length=20), nullable=False),
+    sa.Column('tentativas', sa.Integer(), nullable=False),
+    sa.Column('max_tentativas', sa.Integer(), nullable=False),
+    sa.Column('proxima_tentativa_em', sa.DateTime(), nullable=False),
+    sa.Column('bloqueado_ate', sa.DateTime(), nullable=True),
+    sa.Column('ultimo_erro', sa.Text(), nullable=True),
+    sa.Column('criado_por_id', sa.Integer(), nullable=True),
+    sa.Column('criado_em', sa.DateTime(), nullable=False),
+    sa.Column('enviado_em', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['clinica_id'], ['Clinica.id'], ),
+    sa.ForeignKeyConstraint(['criado_por_id'], ['Utilizador.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_EmailOutbox_id'), 'EmailOutbox', ['id'], unique=False)
+    op.create_index(op.f('ix_EmailOutbox_clinica_id'), 'EmailOutbox', ['clinica_id'], unique=False)
+    op.create_index('ix_emailoutbox_estado_proxima', 'EmailOutbox', ['estado', 'proxima_tentativa_em'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_emailoutbox_estado_proxima', table_name='EmailOutbox')
+    op.drop_index(op.f('ix_EmailOutbox_clinica_id'), table_name='EmailOutbox')
+    op.drop_index(op.f('ix_EmailOutbox_id'), table_name='EmailOutbox')
+    op.drop_table('EmailOutbox')
@@ -0,0 +1,42 @@
+"""add LembreteMarcacao e índice (estado, data_hora_inicio) em Marcacoes
+
+Revision ID: f3c8a1d6b9e2
+Revises: e5b1c7d9a2f4
+Create Date: 2026-10-18 04:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3c8a1d6b9e2'
+down_revision: Union[str, None] = 'e5b1c7d9a2f4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('LembreteMarcacao',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('marcacao_id', sa.Integer(), nullable=False),
+    sa.Column('data_hora_inicio', sa.DateTime(timezone=True), nullable=False),
+    sa.Column('tentativas', sa.Integer(), nullable=False),
+    sa.Column('enviado_em', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('ultimo_erro', sa.Text(), nullable=True),
+    sa.ForeignKeyConstraint(['marcacao_id'], ['Marcacoes.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('marcacao_id', 'data_hora_inicio', name='uq_lembrete_marcacao_inicio')
+    )
+    op.create_index(op.f('ix_LembreteMarcacao_id'), 'LembreteMarcacao', ['id'], unique=False)
+    op.create_index('ix_marcacoes_estado_inicio', 'Marcacoes', ['estado', 'data_hora_inicio'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_marcacoes_estado_inicio', table_name='Marcacoes')
+    op.drop_index(op.f('ix_LembreteMarcacao_id'), table_name='LembreteMarcacao')
+    op.drop_table('LembreteMarcacao')
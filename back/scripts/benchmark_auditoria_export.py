@@ -0,0 +1,86 @@
+"""
+Benchmark de memória da exportação de auditoria (Excel e CSV).
+
+Exporta todas as linhas de uma clínica (export_all=True) e mede o pico de
+memória Python (tracemalloc) e o RSS máximo do processo. Com a exportação
+em streaming (yield_per + openpyxl write-only) o pico deve manter-se
+praticamente constante com o número de linhas.
+
+Usa as mesmas linhas de teste de benchmark_daily_activity (detalhes='benchmark'),
+que podem ser removidas com --cleanup.
+
+Uso (a partir de back/, contra uma base de dados de desenvolvimento):
+    python -m scripts.benchmark_auditoria_export --seed 500000 --clinica-id 1
+    python -m scripts.benchmark_auditoria_export --formato csv
+    python -m scripts.benchmark_auditoria_export --cleanup
+"""
+
+import argparse
+import resource
+import time
+import tracemalloc
+
+from src.database import SessionLocal
+from src.auditoria.models import Auditoria
+from src.auditoria import service
+from scripts.benchmark_daily_activity import MARCA, seed
+
+
+def exportar_excel(db, clinica_id: int) -> int:
+    ficheiro = service.export_auditoria_excel(db, clinica_id, filters={}, export_all=True)
+    try:
+        ficheiro.seek(0, 2)
+        return ficheiro.tell()
+    finally:
+        ficheiro.close()
+
+
+def exportar_csv(clinica_id: int) -> int:
+    return sum(
+        len(chunk.encode("utf-8"))
+        for chunk in service.export_auditoria_csv(clinica_id, filters={}, export_all=True)
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=0, help="Número de linhas de auditoria a inserir")
+    parser.add_argument("--clinica-id", type=int, default=1)
+    parser.add_argument("--dias", type=int, default=90)
+    parser.add_argument("--formato", choices=["excel", "csv"], default="excel")
+    parser.add_argument("--cleanup", action="store_true", help="Remove as linhas criadas pelo benchmark")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if args.cleanup:
+            db.query(Auditoria).filter(Auditoria.detalhes == MARCA).delete(synchronize_session=False)
+            db.commit()
+            return
+        if args.seed:
+            seed(db, args.seed, args.clinica_id, args.dias)
+
+        linhas = db.query(Auditoria).filter(Auditoria.clinica_id == args.clinica_id).count()
+
+        tracemalloc.start()
+        inicio = time.perf_counter()
+        if args.formato == "excel":
+            tamanho = exportar_excel(db, args.clinica_id)
+        else:
+            tamanho = exportar_csv(args.clinica_id)
+        duracao = time.perf_counter() - inicio
+        _, pico = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        # ru_maxrss vem em KiB no Linux
+        rss_max = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        print(
+            f"{args.formato:<6} linhas={linhas} ficheiro={tamanho / 1024 / 1024:.1f} MiB "
+            f"tempo={duracao:.1f} s pico_python={pico / 1024 / 1024:.1f} MiB rss_max={rss_max:.0f} MiB"
+        )
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Benchmark de contabilidade.get_daily_activity.
+
+Compara a implementação antiga (duas queries agrupadas por dia) com a
+query única agrupada por (dia, objeto, utilizador), medindo o número de
+queries e o tempo total.
+
+As linhas de teste são marcadas com detalhes='benchmark' e podem ser
+removidas com --cleanup.
+
+Uso (a partir de back/, contra uma base de dados de desenvolvimento):
+    python -m scripts.benchmark_daily_activity --seed 1000000 --clinica-id 1 --dias 90
+    python -m scripts.benchmark_daily_activity --cleanup
+"""
+
+import argparse
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import and_, event, func, text
+
+from src.database import SessionLocal, engine
+from src.auditoria.models import Auditoria
+from src.contabilidade import service
+
+# Garantir que todos os modelos referenciados pelas FKs estão registados
+import src.main  # noqa: F401
+
+MARCA = "benchmark"
+OBJETOS = ["Fatura", "Paciente", "Marcacao", "Orçamento", "CashierPayment", "CaixaSession", "Consulta", "ItemStock"]
+ACOES = ["Criação", "Atualização", "Remoção"]
+
+
+def seed(db, linhas: int, clinica_id: int, dias: int) -> None:
+    utilizadores = [uid for (uid,) in db.execute(text('SELECT id FROM "Utilizador" LIMIT 20'))]
+    if not utilizadores:
+        raise SystemExit("É necessário pelo menos um utilizador na base de dados.")
+    db.execute(
+        text(
+            'INSERT INTO "Auditoria" (utilizador_id, clinica_id, acao, objeto, objeto_id, detalhes, data) '
+            "SELECT (:utilizadores)[1 + (g % cardinality(:utilizadores))], :clinica_id, "
+            "(:acoes)[1 + (g % 3)], (:objetos)[1 + (g % 8)], g, :marca, "
+            "now() - (random() * :dias) * interval '1 day' "
+            "FROM generate_series(1, :linhas) AS g"
+        ),
+        {
+            "utilizadores": utilizadores, "clinica_id": clinica_id, "acoes": ACOES,
+            "objetos": OBJETOS, "marca": MARCA, "dias": dias, "linhas": linhas,
+        },
+    )
+    db.execute(text('ANALYZE "Auditoria"'))
+    db.commit()
+
+
+def daily_activity_antigo(db, data_inicio: date, data_fim: date, clinica_id: int) -> None:
+    """Implementação anterior: duas queries agrupadas por cada dia do intervalo."""
+    query = db.query(
+        func.date(Auditoria.data), func.count(Auditoria.id)
+    ).filter(
+        and_(func.date(Auditoria.data) >= data_inicio, func.date(Auditoria.data) <= data_fim),
+        Auditoria.clinica_id == clinica_id,
+    )
+    query.group_by(func.date(Auditoria.data)).all()
+    dia = data_inicio
+    while dia <= data_fim:
+        db.query(Auditoria.objeto, func.count(Auditoria.id)).filter(
+            func.date(Auditoria.data) == dia, Auditoria.clinica_id == clinica_id
+        ).group_by(Auditoria.objeto).all()
+        db.query(Auditoria.utilizador_id, func.count(Auditoria.id)).filter(
+            func.date(Auditoria.data) == dia, Auditoria.clinica_id == clinica_id
+        ).group_by(Auditoria.utilizador_id).all()
+        dia += timedelta(days=1)
+
+
+def medir(nome: str, fn) -> None:
+    queries = 0
+
+    def contar(*_):
+        nonlocal queries
+        queries += 1
+
+    event.listen(engine, "before_cursor_execute", contar)
+    try:
+        inicio = time.perf_counter()
+        fn()
+        duracao = time.perf_counter() - inicio
+    finally:
+        event.remove(engine, "before_cursor_execute", contar)
+    print(f"{nome:<12} queries={queries:<5} tempo={duracao * 1000:.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=0, help="Número de linhas de auditoria a inserir")
+    parser.add_argument("--clinica-id", type=int, default=1)
+    parser.add_argument("--dias", type=int, default=90)
+    parser.add_argument("--cleanup", action="store_true", help="Remove as linhas criadas pelo benchmark")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if args.cleanup:
+            db.query(Auditoria).filter(Auditoria.detalhes == MARCA).delete(synchronize_session=False)
+            db.commit()
+            return
+        if args.seed:
+            seed(db, args.seed, args.clinica_id, args.dias)
+
+        data_fim = date.today()
+        data_inicio = data_fim - timedelta(days=args.dias)
+        medir("antigo", lambda: daily_activity_antigo(db, data_inicio, data_fim, args.clinica_id))
+        medir("agrupado", lambda: service.get_daily_activity(db, data_inicio, data_fim, args.clinica_id))
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Benchmark do pool de ligações.
+
+Simula N utilizadores concorrentes a usar `get_db` (abrir sessão, executar
+uma query, fechar) e reporta a latência p50/p99 para vários tamanhos de pool.
+
+Uso (a partir de back/):
+    python -m scripts.benchmark_db_pool --users 50 --requests 20 --pool-sizes 5,10,20
+"""
+
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from src.core.config import settings
+from src.database import InstrumentedQueuePool, pool_stats
+
+
+def _percentil(valores: list[float], p: float) -> float:
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(p * len(valores)))]
+
+
+def correr(pool_size: int, max_overflow: int, users: int, requests: int, query_ms: int) -> dict:
+    engine = create_engine(
+        settings.database_url,
+        poolclass=InstrumentedQueuePool,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+    )
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    def utilizador() -> list[float]:
+        latencias = []
+        for _ in range(requests):
+            inicio = time.perf_counter()
+            gen = get_db()
+            db = next(gen)
+            try:
+                db.execute(text("SELECT pg_sleep(:s)"), {"s": query_ms / 1000})
+            finally:
+                gen.close()
+            latencias.append((time.perf_counter() - inicio) * 1000)
+        return latencias
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=users) as executor:
+        resultados = list(executor.map(lambda _: utilizador(), range(users)))
+    duracao = time.perf_counter() - inicio
+    engine.dispose()
+
+    latencias = [l for r in resultados for l in r]
+    return {
+        "pool_size": pool_size,
+        "pedidos": len(latencias),
+        "req_s": len(latencias) / duracao,
+        "p50_ms": statistics.median(latencias),
+        "p99_ms": _percentil(latencias, 0.99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50, help="Utilizadores concorrentes")
+    parser.add_argument("--requests", type=int, default=20, help="Pedidos por utilizador")
+    parser.add_argument("--query-ms", type=int, default=10, help="Duração simulada de cada query")
+    parser.add_argument("--pool-sizes", default="5,10,20,40")
+    parser.add_argument("--max-overflow", type=int, default=settings.DB_MAX_OVERFLOW)
+    args = parser.parse_args()
+
+    print(f"{'pool':>6} {'pedidos':>8} {'req/s':>8} {'p50 ms':>9} {'p99 ms':>9}")
+    for pool_size in [int(p) for p in args.pool_sizes.split(",")]:
+        r = correr(pool_size, args.max_overflow, args.users, args.requests, args.query_ms)
+        print(f"{r['pool_size']:>6} {r['pedidos']:>8} {r['req_s']:>8.1f} {r['p50_ms']:>9.1f} {r['p99_ms']:>9.1f}")
+    print(f"timeouts de checkout: {pool_stats.total_timeouts}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Micro-benchmark da renderização dos templates de e-mail (src/email/templates).
+
+Para cada um dos templates mede o tempo por render em três modos:
+  - novo_env:   um Environment + FileSystemLoader por envio (como o
+                EmailService fazia), ou seja, ler e compilar base.html e o
+                template filho em cada mensagem;
+  - bytecode:   Environment novo com o bytecode em cache (ex.: primeiro
+                render num worker acabado de arrancar);
+  - partilhado: o ambiente de src.email.render, já pré-compilado.
+
+Os dados são fictícios (SimpleNamespace); não é preciso base de dados.
+
+Uso (a partir de back/):
+    python -m scripts.benchmark_email_templates
+    python -m scripts.benchmark_email_templates --repeticoes 2000
+"""
+
+import argparse
+import tempfile
+import time
+from datetime import date, datetime
+from types import SimpleNamespace
+
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+
+from src.email import render
+
+
+def dados_exemplo() -> dict:
+    clinica = SimpleNamespace(nome="Clínica Dentária Central", morada="Rua Principal 1, Praia",
+                              email_envio="geral@clinica.cv", telefone="+238 260 00 00")
+    paciente = SimpleNamespace(nome="Maria Silva", email="maria@example.com")
+    medico = SimpleNamespace(nome="Dr. João Santos")
+    marcacao = SimpleNamespace(data_hora_inicio=datetime(2026, 10, 20, 9, 30), observacoes="Trazer exames")
+    base = {"clinica": clinica, "paciente": paciente}
+    return {
+        "alerta_stock.html": {
+            "clinica": clinica,
+            "itens_baixo_stock": [
+                {"nome": f"Luvas M {i}", "quantidade_atual": 3, "quantidade_minima": 10, "tipo_medida": "cx"}
+                for i in range(10)
+            ],
+            "itens_expirando": [
+                {"nome": f"Anestésico {i}", "lote": f"L{i:03d}", "quantidade": 5,
+                 "validade": date(2026, 11, 1), "dias_restantes": 5 + i * 3}
+                for i in range(10)
+            ],
+            "total_alertas": 20,
+        },
+        "consulta_cancelada.html": {**base, "medico": medico, "marcacao": marcacao},
+        "lembrete_consulta.html": {**base, "medico": medico, "marcacao": marcacao},
+        "fatura.html": {**base, "fatura": SimpleNamespace(id=123, data_emissao=date(2026, 10, 1), total=15000)},
+        "orcamento.html": {**base, "orcamento": SimpleNamespace(
+            id=45, data=date(2026, 10, 1), estado=SimpleNamespace(value="aprovado"),
+            observacoes="Inclui radiografia", total_entidade=5000, total_paciente=2500)},
+        "plano.html": {**base, "plano": SimpleNamespace(
+            id=7, data_inicio=date(2026, 9, 1), data_fim=date(2026, 12, 1), estado="em_curso",
+            observacoes=None, total_planejado=42000)},
+        "notificacao_geral.html": {"clinica": clinica, "utilizador": SimpleNamespace(nome="Ana"),
+                                   "assunto": "Reunião", "mensagem": "<p>Reunião às 15h.</p>"},
+    }
+
+
+def novo_env(bytecode_cache=None) -> Environment:
+    env = Environment(loader=FileSystemLoader(str(render.TEMPLATE_DIR)), bytecode_cache=bytecode_cache)
+    env.filters["dt"] = lambda dt: dt.strftime("%d/%m/%Y %H:%M")
+    return env
+
+
+def medir(funcao, repeticoes: int) -> float:
+    """Tempo médio por chamada, em microssegundos."""
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        funcao()
+    return (time.perf_counter() - inicio) / repeticoes * 1e6
+
+
+def main(args) -> None:
+    dados = dados_exemplo()
+    render.precompilar()
+    bytecode = FileSystemBytecodeCache(tempfile.mkdtemp(prefix="bench_email_jinja_"))
+    for nome in dados:
+        novo_env(bytecode).get_template(nome)   # aquecer a cache de bytecode
+
+    print(f"{'template':<26}{'novo_env':>12}{'bytecode':>12}{'partilhado':>12}  (µs/render, {args.repeticoes}x)")
+    totais = [0.0, 0.0, 0.0]
+    for nome, contexto in sorted(dados.items()):
+        tempos = [
+            medir(lambda: novo_env().get_template(nome).render(**contexto), args.repeticoes),
+            medir(lambda: novo_env(bytecode).get_template(nome).render(**contexto), args.repeticoes),
+            medir(lambda: render.renderizar(nome, contexto), args.repeticoes),
+        ]
+        totais = [t + x for t, x in zip(totais, tempos)]
+        print(f"{nome:<26}" + "".join(f"{t:>12.1f}" for t in tempos))
+
+    rotulo = f"total ({len(dados)} templates)"
+    print(f"{rotulo:<26}" + "".join(f"{t:>12.1f}" for t in totais))
+    print(f"ganho do ambiente partilhado: {totais[0] / totais[2]:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeticoes", type=int, default=500)
+    main(parser.parse_args())
@@ -0,0 +1,113 @@
+"""
+Benchmark da renderização de PDFs com 20 pedidos de fatura em simultâneo.
+
+Compara a renderização no próprio worker (WeasyPrint numa thread, como os
+endpoints síncronos faziam) com o pool de processos (src.pdf.executor).
+Para cada modo mede o débito (PDFs/s), a latência por pedido (p50/p99) e o
+atraso máximo do event loop enquanto os PDFs são gerados — o valor que
+determina se os outros pedidos e os websockets ficam bloqueados.
+
+A cache em disco é ignorada: o HTML da fatura é renderizado uma vez e
+convertido em PDF N vezes.
+
+Uso (a partir de back/, contra uma base de dados de desenvolvimento):
+    python -m scripts.benchmark_pdf_render --fatura-id 1
+    python -m scripts.benchmark_pdf_render --fatura-id 1 --pedidos 20 --workers 4
+"""
+
+import argparse
+import asyncio
+import time
+
+from starlette.concurrency import run_in_threadpool
+
+from src.database import SessionLocal
+from src.pdf import service
+from src.pdf.executor import CSS_PADRAO, PdfRenderPool
+
+# Garantir que todos os modelos referenciados pelas FKs estão registados
+import src.main  # noqa: F401
+
+
+def percentil(valores, p: float) -> float:
+    valores = sorted(valores)
+    return valores[min(len(valores) - 1, int(p * len(valores)))]
+
+
+async def medir(nome: str, renderizar, html: str, pedidos: int) -> None:
+    """Lança `pedidos` renderizações em simultâneo e mede o event loop entretanto."""
+    atraso_maximo = 0.0
+    parar = asyncio.Event()
+
+    async def batimento():
+        nonlocal atraso_maximo
+        while not parar.is_set():
+            inicio = time.perf_counter()
+            await asyncio.sleep(0.01)
+            atraso_maximo = max(atraso_maximo, time.perf_counter() - inicio - 0.01)
+
+    async def pedido():
+        inicio = time.perf_counter()
+        pdf = await renderizar(html)
+        return time.perf_counter() - inicio, len(pdf)
+
+    monitor = asyncio.create_task(batimento())
+    inicio = time.perf_counter()
+    resultados = await asyncio.gather(*[pedido() for _ in range(pedidos)])
+    duracao = time.perf_counter() - inicio
+    parar.set()
+    await monitor
+
+    latencias = [r[0] * 1000 for r in resultados]
+    print(
+        f"{nome:<8} {pedidos} PDFs em {duracao:.2f} s  "
+        f"débito={pedidos / duracao:.1f} PDF/s  "
+        f"latência p50={percentil(latencias, 0.50):.0f} ms p99={percentil(latencias, 0.99):.0f} ms  "
+        f"atraso máx. event loop={atraso_maximo * 1000:.0f} ms  "
+        f"tamanho={resultados[0][1] / 1024:.0f} KB"
+    )
+
+
+async def executar(args) -> None:
+    db = SessionLocal()
+    try:
+        context = service._contexto_fatura(args.fatura_id, db)
+    finally:
+        db.close()
+    html = service.render_template("fatura.html", context)
+
+    if args.modo in ("thread", "ambos"):
+        await medir(
+            "thread",
+            lambda h: run_in_threadpool(service.generate_pdf, h, CSS_PADRAO),
+            html,
+            args.pedidos,
+        )
+
+    if args.modo in ("pool", "ambos"):
+        pool = PdfRenderPool(workers=args.workers, max_fila=max(args.pedidos, 1))
+        try:
+            # Aquecimento: arrancar os processos antes de medir
+            await asyncio.gather(*[pool.renderizar(html, CSS_PADRAO) for _ in range(max(args.workers, 1))])
+            await medir("pool", lambda h: pool.renderizar(h, CSS_PADRAO), html, args.pedidos)
+            estado = pool.estado()
+            print(
+                f"         workers={estado['workers']} fila máxima={estado['fila_maxima']} "
+                f"render médio={estado['render_medio_ms']:.0f} ms espera p99={estado['espera_p99_ms']:.0f} ms"
+            )
+        finally:
+            pool.parar()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fatura-id", type=int, required=True)
+    parser.add_argument("--pedidos", type=int, default=20, help="Pedidos em simultâneo")
+    parser.add_argument("--workers", type=int, default=2, help="Processos do pool")
+    parser.add_argument("--modo", choices=["thread", "pool", "ambos"], default="ambos")
+    args = parser.parse_args()
+    asyncio.run(executar(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Reconciliação dos saldos de stock materializados (ItemStockSaldo).
+
+Compara o saldo de cada item com a soma dos lotes (ItemLote) e com o
+histórico de movimentos (MovimentoStock) e lista as divergências. Com
+--corrigir, os saldos que não batem com os lotes são recalculados.
+
+Termina com código 1 se existirem saldos divergentes dos lotes (útil em cron/CI).
+
+Uso (a partir de back/):
+    python -m scripts.reconciliar_saldos_stock
+    python -m scripts.reconciliar_saldos_stock --clinica-id 1 --corrigir
+"""
+
+import argparse
+import sys
+
+from src.database import SessionLocal
+from src.stock.service import reconciliar_saldos
+
+# Garantir que todos os modelos referenciados pelas FKs estão registados
+import src.main  # noqa: F401
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clinica-id", type=int, default=None)
+    parser.add_argument("--corrigir", action="store_true", help="Recalcula os saldos divergentes a partir dos lotes")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        divergencias = reconciliar_saldos(db, clinica_id=args.clinica_id, corrigir=args.corrigir)
+    finally:
+        db.close()
+
+    saldos_errados = [d for d in divergencias if d["saldo"] != d["lotes"]]
+    for d in divergencias:
+        marca = "SALDO" if d["saldo"] != d["lotes"] else "MOVIMENTOS"
+        print(
+            f"[{marca}] item {d['item_id']} '{d['nome']}' (clínica {d['clinica_id']}): "
+            f"saldo={d['saldo']} lotes={d['lotes']} movimentos={d['movimentos']}"
+        )
+
+    print(
+        f"{len(saldos_errados)} saldo(s) divergente(s) dos lotes"
+        f"{' (corrigidos)' if args.corrigir and saldos_errados else ''}, "
+        f"{len(divergencias) - len(saldos_errados)} item(ns) só com histórico de movimentos divergente"
+    )
+    if saldos_errados and not args.corrigir:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""
+Servidor SMTP local para desenvolvimento: recebe os e-mails da aplicação sem
+os enviar, mostra-os no terminal e grava-os como .eml.
+
+Uso (a partir de back/):
+    python -m scripts.smtp_local --porta 1025 --pasta generated_emails
+
+e arrancar a API com EMAIL_SMTP_LOCAL=127.0.0.1:1025 (todas as clínicas
+passam a enviar para este servidor, sem TLS nem autenticação).
+"""
+
+import argparse
+import asyncio
+import logging
+
+from src.email.smtp_local import SmtpLocal
+
+
+async def main(args) -> None:
+    servidor = SmtpLocal(pasta=args.pasta, atraso=args.atraso, recusar=args.recusar)
+    porta = await servidor.iniciar(args.host, args.porta)
+    print(f"SMTP local em {args.host}:{porta} (Ctrl+C para terminar)")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await servidor.parar()
+        print(f"{len(servidor.mensagens)} mensagem(ns) recebida(s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--porta", type=int, default=1025)
+    parser.add_argument("--pasta", default=None, help="Grava cada mensagem como .eml nesta pasta")
+    parser.add_argument("--atraso", type=float, default=0.0, help="Latência simulada por mensagem (s)")
+    parser.add_argument("--recusar", nargs="*", default=[], help="Destinatários a recusar (550)")
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    try:
+        asyncio.run(main(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
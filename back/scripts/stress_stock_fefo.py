@@ -0,0 +1,146 @@
+"""
+Teste de carga das saídas de stock FEFO em concorrência.
+
+Cria um item com vários lotes, lança N threads que fazem saídas em
+simultâneo através de stock.service.criar_movimento_stock e verifica no fim
+que nenhum lote ficou negativo, que o total retirado corresponde às saídas
+aceites, que o saldo materializado (ItemStockSaldo) bate com os lotes e
+que os MovimentoStock gravados batem certo.
+
+O item de teste (nome 'stress-fefo') é removido no fim, salvo com --manter.
+
+Uso (a partir de back/, contra uma base de dados PostgreSQL de desenvolvimento):
+    python -m scripts.stress_stock_fefo --clinica-id 1 --utilizador-id 1 --threads 16 --saidas 50
+"""
+
+import argparse
+import threading
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import func
+
+from src.database import SessionLocal
+from src.stock import models, schemas, service
+
+# Garantir que todos os modelos referenciados pelas FKs estão registados
+import src.main  # noqa: F401
+
+NOME_ITEM = "stress-fefo"
+
+
+def criar_item(clinica_id: int, lotes: int, quantidade_lote: int) -> int:
+    db = SessionLocal()
+    try:
+        item = models.ItemStock(
+            clinica_id=clinica_id, nome=NOME_ITEM, quantidade_minima=0, tipo_medida="un", ativo=True
+        )
+        db.add(item)
+        db.flush()
+        db.add_all([
+            models.ItemLote(
+                item_id=item.id, lote=f"L{i:03d}",
+                validade=date.today() + timedelta(days=30 + i), quantidade=quantidade_lote
+            )
+            for i in range(lotes)
+        ])
+        service.ajustar_saldo(db, item.id, lotes * quantidade_lote)
+        db.commit()
+        return item.id
+    finally:
+        db.close()
+
+
+def remover_item(item_id: int) -> None:
+    db = SessionLocal()
+    try:
+        db.query(models.MovimentoStock).filter_by(item_id=item_id).delete()
+        db.query(models.ItemStockSaldo).filter_by(item_id=item_id).delete()
+        db.query(models.ItemLote).filter_by(item_id=item_id).delete()
+        db.query(models.ItemStock).filter_by(id=item_id).delete()
+        db.commit()
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clinica-id", type=int, default=1)
+    parser.add_argument("--utilizador-id", type=int, default=1)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--saidas", type=int, default=50, help="Saídas por thread")
+    parser.add_argument("--quantidade", type=int, default=3, help="Quantidade de cada saída")
+    parser.add_argument("--lotes", type=int, default=10)
+    parser.add_argument("--quantidade-lote", type=int, default=100)
+    parser.add_argument("--manter", action="store_true", help="Não remover o item de teste")
+    args = parser.parse_args()
+
+    stock_inicial = args.lotes * args.quantidade_lote
+    item_id = criar_item(args.clinica_id, args.lotes, args.quantidade_lote)
+
+    aceites = 0
+    recusadas = 0
+    erros = []
+    lock = threading.Lock()
+
+    def trabalhador():
+        nonlocal aceites, recusadas
+        for _ in range(args.saidas):
+            db = SessionLocal()
+            try:
+                service.criar_movimento_stock(db, schemas.MovimentoStockCreate(
+                    item_id=item_id, tipo_movimento="saida", quantidade=args.quantidade,
+                    utilizador_id=args.utilizador_id, justificacao="stress"
+                ))
+                with lock:
+                    aceites += 1
+            except ValueError:
+                with lock:
+                    recusadas += 1
+            except Exception as e:
+                with lock:
+                    erros.append(e)
+            finally:
+                db.close()
+
+    inicio = time.perf_counter()
+    threads = [threading.Thread(target=trabalhador) for _ in range(args.threads)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    duracao = time.perf_counter() - inicio
+
+    db = SessionLocal()
+    try:
+        negativos = db.query(func.count(models.ItemLote.id)).filter(
+            models.ItemLote.item_id == item_id, models.ItemLote.quantidade < 0
+        ).scalar()
+        stock_final = db.query(func.coalesce(func.sum(models.ItemLote.quantidade), 0)).filter(
+            models.ItemLote.item_id == item_id
+        ).scalar()
+        saldo = service.get_quantidade_atual(db, item_id)
+        movimentos = db.query(func.count(models.MovimentoStock.id)).filter(
+            models.MovimentoStock.item_id == item_id
+        ).scalar()
+    finally:
+        db.close()
+
+    print(
+        f"saídas aceites={aceites} recusadas={recusadas} erros={len(erros)} "
+        f"stock {stock_inicial} -> {stock_final} tempo={duracao:.1f} s"
+    )
+
+    if not args.manter:
+        remover_item(item_id)
+
+    assert not erros, f"Erros inesperados: {erros[:3]}"
+    assert negativos == 0, f"{negativos} lote(s) com stock negativo"
+    assert stock_final == stock_inicial - aceites * args.quantidade, "Stock final não bate com as saídas aceites"
+    assert saldo == stock_final, f"Saldo materializado ({saldo}) diferente da soma dos lotes ({stock_final})"
+    assert movimentos == aceites, "Número de MovimentoStock diferente do número de saídas aceites"
+    print("OK: sem stock negativo nem atualizações perdidas")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+Verificação, com EXPLAIN, do uso dos índices compostos de Auditoria
+(migração a3f9c2d41b7e) pelas queries de contabilidade e auditoria.
+
+Chama as funções reais dos serviços, captura o SQL que emitem sobre a tabela
+"Auditoria" e corre EXPLAIN (FORMAT JSON) sobre cada query. Falha (código 1)
+se alguma fizer Seq Scan em "Auditoria", se não usar um dos índices esperados
+ou se algum dos três índices não for usado por nenhuma query.
+
+O planeador só escolhe os índices com volume e estatísticas realistas:
+usar --seed (com ANALYZE) numa base de dados de desenvolvimento e um período
+curto face aos dias semeados. Usa as mesmas linhas de teste de
+benchmark_daily_activity (detalhes='benchmark'), removidas com --cleanup.
+
+Uso (a partir de back/, contra PostgreSQL):
+    python -m scripts.verificar_indices_auditoria --seed 200000 --clinica-id 1
+    python -m scripts.verificar_indices_auditoria --periodo 7
+    python -m scripts.verificar_indices_auditoria --cleanup
+"""
+
+import argparse
+import json
+from datetime import date, datetime, time, timedelta
+from typing import Iterator, List, Set, Tuple
+
+from sqlalchemy import event
+
+from src.database import SessionLocal, engine
+from src.auditoria.models import Auditoria
+from src.auditoria import service as auditoria_service
+from src.contabilidade import service as contabilidade_service
+from scripts.benchmark_daily_activity import MARCA, seed
+
+IX_CLINICA_DATA = "ix_auditoria_clinica_data"
+IX_CLINICA_OBJETO_ACAO = "ix_auditoria_clinica_objeto_acao_data"
+IX_UTILIZADOR_DATA = "ix_auditoria_utilizador_data"
+
+
+def _nos(plano: dict) -> Iterator[dict]:
+    yield plano
+    for filho in plano.get("Plans", []):
+        yield from _nos(filho)
+
+
+def analisar_plano(plano: dict) -> Tuple[Set[str], bool]:
+    """Índices de "Auditoria" usados no plano e se há Seq Scan nessa tabela."""
+    indices, seq_scan = set(), False
+    for no in _nos(plano):
+        if no.get("Relation Name") != "Auditoria" and not no.get("Index Name", "").startswith("ix_auditoria_"):
+            continue
+        if no["Node Type"] == "Seq Scan":
+            seq_scan = True
+        if "Index Name" in no:
+            indices.add(no["Index Name"])
+    return indices, seq_scan
+
+
+def capturar_queries(db, funcao) -> List[Tuple[str, object]]:
+    """Executa `funcao` e devolve os SELECTs emitidos sobre "Auditoria"."""
+    queries = []
+
+    def guardar(conn, cursor, statement, parameters, context, executemany):
+        if '"Auditoria"' in statement and statement.lstrip().upper().startswith("SELECT"):
+            queries.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", guardar)
+    try:
+        funcao()
+    finally:
+        event.remove(engine, "before_cursor_execute", guardar)
+    return queries
+
+
+def explicar(db, statement: str, parameters) -> dict:
+    resultado = db.connection().exec_driver_sql(f"EXPLAIN (FORMAT JSON) {statement}", parameters).scalar()
+    if isinstance(resultado, str):
+        resultado = json.loads(resultado)
+    return resultado[0]["Plan"]
+
+
+def verificacoes(db, clinica_id: int, utilizador_id: int, data_inicio: date, data_fim: date):
+    """(nome, função, índices aceites)."""
+    inicio = datetime.combine(data_inicio, time.min)
+    fim = datetime.combine(data_fim, time.max)
+    return [
+        (
+            "contabilidade.get_operations_summary",
+            lambda: contabilidade_service.get_operations_summary(db, data_inicio, data_fim, clinica_id),
+            {IX_CLINICA_DATA, IX_CLINICA_OBJETO_ACAO},
+        ),
+        (
+            "contabilidade.get_module_summary",
+            lambda: contabilidade_service.get_module_summary(db, "Fatura", data_inicio, data_fim, clinica_id),
+            {IX_CLINICA_OBJETO_ACAO, IX_CLINICA_DATA},
+        ),
+        (
+            "contabilidade.get_daily_activity",
+            lambda: contabilidade_service.get_daily_activity(db, data_inicio, data_fim, clinica_id),
+            {IX_CLINICA_DATA, IX_CLINICA_OBJETO_ACAO},
+        ),
+        (
+            "contabilidade.get_user_activity_detail",
+            lambda: contabilidade_service.get_user_activity_detail(db, utilizador_id, data_inicio, data_fim),
+            {IX_UTILIZADOR_DATA},
+        ),
+        (
+            "auditoria.listar_auditoria (período)",
+            lambda: auditoria_service.listar_auditoria(db, clinica_id, data_inicio=inicio, data_fim=fim),
+            {IX_CLINICA_DATA, IX_CLINICA_OBJETO_ACAO},
+        ),
+        (
+            "auditoria.listar_auditoria (objeto + ação)",
+            lambda: auditoria_service.listar_auditoria(
+                db, clinica_id, objeto="Fatura", acao="Criação", data_inicio=inicio, data_fim=fim
+            ),
+            {IX_CLINICA_OBJETO_ACAO},
+        ),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=0, help="Número de linhas de auditoria a inserir")
+    parser.add_argument("--clinica-id", type=int, default=1)
+    parser.add_argument("--dias", type=int, default=365, help="Dias cobertos pelas linhas semeadas")
+    parser.add_argument("--periodo", type=int, default=7, help="Dias consultados pelas queries verificadas")
+    parser.add_argument("--cleanup", action="store_true", help="Remove as linhas criadas pelo benchmark")
+    args = parser.parse_args()
+
+    if engine.dialect.name != "postgresql":
+        raise SystemExit("A verificação precisa de PostgreSQL (EXPLAIN FORMAT JSON).")
+
+    db = SessionLocal()
+    try:
+        if args.cleanup:
+            db.query(Auditoria).filter(Auditoria.detalhes == MARCA).delete(synchronize_session=False)
+            db.commit()
+            return
+        if args.seed:
+            seed(db, args.seed, args.clinica_id, args.dias)
+
+        utilizador_id = db.query(Auditoria.utilizador_id).filter(
+            Auditoria.clinica_id == args.clinica_id, Auditoria.utilizador_id.isnot(None)
+        ).limit(1).scalar()
+        if utilizador_id is None:
+            raise SystemExit("Sem registos de auditoria na clínica; usar --seed.")
+
+        data_fim = date.today()
+        data_inicio = data_fim - timedelta(days=args.periodo)
+
+        falhas = 0
+        usados: Set[str] = set()
+        for nome, funcao, aceites in verificacoes(db, args.clinica_id, utilizador_id, data_inicio, data_fim):
+            queries = capturar_queries(db, funcao)
+            if not queries:
+                print(f"--    {nome}: sem queries à tabela Auditoria (período já resumido)")
+                continue
+            for statement, parameters in queries:
+                indices, seq_scan = analisar_plano(explicar(db, statement, parameters))
+                usados |= indices
+                ok = not seq_scan and bool(indices & aceites)
+                falhas += not ok
+                detalhe = "Seq Scan" if seq_scan else (", ".join(sorted(indices)) or "sem índice")
+                print(f"{'OK' if ok else 'FALHA':<6}{nome}: {detalhe}")
+
+        em_falta = {IX_CLINICA_DATA, IX_CLINICA_OBJETO_ACAO, IX_UTILIZADOR_DATA} - usados
+        for indice in sorted(em_falta):
+            print(f"FALHA índice {indice} não usado por nenhuma query")
+        if falhas or em_falta:
+            raise SystemExit(1)
+        print("Todos os índices de Auditoria usados.")
+    finally:
+        db.rollback()
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,17 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Date, DateTime, ForeignKey, Index, func
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from src.database import Base
 
 class Auditoria(Base):
     __tablename__ = "Auditoria"
+    __table_args__ = (
+        # Dashboards de contabilidade e listagem de auditoria (filtro por clínica + período)
+        Index("ix_auditoria_clinica_data", "clinica_id", "data"),
+        Index("ix_auditoria_clinica_objeto_acao_data", "clinica_id", "objeto", "acao", "data"),
+        # Atividade por utilizador
+        Index("ix_auditoria_utilizador_data", "utilizador_id", "data"),
+    )
     id = Column(Integer, primary_key=True)
     utilizador_id = Column(Integer, ForeignKey("Utilizador.id"))
     clinica_id = Column(Integer, ForeignKey("Clinica.id"), nullable=False)
@@ -15,4 +22,37 @@ class Auditoria(Base):
     data = Column(DateTime, default=datetime.utcnow)
 
     utilizador = relationship("Utilizador")
-    clinica = relationship("Clinica")
\ No newline at end of file
+    clinica = relationship("Clinica")
+
+
+class AuditoriaResumoDiario(Base):
+    """
+    Contagens diárias de Auditoria por (clínica, dia, objeto, ação, utilizador).
+    Preenchida pelo job `auditoria_resumo` para os dias já fechados; os
+    dashboards de contabilidade leem daqui e só vão à tabela Auditoria para
+    os dias ainda não resumidos.
+    """
+    __tablename__ = "AuditoriaResumoDiario"
+    __table_args__ = (
+        Index("ix_auditoria_resumo_dia_clinica", "dia", "clinica_id"),
+    )
+    id = Column(Integer, primary_key=True)
+    clinica_id = Column(Integer, ForeignKey("Clinica.id"), nullable=False)
+    dia = Column(Date, nullable=False)
+    objeto = Column(String(100), nullable=False)
+    acao = Column(String(100), nullable=False)
+    utilizador_id = Column(Integer, ForeignKey("Utilizador.id"), nullable=True)
+    total = Column(Integer, nullable=False, default=0)
+
+
+# Uma linha por (clínica, dia, objeto, ação, utilizador). utilizador_id pode ser
+# NULL (ações do sistema) e NULLs não colidem num índice único, daí o COALESCE.
+Index(
+    "uq_auditoria_resumo_chave",
+    AuditoriaResumoDiario.clinica_id,
+    AuditoriaResumoDiario.dia,
+    AuditoriaResumoDiario.objeto,
+    AuditoriaResumoDiario.acao,
+    func.coalesce(AuditoriaResumoDiario.utilizador_id, 0),
+    unique=True,
+)
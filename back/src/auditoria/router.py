@@ -1,5 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, Query, Body
-from fastapi.responses import Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from src.auditoria import service, schemas
 from src.database import SessionLocal
@@ -10,9 +10,14 @@ from src.clinica.service import get_clinica_details
 from datetime import datetime
 from typing import Optional, List
 from pathlib import Path
+import tempfile
 
 router = APIRouter()
 
+EXPORT_CHUNK_SIZE = 64 * 1024
+# PDFs até este tamanho ficam em memória; acima passam para disco
+EXPORT_PDF_SPOOL_BYTES = 8 * 1024 * 1024
+
 def get_db():
     db = SessionLocal()
     try:
@@ -20,6 +25,14 @@ def get_db():
     finally:
         db.close()
 
+def ler_ficheiro(ficheiro):
+    """Envia um ficheiro temporário aos blocos e fecha-o no fim."""
+    try:
+        while chunk := ficheiro.read(EXPORT_CHUNK_SIZE):
+            yield chunk
+    finally:
+        ficheiro.close()
+
 @router.get("/", response_model=schemas.AuditoriaPaginatedResponse)
 def listar_auditoria(
     skip: int = Query(0, ge=0, description="Number of records to skip"),
@@ -98,7 +111,7 @@ def export_auditoria(
     try:
         if request.format == schemas.ExportFormat.EXCEL:
             # Export to Excel
-            excel_data = service.export_auditoria_excel(
+            excel_file = service.export_auditoria_excel(
                 db=db,
                 clinica_id=target_clinic_id,
                 filters=request.filters,
@@ -108,12 +121,27 @@ def export_auditoria(
 
             filename = f"auditoria_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
 
-            return Response(
-                content=excel_data,
+            return StreamingResponse(
+                ler_ficheiro(excel_file),
                 media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
                 headers={"Content-Disposition": f"attachment; filename={filename}"}
             )
 
+        elif request.format == schemas.ExportFormat.CSV:
+            # CSV is generated while it is sent (own DB session)
+            filename = f"auditoria_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+
+            return StreamingResponse(
+                service.export_auditoria_csv(
+                    clinica_id=target_clinic_id,
+                    filters=request.filters,
+                    selected_ids=request.selected_ids,
+                    export_all=request.export_all
+                ),
+                media_type="text/csv; charset=utf-8",
+                headers={"Content-Disposition": f"attachment; filename={filename}"}
+            )
+
         elif request.format == schemas.ExportFormat.PDF:
             # Get data for PDF
             records = service.get_auditoria_for_pdf(
@@ -141,12 +169,18 @@ def export_auditoria(
 
             # Generate PDF
             html = render_template("auditoria.html", context)
-            pdf_data = generate_pdf(html, css_files=["styles.css"])
+            pdf_file = tempfile.SpooledTemporaryFile(max_size=EXPORT_PDF_SPOOL_BYTES)
+            try:
+                generate_pdf(html, css_files=["styles.css"], target=pdf_file)
+            except Exception:
+                pdf_file.close()
+                raise
+            pdf_file.seek(0)
 
             filename = f"auditoria_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
 
-            return Response(
-                content=pdf_data,
+            return StreamingResponse(
+                ler_ficheiro(pdf_file),
                 media_type="application/pdf",
                 headers={"Content-Disposition": f"attachment; filename={filename}"}
             )
@@ -43,6 +43,7 @@ class AuditoriaMetadata(BaseModel):
 
 class ExportFormat(str, Enum):
     EXCEL = "excel"
+    CSV = "csv"
     PDF = "pdf"
 
 class ExportRequest(BaseModel):
@@ -1,5 +1,5 @@
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import and_, or_, func, distinct
+from sqlalchemy import and_, or_, func, distinct, insert, select, text
 from src.auditoria import models as auditoria_models
 from src.utilizadores.models import Utilizador
 from src.pacientes.models import Paciente
@@ -7,12 +7,55 @@ from src.clinica.models import Clinica
 from src.marcacoes.models import Marcacao
 from src.orcamento.models import Orcamento
 from src.faturacao.models import Fatura
-from datetime import datetime
-from typing import Optional, List
+from datetime import date, datetime, time, timedelta
+from typing import IO, Iterator, Optional, List
+from itertools import islice
+import csv
 import io
+import tempfile
 import openpyxl
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Font, PatternFill, Alignment
 from openpyxl.utils import get_column_letter
+from src.database import SessionLocal
+
+# Tipos de objeto com nome resolvível: (modelo, coluna com o nome, formato).
+# Objetos sem coluna de nome (None) são identificados pelo número: o nome é
+# `formato` com {id} substituído pelo ID (ex.: "Fatura {id}").
+_NOMES_OBJETOS = {
+    "Utilizador": (Utilizador, "nome", None),
+    "Paciente": (Paciente, "nome", None),
+    "Clinica": (Clinica, "nome", None),
+    "Marcacao": (Marcacao, None, "Marcação {id}"),
+    "Orcamento": (Orcamento, None, "Orçamento {id}"),
+    "Fatura": (Fatura, None, "Fatura {id}"),
+}
+
+
+def resolver_nomes_objetos(db: Session, auditorias) -> dict:
+    """
+    Resolve o nome de apresentação dos objetos referidos por uma lista de
+    registos de auditoria, com uma única query `IN` por tipo de objeto.
+
+    Returns:
+        Dicionário {(objeto, objeto_id): nome}.
+    """
+    ids_por_tipo: dict = {}
+    for a in auditorias:
+        if a.objeto in _NOMES_OBJETOS and a.objeto_id:
+            ids_por_tipo.setdefault(a.objeto, set()).add(a.objeto_id)
+
+    nomes = {}
+    for objeto, ids in ids_por_tipo.items():
+        modelo, coluna_nome, formato = _NOMES_OBJETOS[objeto]
+        if coluna_nome:
+            for obj_id, nome in db.query(modelo.id, getattr(modelo, coluna_nome)).filter(modelo.id.in_(ids)):
+                nomes[(objeto, obj_id)] = nome
+        else:
+            for (obj_id,) in db.query(modelo.id).filter(modelo.id.in_(ids)):
+                nomes[(objeto, obj_id)] = formato.format(id=obj_id)
+    return nomes
+
 
 def listar_auditoria(
     db: Session,
@@ -70,31 +113,12 @@ def listar_auditoria(
     auditorias = query.order_by(auditoria_models.Auditoria.data.desc()).offset(skip).limit(limit).all()
 
     # Process results
+    nomes_objetos = resolver_nomes_objetos(db, auditorias)
     respostas = []
     for a in auditorias:
         utilizador_nome = a.utilizador.nome if a.utilizador else None
         clinica_nome = a.clinica.nome if a.clinica else None
-        objeto_nome = None
-
-        # Get object name based on type
-        if a.objeto == "Utilizador" and a.objeto_id:
-            u = db.query(Utilizador).filter_by(id=a.objeto_id).first()
-            objeto_nome = u.nome if u else None
-        elif a.objeto == "Paciente" and a.objeto_id:
-            p = db.query(Paciente).filter_by(id=a.objeto_id).first()
-            objeto_nome = p.nome if p else None
-        elif a.objeto == "Clinica" and a.objeto_id:
-            c = db.query(Clinica).filter_by(id=a.objeto_id).first()
-            objeto_nome = c.nome if c else None
-        elif a.objeto == "Marcacao" and a.objeto_id:
-            m = db.query(Marcacao).filter_by(id=a.objeto_id).first()
-            objeto_nome = f"Marcação {m.id}" if m else None
-        elif a.objeto == "Orcamento" and a.objeto_id:
-            o = db.query(Orcamento).filter_by(id=a.objeto_id).first()
-            objeto_nome = f"Orçamento {o.id}" if o else None
-        elif a.objeto == "Fatura" and a.objeto_id:
-            f = db.query(Fatura).filter_by(id=a.objeto_id).first()
-            objeto_nome = f"Fatura {f.id}" if f else None
+        objeto_nome = nomes_objetos.get((a.objeto, a.objeto_id))
 
         respostas.append({
             "id": a.id,
@@ -157,146 +181,176 @@ def get_auditoria_metadata(db: Session, clinica_id: int):
         "utilizadores": sorted(utilizadores_list, key=lambda x: x["nome"])
     }
 
-def export_auditoria_excel(
+EXPORT_HEADERS = ["ID", "Data", "Utilizador", "Ação", "Objeto", "Objeto Nome", "Detalhes"]
+EXPORT_BATCH_SIZE = 1000
+
+
+def _query_exportacao(
     db: Session,
     clinica_id: int,
     filters: Optional[dict] = None,
     selected_ids: Optional[List[int]] = None,
     export_all: bool = False
-) -> bytes:
-    """Export audit records to Excel format"""
+):
+    """Build the audit query shared by the Excel, CSV and PDF exports (None if nothing to export)."""
+    query = db.query(auditoria_models.Auditoria).options(
+        joinedload(auditoria_models.Auditoria.utilizador)
+    )
 
-    # Get records based on filters
     if selected_ids:
         # Export only selected records
-        query = db.query(auditoria_models.Auditoria).options(
-            joinedload(auditoria_models.Auditoria.utilizador),
-            joinedload(auditoria_models.Auditoria.clinica)
-        ).filter(
+        query = query.filter(
             auditoria_models.Auditoria.id.in_(selected_ids),
             auditoria_models.Auditoria.clinica_id == clinica_id
         )
-        auditorias = query.order_by(auditoria_models.Auditoria.data.desc()).all()
     elif export_all:
-        # Export all records with filters
-        if filters:
-            # Apply filters (reuse logic from listar_auditoria)
-            query = db.query(auditoria_models.Auditoria).options(
-                joinedload(auditoria_models.Auditoria.utilizador),
-                joinedload(auditoria_models.Auditoria.clinica)
-            )
-
-            filter_list = [auditoria_models.Auditoria.clinica_id == clinica_id]
-            if filters.get('utilizador_id'):
-                filter_list.append(auditoria_models.Auditoria.utilizador_id == filters['utilizador_id'])
-            if filters.get('acao'):
-                filter_list.append(auditoria_models.Auditoria.acao == filters['acao'])
-            if filters.get('objeto'):
-                filter_list.append(auditoria_models.Auditoria.objeto == filters['objeto'])
-            if filters.get('data_inicio'):
-                filter_list.append(auditoria_models.Auditoria.data >= datetime.fromisoformat(filters['data_inicio']))
-            if filters.get('data_fim'):
-                filter_list.append(auditoria_models.Auditoria.data <= datetime.fromisoformat(filters['data_fim']))
-            if filters.get('search'):
-                search_term = f"%{filters['search']}%"
-                filter_list.append(
-                    or_(
-                        auditoria_models.Auditoria.detalhes.ilike(search_term),
-                        auditoria_models.Auditoria.acao.ilike(search_term),
-                        auditoria_models.Auditoria.objeto.ilike(search_term)
-                    )
+        # Export all records, with the same filters as listar_auditoria
+        filter_list = [auditoria_models.Auditoria.clinica_id == clinica_id]
+        filters = filters or {}
+        if filters.get('utilizador_id'):
+            filter_list.append(auditoria_models.Auditoria.utilizador_id == filters['utilizador_id'])
+        if filters.get('acao'):
+            filter_list.append(auditoria_models.Auditoria.acao == filters['acao'])
+        if filters.get('objeto'):
+            filter_list.append(auditoria_models.Auditoria.objeto == filters['objeto'])
+        if filters.get('data_inicio'):
+            filter_list.append(auditoria_models.Auditoria.data >= datetime.fromisoformat(filters['data_inicio']))
+        if filters.get('data_fim'):
+            filter_list.append(auditoria_models.Auditoria.data <= datetime.fromisoformat(filters['data_fim']))
+        if filters.get('search'):
+            search_term = f"%{filters['search']}%"
+            filter_list.append(
+                or_(
+                    auditoria_models.Auditoria.detalhes.ilike(search_term),
+                    auditoria_models.Auditoria.acao.ilike(search_term),
+                    auditoria_models.Auditoria.objeto.ilike(search_term)
                 )
-
-            if filter_list:
-                query = query.filter(and_(*filter_list))
-
-            auditorias = query.order_by(auditoria_models.Auditoria.data.desc()).all()
-        else:
-            # Export all records for this clinic
-            auditorias = db.query(auditoria_models.Auditoria).options(
-                joinedload(auditoria_models.Auditoria.utilizador),
-                joinedload(auditoria_models.Auditoria.clinica)
-            ).filter(
-                auditoria_models.Auditoria.clinica_id == clinica_id
-            ).order_by(auditoria_models.Auditoria.data.desc()).all()
+            )
+        query = query.filter(and_(*filter_list))
     else:
         # This shouldn't happen, but fallback to empty
-        auditorias = []
+        return None
+
+    return query.order_by(auditoria_models.Auditoria.data.desc())
+
+
+def _linhas_exportacao(db: Session, query) -> Iterator[List[list]]:
+    """
+    Stream export rows in batches of EXPORT_BATCH_SIZE using a server-side
+    cursor (yield_per), resolving object names once per batch.
+    """
+    if query is None:
+        return
+
+    registos = iter(query.yield_per(EXPORT_BATCH_SIZE))
+    while True:
+        lote = list(islice(registos, EXPORT_BATCH_SIZE))
+        if not lote:
+            return
+
+        nomes_objetos = resolver_nomes_objetos(db, lote)
+        linhas = []
+        for auditoria in lote:
+            utilizador_nome = auditoria.utilizador.nome if auditoria.utilizador else f"ID: {auditoria.utilizador_id}"
+            objeto_nome = nomes_objetos.get((auditoria.objeto, auditoria.objeto_id))
+            linhas.append([
+                auditoria.id,
+                auditoria.data.strftime("%d/%m/%Y %H:%M:%S"),
+                utilizador_nome,
+                auditoria.acao,
+                auditoria.objeto,
+                objeto_nome or "",
+                auditoria.detalhes or ""
+            ])
+        # Release the ORM objects of this batch
+        for auditoria in lote:
+            db.expunge(auditoria)
+        yield linhas
 
-    # Create workbook
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "Auditoria"
 
-    # Headers
-    headers = ["ID", "Data", "Utilizador", "Ação", "Objeto", "Objeto Nome", "Detalhes"]
-    ws.append(headers)
+def export_auditoria_excel(
+    db: Session,
+    clinica_id: int,
+    filters: Optional[dict] = None,
+    selected_ids: Optional[List[int]] = None,
+    export_all: bool = False
+) -> IO[bytes]:
+    """
+    Export audit records to Excel format.
+
+    Uses openpyxl write-only mode and a streamed query, so memory stays
+    constant regardless of the number of rows. Column widths are computed
+    from the first batch only. Returns a temporary file positioned at the
+    start; it is deleted when closed.
+    """
+    lotes = _linhas_exportacao(
+        db, _query_exportacao(db, clinica_id, filters, selected_ids, export_all)
+    )
+    primeiro_lote = next(lotes, [])
+
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet(title="Auditoria")
+
+    # Column widths from a sampled prefix (must be set before writing rows)
+    for col, header in enumerate(EXPORT_HEADERS, start=1):
+        max_length = max([len(header)] + [len(str(linha[col - 1])) for linha in primeiro_lote])
+        ws.column_dimensions[get_column_letter(col)].width = min(max_length + 2, 50)
 
-    # Style headers
+    # Styled headers
     header_font = Font(bold=True, color="FFFFFF")
     header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-
-    for col in range(1, len(headers) + 1):
-        cell = ws.cell(row=1, column=col)
+    header_row = []
+    for header in EXPORT_HEADERS:
+        cell = WriteOnlyCell(ws, value=header)
         cell.font = header_font
         cell.fill = header_fill
         cell.alignment = Alignment(horizontal="center")
+        header_row.append(cell)
+    ws.append(header_row)
 
     # Add data
-    for auditoria in auditorias:
-        utilizador_nome = auditoria.utilizador.nome if auditoria.utilizador else f"ID: {auditoria.utilizador_id}"
-
-        # Get object name (reuse logic)
-        objeto_nome = None
-        if auditoria.objeto == "Utilizador" and auditoria.objeto_id:
-            u = db.query(Utilizador).filter_by(id=auditoria.objeto_id).first()
-            objeto_nome = u.nome if u else None
-        elif auditoria.objeto == "Paciente" and auditoria.objeto_id:
-            p = db.query(Paciente).filter_by(id=auditoria.objeto_id).first()
-            objeto_nome = p.nome if p else None
-        elif auditoria.objeto == "Clinica" and auditoria.objeto_id:
-            c = db.query(Clinica).filter_by(id=auditoria.objeto_id).first()
-            objeto_nome = c.nome if c else None
-        elif auditoria.objeto == "Marcacao" and auditoria.objeto_id:
-            m = db.query(Marcacao).filter_by(id=auditoria.objeto_id).first()
-            objeto_nome = f"Marcação {m.id}" if m else None
-        elif auditoria.objeto == "Orcamento" and auditoria.objeto_id:
-            o = db.query(Orcamento).filter_by(id=auditoria.objeto_id).first()
-            objeto_nome = f"Orçamento {o.id}" if o else None
-        elif auditoria.objeto == "Fatura" and auditoria.objeto_id:
-            f = db.query(Fatura).filter_by(id=auditoria.objeto_id).first()
-            objeto_nome = f"Fatura {f.id}" if f else None
-
-        row_data = [
-            auditoria.id,
-            auditoria.data.strftime("%d/%m/%Y %H:%M:%S"),
-            utilizador_nome,
-            auditoria.acao,
-            auditoria.objeto,
-            objeto_nome or "",
-            auditoria.detalhes or ""
-        ]
-        ws.append(row_data)
-
-    # Auto-adjust column widths
-    for column in ws.columns:
-        max_length = 0
-        column_letter = get_column_letter(column[0].column)
-        for cell in column:
-            try:
-                if len(str(cell.value)) > max_length:
-                    max_length = len(str(cell.value))
-            except:
-                pass
-        adjusted_width = min(max_length + 2, 50)
-        ws.column_dimensions[column_letter].width = adjusted_width
-
-    # Save to BytesIO
-    output = io.BytesIO()
+    for linha in primeiro_lote:
+        ws.append(linha)
+    for lote in lotes:
+        for linha in lote:
+            ws.append(linha)
+
+    output = tempfile.TemporaryFile()
     wb.save(output)
     output.seek(0)
+    return output
+
+
+def export_auditoria_csv(
+    clinica_id: int,
+    filters: Optional[dict] = None,
+    selected_ids: Optional[List[int]] = None,
+    export_all: bool = False
+) -> Iterator[str]:
+    """
+    Generate audit records as CSV, one batch at a time.
+
+    Opens its own DB session because the generator is consumed by a
+    StreamingResponse after the request dependencies have been closed.
+    """
+    db = SessionLocal()
+    try:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, delimiter=";")
+
+        # BOM so Excel opens the file as UTF-8
+        writer.writerow(EXPORT_HEADERS)
+        yield "\ufeff" + buffer.getvalue()
+
+        query = _query_exportacao(db, clinica_id, filters, selected_ids, export_all)
+        for lote in _linhas_exportacao(db, query):
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows(lote)
+            yield buffer.getvalue()
+    finally:
+        db.close()
 
-    return output.getvalue()
 
 def get_auditoria_for_pdf(
     db: Session,
@@ -306,93 +360,88 @@ def get_auditoria_for_pdf(
     export_all: bool = False
 ) -> List[dict]:
     """Get audit records formatted for PDF export"""
-
-    # Get records (reuse logic from Excel export)
-    if selected_ids:
-        query = db.query(auditoria_models.Auditoria).options(
-            joinedload(auditoria_models.Auditoria.utilizador),
-            joinedload(auditoria_models.Auditoria.clinica)
-        ).filter(
-            auditoria_models.Auditoria.id.in_(selected_ids),
-            auditoria_models.Auditoria.clinica_id == clinica_id
-        )
-        auditorias = query.order_by(auditoria_models.Auditoria.data.desc()).all()
-    elif export_all:
-        if filters:
-            query = db.query(auditoria_models.Auditoria).options(
-                joinedload(auditoria_models.Auditoria.utilizador),
-                joinedload(auditoria_models.Auditoria.clinica)
-            )
-
-            filter_list = [auditoria_models.Auditoria.clinica_id == clinica_id]
-            if filters.get('utilizador_id'):
-                filter_list.append(auditoria_models.Auditoria.utilizador_id == filters['utilizador_id'])
-            if filters.get('acao'):
-                filter_list.append(auditoria_models.Auditoria.acao == filters['acao'])
-            if filters.get('objeto'):
-                filter_list.append(auditoria_models.Auditoria.objeto == filters['objeto'])
-            if filters.get('data_inicio'):
-                filter_list.append(auditoria_models.Auditoria.data >= datetime.fromisoformat(filters['data_inicio']))
-            if filters.get('data_fim'):
-                filter_list.append(auditoria_models.Auditoria.data <= datetime.fromisoformat(filters['data_fim']))
-            if filters.get('search'):
-                search_term = f"%{filters['search']}%"
-                filter_list.append(
-                    or_(
-                        auditoria_models.Auditoria.detalhes.ilike(search_term),
-                        auditoria_models.Auditoria.acao.ilike(search_term),
-                        auditoria_models.Auditoria.objeto.ilike(search_term)
-                    )
-                )
-
-            if filter_list:
-                query = query.filter(and_(*filter_list))
-
-            auditorias = query.order_by(auditoria_models.Auditoria.data.desc()).all()
-        else:
-            auditorias = db.query(auditoria_models.Auditoria).options(
-                joinedload(auditoria_models.Auditoria.utilizador),
-                joinedload(auditoria_models.Auditoria.clinica)
-            ).filter(
-                auditoria_models.Auditoria.clinica_id == clinica_id
-            ).order_by(auditoria_models.Auditoria.data.desc()).all()
-    else:
-        auditorias = []
+    query = _query_exportacao(db, clinica_id, filters, selected_ids, export_all)
 
     # Format for PDF
     formatted_records = []
-    for auditoria in auditorias:
-        utilizador_nome = auditoria.utilizador.nome if auditoria.utilizador else f"ID: {auditoria.utilizador_id}"
-
-        # Get object name (reuse logic)
-        objeto_nome = None
-        if auditoria.objeto == "Utilizador" and auditoria.objeto_id:
-            u = db.query(Utilizador).filter_by(id=auditoria.objeto_id).first()
-            objeto_nome = u.nome if u else None
-        elif auditoria.objeto == "Paciente" and auditoria.objeto_id:
-            p = db.query(Paciente).filter_by(id=auditoria.objeto_id).first()
-            objeto_nome = p.nome if p else None
-        elif auditoria.objeto == "Clinica" and auditoria.objeto_id:
-            c = db.query(Clinica).filter_by(id=auditoria.objeto_id).first()
-            objeto_nome = c.nome if c else None
-        elif auditoria.objeto == "Marcacao" and auditoria.objeto_id:
-            m = db.query(Marcacao).filter_by(id=auditoria.objeto_id).first()
-            objeto_nome = f"Marcação {m.id}" if m else None
-        elif auditoria.objeto == "Orcamento" and auditoria.objeto_id:
-            o = db.query(Orcamento).filter_by(id=auditoria.objeto_id).first()
-            objeto_nome = f"Orçamento {o.id}" if o else None
-        elif auditoria.objeto == "Fatura" and auditoria.objeto_id:
-            f = db.query(Fatura).filter_by(id=auditoria.objeto_id).first()
-            objeto_nome = f"Fatura {f.id}" if f else None
-
-        formatted_records.append({
-            "id": auditoria.id,
-            "data": auditoria.data.strftime("%d/%m/%Y %H:%M:%S"),
-            "utilizador_nome": utilizador_nome,
-            "acao": auditoria.acao,
-            "objeto": auditoria.objeto,
-            "objeto_nome": objeto_nome or "",
-            "detalhes": auditoria.detalhes or ""
-        })
-
-    return formatted_records
\ No newline at end of file
+    for lote in _linhas_exportacao(db, query):
+        for id_, data, utilizador_nome, acao, objeto, objeto_nome, detalhes in lote:
+            formatted_records.append({
+                "id": id_,
+                "data": data,
+                "utilizador_nome": utilizador_nome,
+                "acao": acao,
+                "objeto": objeto,
+                "objeto_nome": objeto_nome,
+                "detalhes": detalhes
+            })
+
+    return formatted_records
+
+
+# Chave do advisory lock que serializa atualizar_resumo_diario entre processos
+_BLOQUEIO_RESUMO_DIARIO = 0x4155444954524553  # "AUDITRES"
+
+
+def atualizar_resumo_diario(db: Session, ate: Optional[date] = None, dias_reprocessar: int = 2) -> Optional[date]:
+    """
+    Atualiza a tabela AuditoriaResumoDiario até ao dia `ate` (inclusive,
+    por omissão ontem em UTC).
+
+    Recalcula a partir do último dia já resumido menos `dias_reprocessar`
+    (para apanhar registos gravados com atraso); na primeira execução
+    resume todo o histórico. É idempotente: os dias recalculados são
+    apagados e reinseridos na mesma transação. Em PostgreSQL a transação
+    começa por um advisory lock, pelo que execuções simultâneas (vários
+    workers) correm uma de cada vez em vez de duplicarem as contagens.
+
+    Returns:
+        O primeiro dia recalculado, ou None se não havia nada a fazer.
+    """
+    Resumo = auditoria_models.AuditoriaResumoDiario
+    Auditoria = auditoria_models.Auditoria
+
+    if ate is None:
+        ate = datetime.utcnow().date() - timedelta(days=1)
+
+    if db.get_bind().dialect.name == "postgresql":
+        # Libertado no commit/rollback
+        db.execute(text("SELECT pg_advisory_xact_lock(:chave)"), {"chave": _BLOQUEIO_RESUMO_DIARIO})
+
+    ultimo_dia = db.query(func.max(Resumo.dia)).scalar()
+    if ultimo_dia is not None:
+        desde = ultimo_dia - timedelta(days=dias_reprocessar)
+    else:
+        primeiro_registo = db.query(func.min(Auditoria.data)).scalar()
+        if primeiro_registo is None:
+            return None
+        desde = primeiro_registo.date()
+
+    if desde > ate:
+        return None
+
+    db.query(Resumo).filter(Resumo.dia >= desde, Resumo.dia <= ate).delete(synchronize_session=False)
+
+    dia = func.date(Auditoria.data)
+    agregado = (
+        select(
+            Auditoria.clinica_id,
+            dia,
+            Auditoria.objeto,
+            Auditoria.acao,
+            Auditoria.utilizador_id,
+            func.count(Auditoria.id),
+        )
+        .where(
+            Auditoria.data >= datetime.combine(desde, time.min),
+            Auditoria.data < datetime.combine(ate + timedelta(days=1), time.min),
+        )
+        .group_by(Auditoria.clinica_id, dia, Auditoria.objeto, Auditoria.acao, Auditoria.utilizador_id)
+    )
+    db.execute(
+        insert(Resumo).from_select(
+            ["clinica_id", "dia", "objeto", "acao", "utilizador_id", "total"], agregado
+        )
+    )
+    db.commit()
+    return desde
@@ -1,5 +1,9 @@
+from datetime import datetime
+
+from src.core.config import settings
 from src.auditoria import models as auditoria_models
 from src.auditoria.context import get_current_clinica_id
+from src.auditoria.writer import auditoria_writer
 
 
 def registrar_auditoria(
@@ -32,6 +36,11 @@ def registrar_auditoria(
         You can override this by passing clinica_id explicitly for operations
         that affect a specific clinic (e.g., clinic creation/updates).
 
+        With AUDITORIA_MODO="buffered" the entry is handed to the background
+        writer instead of being committed here, unless the object is listed in
+        AUDITORIA_OBJETOS_SINCRONOS or the session still has uncommitted
+        changes (which this call used to commit).
+
     Raises:
         ValueError: If clinica_id is not available in context or provided explicitly
     """
@@ -50,13 +59,24 @@ def registrar_auditoria(
             "with clinica_id, or pass clinica_id explicitly."
         )
 
-    registro = auditoria_models.Auditoria(
+    dados = dict(
         utilizador_id=utilizador_id,
         clinica_id=final_clinica_id,
         acao=acao,
         objeto=objeto,
         objeto_id=objeto_id,
-        detalhes=detalhes
+        detalhes=detalhes,
+        data=datetime.utcnow()
     )
-    db.add(registro)
+
+    sincrono = (
+        settings.AUDITORIA_MODO != "buffered"
+        or objeto in settings.AUDITORIA_OBJETOS_SINCRONOS
+        or db.new or db.dirty or db.deleted
+    )
+    if not sincrono:
+        auditoria_writer.enviar(dados)
+        return
+
+    db.add(auditoria_models.Auditoria(**dados))
     db.commit()
\ No newline at end of file
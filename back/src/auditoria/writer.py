@@ -0,0 +1,116 @@
+"""
+Escritor de auditoria em background.
+
+Em modo "buffered" o `registrar_auditoria` não faz commit próprio: coloca o
+registo numa fila e esta thread insere-os em lote (executemany) a cada
+AUDITORIA_BUFFER_FLUSH_MS ou quando há AUDITORIA_BUFFER_MAX_ROWS pendentes.
+A fila é esvaziada no shutdown da aplicação (e à saída do processo).
+"""
+
+import atexit
+import logging
+import queue
+import threading
+import time
+from typing import Optional
+
+from sqlalchemy import insert
+
+from src.core.config import settings
+from src.database import SessionLocal
+from src.auditoria import models as auditoria_models
+
+logger = logging.getLogger(__name__)
+
+
+class AuditoriaWriter:
+    def __init__(self, max_rows: int, flush_ms: int):
+        self.max_rows = max_rows
+        self.flush_interval = flush_ms / 1000
+        self._fila: "queue.Queue[dict]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._parar = threading.Event()
+        self._lock = threading.Lock()
+
+    def enviar(self, registo: dict) -> None:
+        """Coloca um registo (colunas de Auditoria) na fila de escrita."""
+        self._garantir_thread()
+        self._fila.put(registo)
+
+    def _garantir_thread(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._parar.clear()
+                self._thread = threading.Thread(
+                    target=self._loop, name="auditoria-writer", daemon=True
+                )
+                self._thread.start()
+
+    def _recolher_lote(self) -> list[dict]:
+        lote = []
+        limite = time.monotonic() + self.flush_interval
+        while len(lote) < self.max_rows:
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                break
+            try:
+                lote.append(self._fila.get(timeout=restante))
+            except queue.Empty:
+                break
+        return lote
+
+    def _loop(self) -> None:
+        while not self._parar.is_set():
+            lote = self._recolher_lote()
+            if lote:
+                self._gravar(lote)
+        # Shutdown: gravar o que ainda estiver na fila
+        self.flush()
+
+    def flush(self) -> None:
+        """Grava de imediato todos os registos pendentes."""
+        while True:
+            lote = []
+            while len(lote) < self.max_rows:
+                try:
+                    lote.append(self._fila.get_nowait())
+                except queue.Empty:
+                    break
+            if not lote:
+                return
+            self._gravar(lote)
+
+    def _gravar(self, lote: list[dict]) -> None:
+        for tentativa in (1, 2):
+            db = SessionLocal()
+            try:
+                db.execute(insert(auditoria_models.Auditoria), lote)
+                db.commit()
+                return
+            except Exception as e:
+                db.rollback()
+                if tentativa == 2:
+                    logger.error(
+                        f"❌ Falha ao gravar {len(lote)} registo(s) de auditoria: {e}",
+                        exc_info=True
+                    )
+            finally:
+                db.close()
+
+    def parar(self, timeout: float = 10) -> None:
+        """Para a thread depois de esvaziar a fila."""
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+        self.flush()
+
+
+auditoria_writer = AuditoriaWriter(
+    max_rows=settings.AUDITORIA_BUFFER_MAX_ROWS,
+    flush_ms=settings.AUDITORIA_BUFFER_FLUSH_MS,
+)
+
+atexit.register(auditoria_writer.parar)
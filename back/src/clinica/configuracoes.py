@@ -0,0 +1,169 @@
+"""
+Cache das configurações (ClinicaConfiguracao) de cada clínica.
+
+Todas as configurações de uma clínica — as próprias, as da clínica-mãe e as
+globais (clinica_id NULL) — são carregadas numa única query e guardadas num
+cache TTL/LRU em memória. O cache tem uma versão: qualquer alteração a
+configurações ou clínicas (`invalidar_configuracoes`) incrementa a versão e
+descarta todas as entradas, já que uma configuração global ou da clínica-mãe
+afeta várias clínicas. Noutros workers o TTL limita o tempo de desatualização.
+"""
+
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+from src.core.cache import TTLCache
+from src.core.config import settings
+from src.clinica.models import Clinica, ClinicaConfiguracao
+
+# Chaves de configuração dos alertas de stock e respetivos valores por omissão
+ALERT_SETTINGS_DEFAULTS = {
+    "alerta_data_vencimento": "30",
+    "notificar_email_baixo_estoque": "true",
+    "notificar_email_vencimento": "true",
+}
+
+# Chaves dos lembretes automáticos de consulta e respetivos valores por omissão
+# (desativados até a clínica os ativar)
+LEMBRETE_SETTINGS_DEFAULTS = {
+    "lembrete_automatico": "false",
+    "lembrete_horas_antecedencia": "24",
+}
+
+CHAVE_DURACAO_TOKEN = "tempo_duracao_token"
+
+
+@dataclass(frozen=True)
+class ConfiguracoesClinica:
+    clinica_id: int
+    clinica_pai_id: Optional[int] = None
+    propria: Dict[str, str] = field(default_factory=dict)
+    pai: Dict[str, str] = field(default_factory=dict)
+    globais: Dict[str, str] = field(default_factory=dict)
+
+    def valor(self, chave: str, default: str = None) -> Optional[str]:
+        """Valor da clínica, senão o global, senão `default` (como get_configuracao_valor)."""
+        if chave in self.propria:
+            return self.propria[chave]
+        if chave in self.globais:
+            return self.globais[chave]
+        return default
+
+    def alert_settings(self) -> dict:
+        valores = {chave: self.valor(chave, default) for chave, default in ALERT_SETTINGS_DEFAULTS.items()}
+        return {
+            "alerta_data_vencimento": int(valores["alerta_data_vencimento"] or "30"),
+            "notificar_email_baixo_estoque": valores["notificar_email_baixo_estoque"] == "true",
+            "notificar_email_vencimento": valores["notificar_email_vencimento"] == "true",
+        }
+
+    def lembrete_settings(self) -> dict:
+        valores = {chave: self.valor(chave, default) for chave, default in LEMBRETE_SETTINGS_DEFAULTS.items()}
+        try:
+            horas = int(valores["lembrete_horas_antecedencia"] or "24")
+        except ValueError:
+            horas = 24
+        return {
+            "lembrete_automatico": valores["lembrete_automatico"] == "true",
+            "lembrete_horas_antecedencia": horas,
+        }
+
+    def duracao_token(self) -> Optional[int]:
+        """
+        Duração do token (minutos) definida para esta clínica. Uma filial usa
+        sempre a configuração da clínica-mãe. None se não existir ou for inválida.
+        """
+        origem = self.pai if self.clinica_pai_id else self.propria
+        try:
+            return int(origem[CHAVE_DURACAO_TOKEN])
+        except (KeyError, ValueError, TypeError):
+            return None
+
+
+_cache = TTLCache(
+    max_entries=settings.CONFIG_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.CONFIG_CACHE_TTL_SECONDS,
+)
+_versao = 0
+_lock = threading.Lock()
+
+
+def obter_configuracoes_clinicas(db: Session, clinica_ids: Iterable[int]) -> Dict[int, ConfiguracoesClinica]:
+    """
+    Devolve as configurações de várias clínicas. As que não estão em cache
+    são carregadas numa única query (próprias, da clínica-mãe e globais).
+    """
+    versao = _versao
+    resultado: Dict[int, ConfiguracoesClinica] = {}
+    em_falta = []
+    for clinica_id in dict.fromkeys(clinica_ids):
+        entrada = _cache.get(clinica_id)
+        if entrada is not None and entrada[0] == versao:
+            resultado[clinica_id] = entrada[1]
+        else:
+            em_falta.append(clinica_id)
+
+    if not em_falta:
+        return resultado
+
+    rows = db.query(
+        Clinica.id,
+        Clinica.clinica_pai_id,
+        ClinicaConfiguracao.clinica_id,
+        ClinicaConfiguracao.chave,
+        ClinicaConfiguracao.valor
+    ).outerjoin(
+        ClinicaConfiguracao,
+        or_(
+            ClinicaConfiguracao.clinica_id == Clinica.id,
+            ClinicaConfiguracao.clinica_id == Clinica.clinica_pai_id,
+            ClinicaConfiguracao.clinica_id.is_(None)
+        )
+    ).filter(Clinica.id.in_(em_falta)).all()
+
+    pais: Dict[int, Optional[int]] = {}
+    proprias: Dict[int, Dict[str, str]] = {}
+    dos_pais: Dict[int, Dict[str, str]] = {}
+    globais: Dict[str, str] = {}
+    for clinica_id, clinica_pai_id, config_clinica_id, chave, valor in rows:
+        pais[clinica_id] = clinica_pai_id
+        if chave is None:
+            continue
+        if config_clinica_id is None:
+            globais[chave] = valor
+        elif config_clinica_id == clinica_id:
+            proprias.setdefault(clinica_id, {})[chave] = valor
+        else:
+            dos_pais.setdefault(clinica_id, {})[chave] = valor
+
+    for clinica_id in em_falta:
+        configuracoes = ConfiguracoesClinica(
+            clinica_id=clinica_id,
+            clinica_pai_id=pais.get(clinica_id),
+            propria=proprias.get(clinica_id, {}),
+            pai=dos_pais.get(clinica_id, {}),
+            globais=globais,
+        )
+        resultado[clinica_id] = configuracoes
+        # Só guarda se ninguém invalidou o cache entretanto
+        if clinica_id in pais and versao == _versao:
+            _cache.set(clinica_id, (versao, configuracoes))
+
+    return resultado
+
+
+def obter_configuracoes(db: Session, clinica_id: int) -> ConfiguracoesClinica:
+    """Configurações de uma clínica (ver obter_configuracoes_clinicas)."""
+    return obter_configuracoes_clinicas(db, [clinica_id])[clinica_id]
+
+
+def invalidar_configuracoes() -> None:
+    """Descarta todas as configurações em cache (chamado após qualquer alteração)."""
+    global _versao
+    with _lock:
+        _versao += 1
+        _cache.clear()
@@ -2,7 +2,11 @@ from src.utilizadores.models import Utilizador, UtilizadorClinica
 from src.utilizadores.utils import is_master_admin
 from src.auditoria.utils import registrar_auditoria
 from sqlalchemy.orm import Session, selectinload
+from typing import Dict, List
 from src.clinica import models, schemas
+from src.clinica.configuracoes import (
+    obter_configuracoes, obter_configuracoes_clinicas, invalidar_configuracoes
+)
 
 def criar_clinica(db: Session, dados: schemas.ClinicaCreate, criado_por_id: int):
     clinica = models.Clinica(**dados.dict(), criado_por_id=criado_por_id)
@@ -19,6 +23,7 @@ def criar_clinica(db: Session, dados: schemas.ClinicaCreate, criado_por_id: int)
         )
         db.add(new_config)
     db.commit()
+    invalidar_configuracoes()
     registrar_auditoria(
         db, criado_por_id, "Criação", "Clinica", clinica.id, f"Clínica '{clinica.nome}' criada."
     )
@@ -32,6 +37,7 @@ def atualizar_clinica(db: Session, clinica_id: int, dados: schemas.ClinicaCreate
         setattr(clinica, key, value)
     db.commit()
     db.refresh(clinica)
+    invalidar_configuracoes()
     registrar_auditoria(
         db, user_id, "Atualização", "Clinica", clinica.id, f"Clínica '{clinica.nome}' atualizada."
     )
@@ -62,6 +68,7 @@ def criar_configuracao(db: Session, dados: schemas.ClinicaConfiguracaoCreate, us
             )
             db.add(clinic_config)
         db.commit()
+    invalidar_configuracoes()
     registrar_auditoria(
         db, user_id, "Criação", "ClinicaConfiguracao", config.id, f"Configuração '{config.chave}' criada."
     )
@@ -75,6 +82,7 @@ def atualizar_configuracao(db: Session, config_id: int, dados: schemas.ClinicaCo
         setattr(config, key, value)
     db.commit()
     db.refresh(config)
+    invalidar_configuracoes()
     registrar_auditoria(
         db, user_id, "Atualização", "ClinicaConfiguracao", config.id, f"Configuração '{config.chave}' atualizada."
     )
@@ -85,6 +93,7 @@ def remover_configuracao(db: Session, config_id: int, user_id: int):
     if config:
         db.delete(config)
         db.commit()
+        invalidar_configuracoes()
         registrar_auditoria(
             db, user_id, "Remoção", "ClinicaConfiguracao", config_id, f"Configuração removida."
         )
@@ -162,25 +171,34 @@ def get_clinica_details(db: Session):
 # --------- ALERT CONFIGURATIONS ---------
 def get_configuracao_valor(db: Session, clinica_id: int, chave: str, default: str = None) -> str:
     """
-    Get a configuration value for a clinic by key.
+    Get a configuration value for a clinic by key (clinic value, then global).
     Returns the default if the configuration doesn't exist.
+    Served from the in-process configuration cache.
     """
-    config = db.query(models.ClinicaConfiguracao).filter_by(
-        clinica_id=clinica_id, chave=chave
-    ).first()
+    return obter_configuracoes(db, clinica_id).valor(chave, default)
 
-    if config:
-        return config.valor
 
-    # Try global config if clinic-specific not found
-    global_config = db.query(models.ClinicaConfiguracao).filter_by(
-        clinica_id=None, chave=chave
-    ).first()
+def get_alert_settings_clinicas(db: Session, clinica_ids: List[int]) -> Dict[int, dict]:
+    """
+    Get the alert settings of several clinics (cache misses are loaded
+    with a single query).
+    """
+    return {
+        clinica_id: configuracoes.alert_settings()
+        for clinica_id, configuracoes in obter_configuracoes_clinicas(db, clinica_ids).items()
+    }
 
-    if global_config:
-        return global_config.valor
 
-    return default
+def get_lembrete_settings_clinicas(db: Session, clinica_ids: List[int]) -> Dict[int, dict]:
+    """
+    Get the automatic appointment reminder settings of several clinics:
+    - lembrete_automatico: send reminders automatically
+    - lembrete_horas_antecedencia: hours before the appointment
+    """
+    return {
+        clinica_id: configuracoes.lembrete_settings()
+        for clinica_id, configuracoes in obter_configuracoes_clinicas(db, clinica_ids).items()
+    }
 
 
 def get_alert_settings(db: Session, clinica_id: int) -> dict:
@@ -191,8 +209,4 @@ def get_alert_settings(db: Session, clinica_id: int) -> dict:
     - notificar_email_baixo_estoque: enable low stock email notifications
     - notificar_email_vencimento: enable expiry email notifications
     """
-    return {
-        "alerta_data_vencimento": int(get_configuracao_valor(db, clinica_id, "alerta_data_vencimento", "30") or "30"),
-        "notificar_email_baixo_estoque": get_configuracao_valor(db, clinica_id, "notificar_email_baixo_estoque", "true") == "true",
-        "notificar_email_vencimento": get_configuracao_valor(db, clinica_id, "notificar_email_vencimento", "true") == "true",
-    }
\ No newline at end of file
+    return obter_configuracoes(db, clinica_id).alert_settings()
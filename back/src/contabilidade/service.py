@@ -1,14 +1,117 @@
 # src/contabilidade/service.py
-from datetime import datetime, date, timedelta
-from typing import List, Dict, Any, Optional
+from datetime import datetime, date, time, timedelta
+from typing import List, Dict, Any, Optional, Tuple
 from sqlalchemy.orm import Session
 from sqlalchemy import func, and_, or_
 
-from src.auditoria.models import Auditoria
+from src.auditoria.models import Auditoria, AuditoriaResumoDiario
 from src.utilizadores.models import Utilizador
 from src.contabilidade import schemas
 
 
+def _no_periodo(data_inicio: date, data_fim: date):
+    """
+    Filter Auditoria.data to [data_inicio 00:00, data_fim + 1 day 00:00).
+    Compares the raw column so the (clinica_id, data) indexes can be used.
+    """
+    return and_(
+        Auditoria.data >= datetime.combine(data_inicio, time.min),
+        Auditoria.data < datetime.combine(data_fim + timedelta(days=1), time.min)
+    )
+
+def _contagens(
+    db: Session,
+    data_inicio: date,
+    data_fim: date,
+    clinica_id: Optional[int] = None,
+    objetos: Optional[List[str]] = None
+) -> List[Tuple[str, str, Optional[int], int]]:
+    """
+    Count audit records per (objeto, acao, utilizador_id) in the period.
+
+    Days already summarised by the rollup job are read from
+    AuditoriaResumoDiario; only the remaining days (normally just today)
+    are counted on the raw Auditoria table.
+    """
+    contagens: Dict[Tuple[str, str, Optional[int]], int] = {}
+
+    ultimo_dia = db.query(func.max(AuditoriaResumoDiario.dia)).scalar()
+    inicio_raw = data_inicio
+
+    if ultimo_dia is not None and data_inicio <= ultimo_dia:
+        resumo_query = db.query(
+            AuditoriaResumoDiario.objeto,
+            AuditoriaResumoDiario.acao,
+            AuditoriaResumoDiario.utilizador_id,
+            func.sum(AuditoriaResumoDiario.total)
+        ).filter(
+            AuditoriaResumoDiario.dia >= data_inicio,
+            AuditoriaResumoDiario.dia <= min(data_fim, ultimo_dia)
+        )
+        if clinica_id:
+            resumo_query = resumo_query.filter(AuditoriaResumoDiario.clinica_id == clinica_id)
+        if objetos:
+            resumo_query = resumo_query.filter(AuditoriaResumoDiario.objeto.in_(objetos))
+
+        for objeto, acao, uid, total in resumo_query.group_by(
+            AuditoriaResumoDiario.objeto,
+            AuditoriaResumoDiario.acao,
+            AuditoriaResumoDiario.utilizador_id
+        ).all():
+            contagens[(objeto, acao, uid)] = int(total)
+
+        inicio_raw = ultimo_dia + timedelta(days=1)
+
+    if inicio_raw <= data_fim:
+        raw_query = db.query(
+            Auditoria.objeto,
+            Auditoria.acao,
+            Auditoria.utilizador_id,
+            func.count(Auditoria.id)
+        ).filter(_no_periodo(inicio_raw, data_fim))
+        if clinica_id:
+            raw_query = raw_query.filter(Auditoria.clinica_id == clinica_id)
+        if objetos:
+            raw_query = raw_query.filter(Auditoria.objeto.in_(objetos))
+
+        for objeto, acao, uid, count in raw_query.group_by(
+            Auditoria.objeto, Auditoria.acao, Auditoria.utilizador_id
+        ).all():
+            contagens[(objeto, acao, uid)] = contagens.get((objeto, acao, uid), 0) + count
+
+    return [(objeto, acao, uid, total) for (objeto, acao, uid), total in contagens.items()]
+
+
+def _top_utilizadores(
+    db: Session,
+    contagens: List[Tuple[str, str, Optional[int], int]],
+    limite: int
+) -> List[Dict[str, Any]]:
+    """Users with most operations in `contagens`, as [{id, nome, count}, ...]."""
+    por_utilizador: Dict[int, int] = {}
+    for _, _, uid, total in contagens:
+        if uid is not None:
+            por_utilizador[uid] = por_utilizador.get(uid, 0) + total
+
+    if not por_utilizador:
+        return []
+
+    nomes = dict(
+        db.query(Utilizador.id, Utilizador.nome)
+        .filter(Utilizador.id.in_(list(por_utilizador)))
+        .all()
+    )
+    ordenados = sorted(
+        (uid for uid in por_utilizador if uid in nomes),
+        key=lambda uid: por_utilizador[uid],
+        reverse=True
+    )
+    return [
+        {"id": uid, "nome": nomes[uid], "count": por_utilizador[uid]}
+        for uid in ordenados[:limite]
+    ]
+
+
 # ============================================================================
 # Overall Dashboard
 # ============================================================================
@@ -28,75 +131,18 @@ def get_operations_summary(
     if not data_inicio:
         data_inicio = data_fim - timedelta(days=30)
 
-    # Base query
-    query = db.query(Auditoria).filter(
-        and_(
-            func.date(Auditoria.data) >= data_inicio,
-            func.date(Auditoria.data) <= data_fim
-        )
-    )
-
-    if clinica_id:
-        query = query.filter(Auditoria.clinica_id == clinica_id)
-
-    total_ops = query.count()
+    contagens = _contagens(db, data_inicio, data_fim, clinica_id)
 
-    # By action type
+    total_ops = 0
     por_acao = {}
-    action_counts = db.query(
-        Auditoria.acao,
-        func.count(Auditoria.id)
-    ).filter(
-        and_(
-            func.date(Auditoria.data) >= data_inicio,
-            func.date(Auditoria.data) <= data_fim
-        )
-    )
-    if clinica_id:
-        action_counts = action_counts.filter(Auditoria.clinica_id == clinica_id)
-
-    for acao, count in action_counts.group_by(Auditoria.acao).all():
-        por_acao[acao] = count
-
-    # By object type
     por_objeto = {}
-    object_counts = db.query(
-        Auditoria.objeto,
-        func.count(Auditoria.id)
-    ).filter(
-        and_(
-            func.date(Auditoria.data) >= data_inicio,
-            func.date(Auditoria.data) <= data_fim
-        )
-    )
-    if clinica_id:
-        object_counts = object_counts.filter(Auditoria.clinica_id == clinica_id)
-
-    for objeto, count in object_counts.group_by(Auditoria.objeto).all():
-        por_objeto[objeto] = count
+    for objeto, acao, _, total in contagens:
+        total_ops += total
+        por_acao[acao] = por_acao.get(acao, 0) + total
+        por_objeto[objeto] = por_objeto.get(objeto, 0) + total
 
     # Top users
-    top_users_query = db.query(
-        Auditoria.utilizador_id,
-        Utilizador.nome,
-        func.count(Auditoria.id).label('count')
-    ).join(
-        Utilizador, Auditoria.utilizador_id == Utilizador.id
-    ).filter(
-        and_(
-            func.date(Auditoria.data) >= data_inicio,
-            func.date(Auditoria.data) <= data_fim
-        )
-    )
-    if clinica_id:
-        top_users_query = top_users_query.filter(Auditoria.clinica_id == clinica_id)
-
-    top_utilizadores = [
-        {"id": uid, "nome": nome, "count": count}
-        for uid, nome, count in top_users_query.group_by(
-            Auditoria.utilizador_id, Utilizador.nome
-        ).order_by(func.count(Auditoria.id).desc()).limit(10).all()
-    ]
+    top_utilizadores = _top_utilizadores(db, contagens, 10)
 
     # Financial operations
     financial_objects = ["Fatura", "Parcela", "CashierPayment", "CaixaSession", "Orçamento"]
@@ -109,10 +155,7 @@ def get_operations_summary(
     recent_query = db.query(Auditoria).join(
         Utilizador, Auditoria.utilizador_id == Utilizador.id
     ).filter(
-        and_(
-            func.date(Auditoria.data) >= data_inicio,
-            func.date(Auditoria.data) <= data_fim
-        )
+        _no_periodo(data_inicio, data_fim)
     )
     if clinica_id:
         recent_query = recent_query.filter(Auditoria.clinica_id == clinica_id)
@@ -164,49 +207,32 @@ def get_module_summary(
     if not data_inicio:
         data_inicio = data_fim - timedelta(days=30)
 
-    # Base query for this module
-    query = db.query(Auditoria).filter(
-        and_(
-            Auditoria.objeto == modulo,
-            func.date(Auditoria.data) >= data_inicio,
-            func.date(Auditoria.data) <= data_fim
-        )
-    )
-    if clinica_id:
-        query = query.filter(Auditoria.clinica_id == clinica_id)
-
-    total_ops = query.count()
+    contagens = _contagens(db, data_inicio, data_fim, clinica_id, objetos=[modulo])
 
     # Count by action
-    criacoes = query.filter(Auditoria.acao == "Criação").count()
-    atualizacoes = query.filter(Auditoria.acao == "Atualização").count()
-    remocoes = query.filter(Auditoria.acao == "Remoção").count()
+    total_ops = 0
+    por_acao = {}
+    for _, acao, _, total in contagens:
+        total_ops += total
+        por_acao[acao] = por_acao.get(acao, 0) + total
+
+    criacoes = por_acao.get("Criação", 0)
+    atualizacoes = por_acao.get("Atualização", 0)
+    remocoes = por_acao.get("Remoção", 0)
 
     # Top users for this module
-    top_users_query = db.query(
-        Auditoria.utilizador_id,
-        Utilizador.nome,
-        func.count(Auditoria.id).label('count')
-    ).join(
-        Utilizador, Auditoria.utilizador_id == Utilizador.id
-    ).filter(
+    top_utilizadores = _top_utilizadores(db, contagens, 5)
+
+    # Recent operations in this module
+    query = db.query(Auditoria).filter(
         and_(
             Auditoria.objeto == modulo,
-            func.date(Auditoria.data) >= data_inicio,
-            func.date(Auditoria.data) <= data_fim
+            _no_periodo(data_inicio, data_fim)
         )
     )
     if clinica_id:
-        top_users_query = top_users_query.filter(Auditoria.clinica_id == clinica_id)
-
-    top_utilizadores = [
-        {"id": uid, "nome": nome, "count": count}
-        for uid, nome, count in top_users_query.group_by(
-            Auditoria.utilizador_id, Utilizador.nome
-        ).order_by(func.count(Auditoria.id).desc()).limit(5).all()
-    ]
+        query = query.filter(Auditoria.clinica_id == clinica_id)
 
-    # Recent operations in this module
     recent_ops = []
     for audit in query.order_by(Auditoria.data.desc()).limit(10).all():
         user = db.query(Utilizador).filter(Utilizador.id == audit.utilizador_id).first()
@@ -262,8 +288,7 @@ def get_user_activity_summary(
     query = db.query(Auditoria).filter(
         and_(
             Auditoria.utilizador_id == utilizador_id,
-            func.date(Auditoria.data) >= data_inicio,
-            func.date(Auditoria.data) <= data_fim
+            _no_periodo(data_inicio, data_fim)
         )
     )
     if clinica_id:
@@ -279,8 +304,7 @@ def get_user_activity_summary(
     ).filter(
         and_(
             Auditoria.utilizador_id == utilizador_id,
-            func.date(Auditoria.data) >= data_inicio,
-            func.date(Auditoria.data) <= data_fim
+            _no_periodo(data_inicio, data_fim)
         )
     ).group_by(Auditoria.acao).all():
         acoes_por_tipo[acao] = count
@@ -293,8 +317,7 @@ def get_user_activity_summary(
     ).filter(
         and_(
             Auditoria.utilizador_id == utilizador_id,
-            func.date(Auditoria.data) >= data_inicio,
-            func.date(Auditoria.data) <= data_fim
+            _no_periodo(data_inicio, data_fim)
         )
     )
     if clinica_id:
@@ -338,8 +361,7 @@ def get_user_activity_detail(
     query = db.query(Auditoria).filter(
         and_(
             Auditoria.utilizador_id == utilizador_id,
-            func.date(Auditoria.data) >= data_inicio,
-            func.date(Auditoria.data) <= data_fim
+            _no_periodo(data_inicio, data_fim)
         )
     )
 
@@ -388,112 +410,51 @@ def get_financial_summary(
     if not data_inicio:
         data_inicio = data_fim - timedelta(days=30)
 
-    # Base query for date range
-    def count_ops(objeto: str, acao: Optional[str] = None):
-        q = db.query(Auditoria).filter(
-            and_(
-                Auditoria.objeto == objeto,
-                func.date(Auditoria.data) >= data_inicio,
-                func.date(Auditoria.data) <= data_fim
-            )
-        )
-        if acao:
-            q = q.filter(Auditoria.acao == acao)
-        if clinica_id:
-            q = q.filter(Auditoria.clinica_id == clinica_id)
-        return q.count()
+    financial_objects = ["Fatura", "Parcela", "CashierPayment", "CaixaSession", "Orçamento"]
+    contagens = _contagens(db, data_inicio, data_fim, clinica_id, objetos=financial_objects)
+
+    por_objeto_acao: Dict[Tuple[str, str], int] = {}
+    for objeto, acao, _, total in contagens:
+        por_objeto_acao[(objeto, acao)] = por_objeto_acao.get((objeto, acao), 0) + total
+
+    def count_ops(objeto: str, acao: str) -> int:
+        return por_objeto_acao.get((objeto, acao), 0)
 
     # Count specific financial operations
     faturas_criadas = count_ops("Fatura", "Criação")
     faturas_atualizadas = count_ops("Fatura", "Atualização")
     pagamentos_registrados = count_ops("CashierPayment", "Criação")
     parcelas_pagas = count_ops("Parcela", "Atualização")
-
     orcamentos_criados = count_ops("Orçamento", "Criação")
-    orcamentos_aprovados = db.query(Auditoria).filter(
-        and_(
-            Auditoria.objeto == "Orçamento",
-            Auditoria.acao == "Atualização",
-            Auditoria.detalhes.like("%aprovado%"),
-            func.date(Auditoria.data) >= data_inicio,
-            func.date(Auditoria.data) <= data_fim
-        )
-    ).count() if clinica_id is None else db.query(Auditoria).filter(
-        and_(
-            Auditoria.objeto == "Orçamento",
-            Auditoria.acao == "Atualização",
-            Auditoria.detalhes.like("%aprovado%"),
-            Auditoria.clinica_id == clinica_id,
-            func.date(Auditoria.data) >= data_inicio,
-            func.date(Auditoria.data) <= data_fim
-        )
-    ).count()
-
-    orcamentos_rejeitados = db.query(Auditoria).filter(
-        and_(
-            Auditoria.objeto == "Orçamento",
-            Auditoria.acao == "Atualização",
-            Auditoria.detalhes.like("%rejeitado%"),
-            func.date(Auditoria.data) >= data_inicio,
-            func.date(Auditoria.data) <= data_fim
-        )
-    ).count() if clinica_id is None else db.query(Auditoria).filter(
-        and_(
-            Auditoria.objeto == "Orçamento",
-            Auditoria.acao == "Atualização",
-            Auditoria.detalhes.like("%rejeitado%"),
-            Auditoria.clinica_id == clinica_id,
-            func.date(Auditoria.data) >= data_inicio,
-            func.date(Auditoria.data) <= data_fim
-        )
-    ).count()
-
     sessoes_caixa_abertas = count_ops("CaixaSession", "Criação")
-    sessoes_caixa_fechadas = db.query(Auditoria).filter(
-        and_(
-            Auditoria.objeto == "CaixaSession",
-            Auditoria.acao == "Atualização",
-            Auditoria.detalhes.like("%fechada%"),
-            func.date(Auditoria.data) >= data_inicio,
-            func.date(Auditoria.data) <= data_fim
-        )
-    ).count() if clinica_id is None else db.query(Auditoria).filter(
-        and_(
-            Auditoria.objeto == "CaixaSession",
-            Auditoria.acao == "Atualização",
-            Auditoria.detalhes.like("%fechada%"),
-            Auditoria.clinica_id == clinica_id,
-            func.date(Auditoria.data) >= data_inicio,
-            func.date(Auditoria.data) <= data_fim
-        )
-    ).count()
-
     pagamentos_caixa = count_ops("CashierPayment", "Criação")
 
-    # Operations by user (financial only)
-    financial_objects = ["Fatura", "Parcela", "CashierPayment", "CaixaSession", "Orçamento"]
-    user_ops_query = db.query(
-        Auditoria.utilizador_id,
-        Utilizador.nome,
-        func.count(Auditoria.id).label('count')
-    ).join(
-        Utilizador, Auditoria.utilizador_id == Utilizador.id
+    # State changes are only recorded in the details text, so these come
+    # from the raw table, all in one query
+    state_query = db.query(
+        func.count(Auditoria.id).filter(
+            Auditoria.objeto == "Orçamento", Auditoria.detalhes.like("%aprovado%")
+        ),
+        func.count(Auditoria.id).filter(
+            Auditoria.objeto == "Orçamento", Auditoria.detalhes.like("%rejeitado%")
+        ),
+        func.count(Auditoria.id).filter(
+            Auditoria.objeto == "CaixaSession", Auditoria.detalhes.like("%fechada%")
+        )
     ).filter(
         and_(
-            Auditoria.objeto.in_(financial_objects),
-            func.date(Auditoria.data) >= data_inicio,
-            func.date(Auditoria.data) <= data_fim
+            Auditoria.objeto.in_(["Orçamento", "CaixaSession"]),
+            Auditoria.acao == "Atualização",
+            _no_periodo(data_inicio, data_fim)
         )
     )
     if clinica_id:
-        user_ops_query = user_ops_query.filter(Auditoria.clinica_id == clinica_id)
+        state_query = state_query.filter(Auditoria.clinica_id == clinica_id)
 
-    operacoes_por_utilizador = [
-        {"id": uid, "nome": nome, "count": count}
-        for uid, nome, count in user_ops_query.group_by(
-            Auditoria.utilizador_id, Utilizador.nome
-        ).order_by(func.count(Auditoria.id).desc()).limit(10).all()
-    ]
+    orcamentos_aprovados, orcamentos_rejeitados, sessoes_caixa_fechadas = state_query.one()
+
+    # Operations by user (financial only)
+    operacoes_por_utilizador = _top_utilizadores(db, contagens, 10)
 
     return schemas.FinancialOperationsSummary(
         periodo_inicio=data_inicio,
@@ -537,10 +498,7 @@ def get_timeline(
     query = db.query(Auditoria).join(
         Utilizador, Auditoria.utilizador_id == Utilizador.id
     ).filter(
-        and_(
-            func.date(Auditoria.data) >= data_inicio,
-            func.date(Auditoria.data) <= data_fim
-        )
+        _no_periodo(data_inicio, data_fim)
     )
 
     if modulo:
@@ -582,59 +540,41 @@ def get_daily_activity(
     if not data_inicio:
         data_inicio = data_fim - timedelta(days=30)
 
-    # Query grouped by date
+    # Single scan: one row per (day, module, user), pivoted below
+    dia = func.date(Auditoria.data).label('dia')
     query = db.query(
-        func.date(Auditoria.data).label('data'),
-        func.count(Auditoria.id).label('total')
+        dia,
+        Auditoria.objeto,
+        Auditoria.utilizador_id,
+        func.count(Auditoria.id)
     ).filter(
-        and_(
-            func.date(Auditoria.data) >= data_inicio,
-            func.date(Auditoria.data) <= data_fim
-        )
+        _no_periodo(data_inicio, data_fim)
     )
 
     if clinica_id:
         query = query.filter(Auditoria.clinica_id == clinica_id)
 
-    daily_totals = {data: total for data, total in query.group_by(func.date(Auditoria.data)).all()}
+    daily_totals: Dict[date, int] = {}
+    por_modulo: Dict[date, Dict[str, int]] = {}
+    por_utilizador: Dict[date, Dict[str, int]] = {}
+    for dia_registo, objeto, uid, count in query.group_by(
+        dia, Auditoria.objeto, Auditoria.utilizador_id
+    ).all():
+        daily_totals[dia_registo] = daily_totals.get(dia_registo, 0) + count
+        modulos = por_modulo.setdefault(dia_registo, {})
+        modulos[objeto] = modulos.get(objeto, 0) + count
+        utilizadores = por_utilizador.setdefault(dia_registo, {})
+        utilizadores[str(uid)] = utilizadores.get(str(uid), 0) + count
 
     # Build response for each day
     daily_activities = []
     current_date = data_inicio
     while current_date <= data_fim:
-        # Get breakdown by module for this day
-        module_query = db.query(
-            Auditoria.objeto,
-            func.count(Auditoria.id)
-        ).filter(func.date(Auditoria.data) == current_date)
-
-        if clinica_id:
-            module_query = module_query.filter(Auditoria.clinica_id == clinica_id)
-
-        por_modulo = {
-            obj: count
-            for obj, count in module_query.group_by(Auditoria.objeto).all()
-        }
-
-        # Get breakdown by user for this day
-        user_query = db.query(
-            Auditoria.utilizador_id,
-            func.count(Auditoria.id)
-        ).filter(func.date(Auditoria.data) == current_date)
-
-        if clinica_id:
-            user_query = user_query.filter(Auditoria.clinica_id == clinica_id)
-
-        por_utilizador = {
-            str(uid): count
-            for uid, count in user_query.group_by(Auditoria.utilizador_id).all()
-        }
-
         daily_activities.append(schemas.DailyActivitySummary(
             data=current_date,
             total_operacoes=daily_totals.get(current_date, 0),
-            por_modulo=por_modulo,
-            por_utilizador=por_utilizador
+            por_modulo=por_modulo.get(current_date, {}),
+            por_utilizador=por_utilizador.get(current_date, {})
         ))
 
         current_date += timedelta(days=1)
@@ -16,9 +16,86 @@ class Settings(BaseSettings):
     DB_USER: str = "admin"
     DB_PASSWORD: str = "admin123"
 
+    # Connection pool (SQLAlchemy QueuePool)
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: int = 10           # segundos à espera de uma ligação livre
+    DB_POOL_RECYCLE: int = 1800         # segundos até reciclar uma ligação
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_TIMEOUT_MS: int = 0    # 0 = sem limite
+
     # Security
     SECRET_KEY: str = "supersegredo"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60
+    # Cache em memória das sessões autenticadas (por worker)
+    AUTH_CACHE_TTL_SECONDS: int = 60
+    AUTH_CACHE_MAX_ENTRIES: int = 10000
+    # Cache em memória das configurações das clínicas (por worker)
+    CONFIG_CACHE_TTL_SECONDS: int = 300
+    CONFIG_CACHE_MAX_ENTRIES: int = 1000
+
+    # Auditoria: "sync" grava cada registo na transação do pedido; "buffered"
+    # envia-os para um escritor em background que insere em lote.
+    AUDITORIA_MODO: str = "buffered"
+    AUDITORIA_BUFFER_MAX_ROWS: int = 500
+    AUDITORIA_BUFFER_FLUSH_MS: int = 200
+    # Objetos cuja auditoria é sempre gravada de forma síncrona
+    AUDITORIA_OBJETOS_SINCRONOS: list[str] = [
+        "Fatura", "Parcela", "Parcelas", "CashierPayment", "CaixaSession", "Orçamento"
+    ]
+
+    # Alertas de stock: número máximo de clínicas a enviar e-mail em simultâneo
+    STOCK_ALERTS_MAX_CONCORRENCIA: int = 5
+    # Scheduler: arrancar nos workers web (false quando corre em processo próprio,
+    # python -m src.scheduler.worker), tolerância a atrasos e dias de histórico
+    SCHEDULER_ENABLED: bool = True
+    SCHEDULER_MISFIRE_GRACE_SECONDS: int = 300
+    SCHEDULER_HISTORICO_DIAS: int = 90
+
+    # Lembretes automáticos de consulta: intervalo do job, tentativas por lembrete e máximo por execução
+    LEMBRETES_ENABLED: bool = True
+    LEMBRETES_INTERVALO_MINUTOS: int = 15
+    LEMBRETES_MAX_TENTATIVAS: int = 3
+    LEMBRETES_MAX_POR_EXECUCAO: int = 2000
+    # Número máximo de linhas numa importação de entradas de stock
+    STOCK_IMPORTACAO_MAX_LINHAS: int = 2000
+
+    # Cache em disco dos PDFs gerados (faturas, orçamentos, planos)
+    PDF_CACHE_ENABLED: bool = True
+    PDF_CACHE_DIR: str = str(BASE_DIR / "src" / "pdf" / "generated_pdfs" / "cache")
+    PDF_CACHE_MAX_MB: int = 512
+    # Processos de renderização de PDFs (0 = renderizar numa thread do próprio worker)
+    PDF_RENDER_WORKERS: int = 2
+    # Pedidos de PDF em espera a partir dos quais se responde 503
+    PDF_RENDER_MAX_FILA: int = 100
+    # Exportação de PDFs em ZIP: máximo de documentos por lote e tempo de vida do ZIP
+    PDF_LOTE_MAX_DOCUMENTOS: int = 1000
+    PDF_LOTE_TTL_SECONDS: int = 3600
+    # Pasta dos ZIPs dos lotes; com vários workers/instâncias tem de ser partilhada (ex.: volume montado)
+    PDF_LOTES_DIR: str = str(BASE_DIR / "src" / "pdf" / "generated_pdfs" / "lotes")
+
+    # Envio de e-mails em massa: ligações SMTP por clínica e no total, timeout SMTP
+    EMAIL_MASSA_LIGACOES_POR_CLINICA: int = 3
+    EMAIL_MASSA_MAX_LIGACOES: int = 10
+    EMAIL_SMTP_TIMEOUT_SECONDS: int = 30
+    # Servidor SMTP local ("host:port") que recebe todos os e-mails (desenvolvimento/testes)
+    EMAIL_SMTP_LOCAL: str | None = None
+
+    # Outbox de e-mails: workers, intervalo de polling, tentativas e backoff exponencial
+    EMAIL_OUTBOX_ENABLED: bool = True
+    EMAIL_OUTBOX_WORKERS: int = 4
+    EMAIL_OUTBOX_POLL_SECONDS: float = 5.0
+    EMAIL_OUTBOX_MAX_TENTATIVAS: int = 5
+    EMAIL_OUTBOX_BACKOFF_BASE_SECONDS: int = 30
+    EMAIL_OUTBOX_BACKOFF_MAX_SECONDS: int = 3600
+    # Tempo após o qual um envio "em_envio" é considerado abandonado (worker morreu)
+    EMAIL_OUTBOX_LEASE_SECONDS: int = 300
+    # Máximo de e-mails por minuto por clínica (por processo)
+    EMAIL_OUTBOX_LIMITE_POR_MINUTO: int = 30
+    # Dias durante os quais os envios concluídos ficam na outbox
+    EMAIL_OUTBOX_RETENCAO_DIAS: int = 30
+    # Pasta do bytecode compilado dos templates de e-mail (vazio = pasta temporária)
+    EMAIL_TEMPLATES_BYTECODE_DIR: str | None = None
 
     # Environment
     ENVIRONMENT: str = "development"
@@ -1,18 +1,122 @@
-import os
-from sqlalchemy import create_engine
+import logging
+import threading
+import time
+from sqlalchemy import create_engine, exc
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import QueuePool
 from src.core.config import settings
 
+logger = logging.getLogger(__name__)
+
 # Use the database_url property from settings which handles both individual params and DATABASE_URL
 DATABASE_URL = settings.database_url
 
-print(f"🔗 Using database: {DATABASE_URL}")
+
+class PoolStats:
+    """
+    Estatísticas de espera por ligações do pool, para o endpoint de métricas.
+    Guarda os últimos `janela` tempos de espera para calcular percentis.
+    """
+
+    def __init__(self, janela: int = 2048):
+        self._lock = threading.Lock()
+        self._janela = janela
+        self._esperas: list[float] = []
+        self._pos = 0
+        self.total_checkouts = 0
+        self.total_timeouts = 0
+        self.espera_maxima_ms = 0.0
+
+    def registar_espera(self, segundos: float, timeout: bool = False) -> None:
+        ms = segundos * 1000
+        with self._lock:
+            if timeout:
+                self.total_timeouts += 1
+            else:
+                self.total_checkouts += 1
+            self.espera_maxima_ms = max(self.espera_maxima_ms, ms)
+            if len(self._esperas) < self._janela:
+                self._esperas.append(ms)
+            else:
+                self._esperas[self._pos] = ms
+                self._pos = (self._pos + 1) % self._janela
+
+    def resumo(self) -> dict:
+        with self._lock:
+            esperas = sorted(self._esperas)
+            total_checkouts = self.total_checkouts
+            total_timeouts = self.total_timeouts
+            espera_maxima_ms = self.espera_maxima_ms
+
+        def percentil(p: float) -> float:
+            if not esperas:
+                return 0.0
+            return esperas[min(len(esperas) - 1, int(p * len(esperas)))]
+
+        return {
+            "total_checkouts": total_checkouts,
+            "total_timeouts": total_timeouts,
+            "espera_media_ms": sum(esperas) / len(esperas) if esperas else 0.0,
+            "espera_p50_ms": percentil(0.50),
+            "espera_p99_ms": percentil(0.99),
+            "espera_maxima_ms": espera_maxima_ms,
+        }
+
+
+pool_stats = PoolStats()
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool que mede quanto tempo cada checkout espera por uma ligação."""
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except exc.TimeoutError:
+            # Só a espera esgotada (pool_timeout); erros ao criar a ligação não contam
+            pool_stats.registar_espera(time.perf_counter() - inicio, timeout=True)
+            raise
+        pool_stats.registar_espera(time.perf_counter() - inicio)
+        return conn
+
+
+def _connect_args() -> dict:
+    if settings.DB_STATEMENT_TIMEOUT_MS and DATABASE_URL.startswith("postgresql"):
+        return {"options": f"-c statement_timeout={settings.DB_STATEMENT_TIMEOUT_MS}"}
+    return {}
+
 
 # Criação do engine
-engine = create_engine(DATABASE_URL)
+engine = create_engine(
+    DATABASE_URL,
+    poolclass=InstrumentedQueuePool,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
+    connect_args=_connect_args(),
+)
+
+logger.info("🔗 Using database: %s", engine.url.render_as_string(hide_password=True))
 
 # Criação da sessão
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 # Declarative Base que o Alembic usará
 Base = declarative_base()
+
+
+def get_pool_status() -> dict:
+    """Estado atual do pool de ligações e estatísticas de espera."""
+    pool = engine.pool
+    return {
+        "pool_size": pool.size(),
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": max(pool.overflow(), 0),
+        "timeout_segundos": pool.timeout(),
+        **pool_stats.resumo(),
+    }
@@ -0,0 +1,133 @@
+"""
+Envio de e-mails em massa (lembretes, cancelamentos) com ligações SMTP reutilizadas.
+
+O envio individual (EmailService.enviar_email) abre uma ligação SMTP por
+mensagem e, em caso de falha, repete com esperas de 4–10 s. Para centenas de
+mensagens isso são minutos. Aqui as mensagens de cada clínica são repartidas
+por até EMAIL_MASSA_LIGACOES_POR_CLINICA ligações, cada uma aberta uma única
+vez (connect + login) e usada para enviar a sua parte em sequência; as
+ligações de todas as clínicas correm em simultâneo, no máximo
+EMAIL_MASSA_MAX_LIGACOES de cada vez.
+
+Uma falha numa mensagem é reportada sem esperas; se a ligação cair, é reaberta
+e a mensagem repetida uma vez.
+"""
+
+import asyncio
+import logging
+from dataclasses import dataclass
+from email.message import EmailMessage
+from email.utils import formataddr, make_msgid
+from typing import Dict, List, Optional, Tuple
+
+import aiosmtplib
+
+from src.core.config import settings
+from src.email.schemas import EmailConfig
+from src.email.util import parametros_smtp
+
+logger = logging.getLogger("app.email")
+
+
+@dataclass
+class MensagemEmail:
+    id: int              # identificador do chamador (ex.: marcacao_id)
+    assunto: str
+    destinatario: str
+    html: str
+
+
+def _construir_mime(config: EmailConfig, mensagem: MensagemEmail) -> EmailMessage:
+    msg = EmailMessage()
+    msg["Subject"] = mensagem.assunto
+    msg["From"] = formataddr((config.nome_remetente, config.remetente)) if config.nome_remetente else config.remetente
+    msg["To"] = mensagem.destinatario
+    msg["Message-ID"] = make_msgid()
+    msg.set_content(mensagem.html, subtype="html")
+    return msg
+
+
+async def _abrir_ligacao(config: EmailConfig) -> aiosmtplib.SMTP:
+    """Ligação SMTP com os mesmos parâmetros usados pelo EmailService (FastMail)."""
+    parametros = parametros_smtp(config)
+    smtp = aiosmtplib.SMTP(
+        hostname=parametros["host"],
+        port=parametros["porta"],
+        use_tls=parametros["ssl"],
+        start_tls=parametros["starttls"],
+        timeout=settings.EMAIL_SMTP_TIMEOUT_SECONDS,
+    )
+    await smtp.connect()
+    if parametros["login"]:
+        await smtp.login(config.utilizador_smtp, config.password_smtp)
+    return smtp
+
+
+async def _fechar_ligacao(smtp: Optional[aiosmtplib.SMTP]) -> None:
+    if smtp is None or not smtp.is_connected:
+        return
+    try:
+        await smtp.quit()
+    except Exception:
+        smtp.close()
+
+
+async def _enviar_por_ligacao(
+    config: EmailConfig,
+    mensagens: List[MensagemEmail],
+    resultados: Dict[int, Optional[str]],
+    semaforo: asyncio.Semaphore,
+) -> None:
+    """Envia `mensagens` em sequência por uma única ligação SMTP."""
+    async with semaforo:
+        smtp = None
+        try:
+            try:
+                smtp = await _abrir_ligacao(config)
+            except Exception as e:
+                for mensagem in mensagens:
+                    resultados[mensagem.id] = f"Falha na ligação SMTP: {e}"
+                return
+
+            for mensagem in mensagens:
+                mime = _construir_mime(config, mensagem)
+                try:
+                    await smtp.send_message(mime)
+                    resultados[mensagem.id] = None
+                except aiosmtplib.SMTPServerDisconnected:
+                    # Ligação caiu (timeout do servidor, limite de mensagens): reabrir e repetir uma vez
+                    try:
+                        await _fechar_ligacao(smtp)
+                        smtp = await _abrir_ligacao(config)
+                        await smtp.send_message(mime)
+                        resultados[mensagem.id] = None
+                    except Exception as e:
+                        resultados[mensagem.id] = str(e)
+                except Exception as e:
+                    resultados[mensagem.id] = str(e)
+        finally:
+            await _fechar_ligacao(smtp)
+
+
+async def enviar_em_massa(
+    por_clinica: Dict[int, Tuple[EmailConfig, List[MensagemEmail]]],
+) -> Dict[int, Optional[str]]:
+    """
+    Envia as mensagens de várias clínicas. Devolve, por id de mensagem,
+    None se foi enviada ou a descrição do erro.
+    """
+    resultados: Dict[int, Optional[str]] = {}
+    semaforo = asyncio.Semaphore(settings.EMAIL_MASSA_MAX_LIGACOES)
+    tarefas = []
+    for config, mensagens in por_clinica.values():
+        if not mensagens:
+            continue
+        n_ligacoes = min(settings.EMAIL_MASSA_LIGACOES_POR_CLINICA, len(mensagens))
+        for i in range(n_ligacoes):
+            tarefas.append(_enviar_por_ligacao(config, mensagens[i::n_ligacoes], resultados, semaforo))
+
+    await asyncio.gather(*tarefas)
+
+    enviados = sum(1 for erro in resultados.values() if erro is None)
+    logger.info("Envio em massa: %d enviados, %d erros", enviados, len(resultados) - enviados)
+    return resultados
@@ -0,0 +1,33 @@
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, JSON, String, Text
+
+from src.database import Base
+
+
+class EmailOutbox(Base):
+    """
+    Fila persistente de e-mails a enviar (outbox). Os endpoints apenas
+    registam o pedido; os workers de src.email.outbox renderizam e enviam,
+    com novas tentativas (backoff exponencial) e, esgotadas estas, o pedido
+    fica no estado "falhado" (dead letter) até ser reenviado manualmente.
+    """
+    __tablename__ = "EmailOutbox"
+
+    id = Column(Integer, primary_key=True, index=True)
+    clinica_id = Column(Integer, ForeignKey("Clinica.id"), nullable=False, index=True)
+    tipo = Column(String(30), nullable=False)          # fatura, orcamento, plano, lembrete, ...
+    parametros = Column(JSON, nullable=False, default=dict)
+    estado = Column(String(20), nullable=False, default="pendente")  # pendente, em_envio, enviado, falhado
+    tentativas = Column(Integer, nullable=False, default=0)
+    max_tentativas = Column(Integer, nullable=False)
+    proxima_tentativa_em = Column(DateTime, nullable=False, default=datetime.utcnow)
+    bloqueado_ate = Column(DateTime, nullable=True)    # lease do worker que está a enviar
+    ultimo_erro = Column(Text, nullable=True)
+    criado_por_id = Column(Integer, ForeignKey("Utilizador.id"), nullable=True)
+    criado_em = Column(DateTime, nullable=False, default=datetime.utcnow)
+    enviado_em = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_emailoutbox_estado_proxima", "estado", "proxima_tentativa_em"),
+    )
@@ -0,0 +1,409 @@
+"""
+Outbox de e-mails: fila persistente (tabela EmailOutbox) e workers assíncronos.
+
+Os endpoints registam o pedido (`enfileirar`) e respondem 202 com o id do
+envio; o envio (geração do PDF, render do template e SMTP) é feito por
+EMAIL_OUTBOX_WORKERS tarefas asyncio arrancadas com a aplicação.
+
+- Cada worker reserva um pedido com SELECT ... FOR UPDATE SKIP LOCKED, pelo
+  que vários processos/instâncias podem partilhar a mesma fila. A reserva é
+  um lease (EMAIL_OUTBOX_LEASE_SECONDS): se o worker morrer, o pedido volta
+  a ficar disponível (enquanto houver tentativas). Só o worker que detém a
+  reserva pode concluir o pedido.
+- Falhas temporárias são repetidas com backoff exponencial (com jitter);
+  erros definitivos (4xx: fatura inexistente, paciente sem e-mail, clínica
+  sem configuração) ou tentativas esgotadas deixam o pedido "falhado"
+  (dead letter), de onde pode ser reenviado manualmente.
+- Cada clínica tem um limite de e-mails por minuto (token bucket por
+  processo, EMAIL_OUTBOX_LIMITE_POR_MINUTO); pedidos de clínicas no limite
+  ficam na fila sem gastar tentativas.
+"""
+
+import asyncio
+import logging
+import random
+import threading
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from fastapi import HTTPException, status
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from src.core.config import settings
+from src.database import SessionLocal
+from src.email.models import EmailOutbox
+from src.email.service import EmailManager
+from src.email.util import get_email_config
+
+logger = logging.getLogger("app.email")
+
+PENDENTE = "pendente"
+EM_ENVIO = "em_envio"
+ENVIADO = "enviado"
+FALHADO = "falhado"
+
+
+# ──────────────────────────────────────────────────────────────
+# Tipos de e-mail
+# ──────────────────────────────────────────────────────────────
+
+async def _enviar_fatura(manager: EmailManager, db: Session, clinica_id: int, p: dict):
+    await manager.enviar_fatura(p["fatura_id"], clinica_id, p.get("email_para"))
+
+
+async def _enviar_orcamento(manager: EmailManager, db: Session, clinica_id: int, p: dict):
+    await manager.enviar_orcamento(p["orcamento_id"], clinica_id, p.get("email_para"))
+
+
+async def _enviar_plano(manager: EmailManager, db: Session, clinica_id: int, p: dict):
+    await manager.enviar_plano(p["plano_id"], clinica_id, p.get("email_para"))
+
+
+async def _enviar_lembrete(manager: EmailManager, db: Session, clinica_id: int, p: dict):
+    from src.marcacoes.service import get_marcacao, registar_lembretes_enviados
+    await manager.enviar_lembrete(get_marcacao(db, p["marcacao_id"]))
+    registar_lembretes_enviados(db, [p["marcacao_id"]])
+
+
+async def _enviar_cancelamento(manager: EmailManager, db: Session, clinica_id: int, p: dict):
+    from src.marcacoes.service import get_marcacao
+    await manager.enviar_cancelamento(get_marcacao(db, p["marcacao_id"]))
+
+
+async def _enviar_utilizador(manager: EmailManager, db: Session, clinica_id: int, p: dict):
+    await manager.enviar_email_utilizador(
+        utilizador_id=p["utilizador_id"],
+        clinica_id=clinica_id,
+        assunto=p["assunto"],
+        mensagem=p["mensagem"],
+        email_para=p.get("email_para"),
+    )
+
+
+async def _enviar_alertas_stock(manager: EmailManager, db: Session, clinica_id: int, p: dict):
+    # Os itens foram guardados em JSON: repor as datas de validade
+    itens_expirando = [
+        {**item, "validade": date.fromisoformat(item["validade"])} for item in p.get("itens_expirando", [])
+    ]
+    await manager.enviar_alertas_stock(
+        clinica_id=clinica_id,
+        itens_baixo_stock=p.get("itens_baixo_stock", []),
+        itens_expirando=itens_expirando,
+    )
+
+
+TIPOS: Dict[str, Callable[[EmailManager, Session, int, dict], Awaitable[None]]] = {
+    "fatura": _enviar_fatura,
+    "orcamento": _enviar_orcamento,
+    "plano": _enviar_plano,
+    "lembrete": _enviar_lembrete,
+    "cancelamento": _enviar_cancelamento,
+    "utilizador": _enviar_utilizador,
+    "alertas_stock": _enviar_alertas_stock,
+}
+
+
+# ──────────────────────────────────────────────────────────────
+# Fila
+# ──────────────────────────────────────────────────────────────
+
+def enfileirar(
+    db: Session,
+    tipo: str,
+    clinica_id: int,
+    parametros: Dict[str, Any],
+    utilizador_id: Optional[int] = None,
+) -> EmailOutbox:
+    """Regista um e-mail a enviar e acorda os workers."""
+    if tipo not in TIPOS:
+        raise ValueError(f"Tipo de e-mail desconhecido: {tipo}")
+    envio = EmailOutbox(
+        clinica_id=clinica_id,
+        tipo=tipo,
+        parametros=jsonable_encoder(parametros),
+        estado=PENDENTE,
+        tentativas=0,
+        max_tentativas=settings.EMAIL_OUTBOX_MAX_TENTATIVAS,
+        proxima_tentativa_em=datetime.utcnow(),
+        criado_por_id=utilizador_id,
+    )
+    db.add(envio)
+    db.commit()
+    db.refresh(envio)
+    email_outbox.notificar()
+    return envio
+
+
+def obter_envio(db: Session, envio_id: int) -> EmailOutbox:
+    envio = db.get(EmailOutbox, envio_id)
+    if not envio:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, "Envio de e-mail não encontrado")
+    return envio
+
+
+def listar_envios(
+    db: Session,
+    clinica_id: int,
+    estado: Optional[str] = None,
+    limit: int = 50,
+) -> List[EmailOutbox]:
+    query = db.query(EmailOutbox).filter(EmailOutbox.clinica_id == clinica_id)
+    if estado:
+        query = query.filter(EmailOutbox.estado == estado)
+    return query.order_by(EmailOutbox.id.desc()).limit(limit).all()
+
+
+def reenviar(db: Session, envio_id: int) -> EmailOutbox:
+    """Volta a pôr na fila um envio falhado (dead letter), com as tentativas a zero."""
+    envio = obter_envio(db, envio_id)
+    if envio.estado != FALHADO:
+        raise HTTPException(status.HTTP_409_CONFLICT, f"Só envios falhados podem ser reenviados (estado: {envio.estado})")
+    envio.estado = PENDENTE
+    envio.tentativas = 0
+    envio.proxima_tentativa_em = datetime.utcnow()
+    db.commit()
+    db.refresh(envio)
+    email_outbox.notificar()
+    return envio
+
+
+def limpar_enviados(dias: int) -> int:
+    """Remove os envios concluídos há mais de `dias` dias."""
+    db = SessionLocal()
+    try:
+        removidos = db.query(EmailOutbox).filter(
+            EmailOutbox.estado == ENVIADO,
+            EmailOutbox.enviado_em < datetime.utcnow() - timedelta(days=dias)
+        ).delete(synchronize_session=False)
+        db.commit()
+        return removidos
+    finally:
+        db.close()
+
+
+# ──────────────────────────────────────────────────────────────
+# Workers
+# ──────────────────────────────────────────────────────────────
+
+class _LimitadorClinicas:
+    """Token bucket por clínica: `por_minuto` e-mails, com rajada até esse valor."""
+
+    def __init__(self, por_minuto: int):
+        self.capacidade = float(por_minuto)
+        self.taxa = por_minuto / 60.0
+        self._baldes: Dict[int, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def _tokens(self, clinica_id: int, agora: float) -> List[float]:
+        balde = self._baldes.setdefault(clinica_id, [self.capacidade, agora])
+        balde[0] = min(self.capacidade, balde[0] + (agora - balde[1]) * self.taxa)
+        balde[1] = agora
+        return balde
+
+    def bloqueadas(self) -> List[int]:
+        agora = time.monotonic()
+        with self._lock:
+            return [cid for cid in list(self._baldes) if self._tokens(cid, agora)[0] < 1]
+
+    def consumir(self, clinica_id: int) -> None:
+        with self._lock:
+            self._tokens(clinica_id, time.monotonic())[0] -= 1
+
+
+@dataclass
+class _Reserva:
+    id: int
+    tipo: str
+    clinica_id: int
+    parametros: dict
+    tentativa: int
+
+
+def _backoff(tentativa: int) -> float:
+    segundos = min(
+        settings.EMAIL_OUTBOX_BACKOFF_BASE_SECONDS * 2 ** (tentativa - 1),
+        settings.EMAIL_OUTBOX_BACKOFF_MAX_SECONDS,
+    )
+    return segundos * random.uniform(0.8, 1.2)
+
+
+class EmailOutboxWorkers:
+    def __init__(self, workers: int, poll_segundos: float):
+        self.workers = workers
+        self.poll_segundos = poll_segundos
+        self.limitador = _LimitadorClinicas(settings.EMAIL_OUTBOX_LIMITE_POR_MINUTO)
+        self._tarefas: List[asyncio.Task] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._novo: Optional[asyncio.Event] = None
+
+    # ---------- ciclo de vida -------------------------------------
+    def iniciar(self) -> None:
+        """Arranca os workers no event loop atual (startup da aplicação)."""
+        if self._tarefas:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._novo = asyncio.Event()
+        self._tarefas = [asyncio.create_task(self._worker(n)) for n in range(self.workers)]
+        logger.info(f"📬 Outbox de e-mails iniciada ({self.workers} worker(s))")
+
+    async def parar(self) -> None:
+        for tarefa in self._tarefas:
+            tarefa.cancel()
+        await asyncio.gather(*self._tarefas, return_exceptions=True)
+        self._tarefas = []
+
+    def notificar(self) -> None:
+        """Acorda os workers (pode ser chamado de qualquer thread)."""
+        if self._loop is not None and self._novo is not None:
+            self._loop.call_soon_threadsafe(self._novo.set)
+
+    # ---------- base de dados (corre numa thread) -----------------
+    def _reservar(self) -> Optional[_Reserva]:
+        agora = datetime.utcnow()
+        db = SessionLocal()
+        try:
+            # Lease expirado sem tentativas restantes (ex.: um e-mail que mata o
+            # worker a cada envio): dead letter em vez de o repetir para sempre
+            esgotados = db.query(EmailOutbox).filter(
+                EmailOutbox.estado == EM_ENVIO,
+                EmailOutbox.bloqueado_ate < agora,
+                EmailOutbox.tentativas >= EmailOutbox.max_tentativas,
+            ).update({
+                EmailOutbox.estado: FALHADO,
+                EmailOutbox.bloqueado_ate: None,
+                EmailOutbox.ultimo_erro: "Envio interrompido (lease expirado) em todas as tentativas",
+            }, synchronize_session=False)
+            if esgotados:
+                db.commit()
+                logger.warning(f"📭 {esgotados} e-mail(s) falhado(s) após envios interrompidos")
+
+            query = db.query(EmailOutbox).filter(
+                or_(
+                    and_(EmailOutbox.estado == PENDENTE, EmailOutbox.proxima_tentativa_em <= agora),
+                    and_(
+                        EmailOutbox.estado == EM_ENVIO,
+                        EmailOutbox.bloqueado_ate < agora,
+                        EmailOutbox.tentativas < EmailOutbox.max_tentativas,
+                    ),
+                )
+            )
+            bloqueadas = self.limitador.bloqueadas()
+            if bloqueadas:
+                query = query.filter(EmailOutbox.clinica_id.notin_(bloqueadas))
+            envio = query.order_by(
+                EmailOutbox.proxima_tentativa_em, EmailOutbox.id
+            ).with_for_update(skip_locked=True).first()
+            if envio is None:
+                db.rollback()
+                return None
+
+            # UPDATE condicional: sem SKIP LOCKED (ex.: SQLite) outro worker
+            # pode ter lido o mesmo pedido; só um consegue reservá-lo
+            reservado = db.query(EmailOutbox).filter(
+                EmailOutbox.id == envio.id,
+                EmailOutbox.tentativas == envio.tentativas,
+            ).update({
+                EmailOutbox.estado: EM_ENVIO,
+                EmailOutbox.tentativas: envio.tentativas + 1,
+                EmailOutbox.bloqueado_ate: agora + timedelta(seconds=settings.EMAIL_OUTBOX_LEASE_SECONDS),
+            }, synchronize_session=False)
+            if reservado != 1:
+                db.rollback()
+                return None
+
+            reserva = _Reserva(envio.id, envio.tipo, envio.clinica_id, dict(envio.parametros or {}), envio.tentativas + 1)
+            db.commit()
+            self.limitador.consumir(reserva.clinica_id)
+            return reserva
+        finally:
+            db.close()
+
+    def _concluir(self, reserva: _Reserva, erro: Optional[str], definitivo: bool) -> None:
+        db = SessionLocal()
+        try:
+            # Só se a reserva ainda é deste worker: se o lease expirou e outro
+            # worker reservou o pedido (tentativas já incrementadas), é ele que conclui
+            envio = db.query(EmailOutbox).filter(
+                EmailOutbox.id == reserva.id,
+                EmailOutbox.estado == EM_ENVIO,
+                EmailOutbox.tentativas == reserva.tentativa,
+            ).with_for_update().first()
+            if envio is None:
+                db.rollback()
+                logger.warning(
+                    f"Outbox: reserva do e-mail {reserva.tipo} #{reserva.id} perdida "
+                    f"(lease expirado durante o envio); resultado descartado"
+                )
+                return
+            agora = datetime.utcnow()
+            envio.bloqueado_ate = None
+            if erro is None:
+                envio.estado = ENVIADO
+                envio.enviado_em = agora
+                envio.ultimo_erro = None
+            else:
+                envio.ultimo_erro = erro[:2000]
+                if definitivo or envio.tentativas >= envio.max_tentativas:
+                    envio.estado = FALHADO
+                    logger.warning(
+                        f"📭 E-mail {envio.tipo} #{envio.id} (clínica {envio.clinica_id}) falhado "
+                        f"após {envio.tentativas} tentativa(s): {erro}"
+                    )
+                else:
+                    envio.estado = PENDENTE
+                    envio.proxima_tentativa_em = agora + timedelta(seconds=_backoff(envio.tentativas))
+            db.commit()
+        finally:
+            db.close()
+
+    # ---------- envio ----------------------------------------------
+    async def _processar(self, reserva: _Reserva) -> None:
+        erro = None
+        definitivo = False
+        db = SessionLocal()
+        try:
+            config = await get_email_config(reserva.clinica_id, db)
+            # Uma única tentativa: as repetições são feitas pela outbox, com backoff
+            manager = EmailManager(db, config, tentativas=1)
+            await TIPOS[reserva.tipo](manager, db, reserva.clinica_id, reserva.parametros)
+        except HTTPException as e:
+            erro = str(e.detail)
+            definitivo = 400 <= e.status_code < 500
+        except Exception as e:
+            erro = str(e) or e.__class__.__name__
+        finally:
+            db.close()
+
+        await run_in_threadpool(self._concluir, reserva, erro, definitivo)
+
+    async def _worker(self, n: int) -> None:
+        while True:
+            try:
+                reserva = await run_in_threadpool(self._reservar)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Outbox: erro ao reservar e-mail: {e}")
+                reserva = None
+
+            if reserva is not None:
+                await self._processar(reserva)
+                continue
+
+            # Fila vazia: esperar por um novo pedido ou pelo próximo polling
+            self._novo.clear()
+            try:
+                await asyncio.wait_for(self._novo.wait(), timeout=self.poll_segundos)
+            except asyncio.TimeoutError:
+                pass
+
+
+email_outbox = EmailOutboxWorkers(
+    workers=settings.EMAIL_OUTBOX_WORKERS,
+    poll_segundos=settings.EMAIL_OUTBOX_POLL_SECONDS,
+)
@@ -6,10 +6,11 @@ from typing import List, Dict, Any, Optional
 
 from fastapi import HTTPException
 from fastapi_mail import FastMail, MessageSchema, ConnectionConfig
-from tenacity import retry, stop_after_attempt, wait_exponential
-from jinja2 import Environment, FileSystemLoader
+from tenacity import AsyncRetrying, stop_after_attempt, wait_exponential
 
 from src.email.schemas import EmailAttachment, EmailConfig   # mantém como estava
+from src.email.render import renderizar
+from src.email.util import parametros_smtp
 
 logger = logging.getLogger("app.email")
 
@@ -17,9 +18,12 @@ logger = logging.getLogger("app.email")
 class EmailService:
     """Serviço de baixo nível que envia e-mails usando FastMail."""
 
-    def __init__(self, config: EmailConfig):
+    def __init__(self, config: EmailConfig, tentativas: int = 3):
         self.config = config
+        # 1 = sem novas tentativas (ex.: outbox, que tem o seu próprio backoff)
+        self.tentativas = tentativas
 
+        smtp = parametros_smtp(config)
         self.connection_config = ConnectionConfig(
             MAIL_USERNAME   = config.utilizador_smtp,
             MAIL_PASSWORD   = config.password_smtp,
@@ -27,11 +31,11 @@ class EmailService:
                 f"{config.nome_remetente} <{config.remetente}>"
                 if config.nome_remetente else config.remetente
             ),
-            MAIL_PORT       = config.smtp_porta,
-            MAIL_SERVER     = config.smtp_host,
-            MAIL_STARTTLS   = config.usar_tls,
-            MAIL_SSL_TLS    = config.usar_ssl,
-            USE_CREDENTIALS = True,
+            MAIL_PORT       = smtp["porta"],
+            MAIL_SERVER     = smtp["host"],
+            MAIL_STARTTLS   = smtp["starttls"],
+            MAIL_SSL_TLS    = smtp["ssl"],
+            USE_CREDENTIALS = smtp["login"],
             VALIDATE_CERTS  = True,
             TEMPLATE_FOLDER = Path(__file__).parent / "templates",
         )
@@ -39,11 +43,17 @@ class EmailService:
         self.fast_mail = FastMail(self.connection_config)
 
     # ------------------------------------------------------------------
-    #  Enviar e-mail (com ou sem template / anexos) — 3 tentativas
+    #  Enviar e-mail (com ou sem template / anexos) — `tentativas` vezes
     # ------------------------------------------------------------------
-    @retry(stop=stop_after_attempt(3),
-           wait=wait_exponential(multiplier=1, min=4, max=10))
-    async def enviar_email(
+    async def enviar_email(self, *args, **kwargs) -> bool:
+        """Envia com até `self.tentativas` tentativas (ver _enviar_email)."""
+        if self.tentativas <= 1:
+            return await self._enviar_email(*args, **kwargs)
+        repetir = AsyncRetrying(stop=stop_after_attempt(self.tentativas),
+                                wait=wait_exponential(multiplier=1, min=4, max=10))
+        return await repetir(self._enviar_email, *args, **kwargs)
+
+    async def _enviar_email(
         self,
         assunto: str,
         destinatarios: List[str],
@@ -58,7 +68,7 @@ class EmailService:
           • Usa `nome_template`+`dados_template` → renderiza HTML.
           • Ou `html_corpo` / `corpo` se fornecidos.
           • Suporta anexos (EmailAttachment.content em bytes).
-        Lança HTTPException 500 se falhar após 3 tentativas.
+        Lança HTTPException 500 se falhar.
         """
         try:
             subtype = "html" if (html_corpo or nome_template) else "plain"
@@ -81,14 +91,7 @@ class EmailService:
                 # -------- renderização do corpo -------------------------
                 body_content = corpo or html_corpo or ""
                 if nome_template:
-                    env = Environment(
-                        loader=FileSystemLoader(
-                            Path(__file__).parent / "templates"
-                        )
-                    )
-                    env.filters["dt"] = lambda dt: dt.strftime("%d/%m/%Y %H:%M")
-                    tmpl = env.get_template(nome_template)
-                    body_content = tmpl.render(**(dados_template or {}))
+                    body_content = renderizar(nome_template, dados_template or {})
 
                 # -------- construir mensagem & enviar -------------------
                 msg = MessageSchema(
@@ -0,0 +1,57 @@
+"""
+Ambiente Jinja2 partilhado pelos templates de e-mail (src/email/templates).
+
+Um único Environment para o EmailManager, o EmailService e o envio em massa:
+cada template é compilado uma vez por processo (cache do Environment) e o
+bytecode fica em disco (FileSystemBytecodeCache), pelo que workers novos e
+processos reiniciados não voltam a compilar. `precompilar()` carrega todos os
+templates no arranque da aplicação, para o primeiro envio não pagar a
+compilação e um template com erro de sintaxe ser detetado logo.
+"""
+
+import logging
+import time
+from pathlib import Path
+from typing import Any, Dict
+
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+
+from src.core.config import settings
+
+logger = logging.getLogger("app.email")
+
+TEMPLATE_DIR = Path(__file__).parent / "templates"
+
+
+def _bytecode_cache() -> FileSystemBytecodeCache:
+    # Sem pasta configurada o Jinja2 usa uma pasta temporária do utilizador
+    if settings.EMAIL_TEMPLATES_BYTECODE_DIR:
+        pasta = Path(settings.EMAIL_TEMPLATES_BYTECODE_DIR)
+        pasta.mkdir(parents=True, exist_ok=True)
+        return FileSystemBytecodeCache(str(pasta))
+    return FileSystemBytecodeCache()
+
+
+env = Environment(
+    loader=FileSystemLoader(str(TEMPLATE_DIR)),
+    bytecode_cache=_bytecode_cache(),
+    # Em produção os templates não mudam: evita um stat() por render
+    auto_reload=settings.ENVIRONMENT != "production",
+    cache_size=-1,
+)
+env.filters["dt"] = lambda dt: dt.strftime("%d/%m/%Y %H:%M")
+
+
+def renderizar(nome_template: str, dados_template: Dict[str, Any]) -> str:
+    """HTML de um template de e-mail."""
+    return env.get_template(nome_template).render(**dados_template)
+
+
+def precompilar() -> int:
+    """Compila (ou lê do bytecode) todos os templates; devolve quantos."""
+    inicio = time.perf_counter()
+    nomes = env.list_templates(extensions=["html"])
+    for nome in nomes:
+        env.get_template(nome)
+    logger.info(f"✉️  {len(nomes)} templates de e-mail carregados em {(time.perf_counter() - inicio) * 1000:.1f} ms")
+    return len(nomes)
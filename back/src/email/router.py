@@ -7,7 +7,8 @@ from sqlalchemy.orm import Session
 from src.database import SessionLocal
 from src.utilizadores.dependencies import get_current_user
 from src.utilizadores.models import Utilizador
-from src.email.service import EmailManager
+from src.email import outbox
+from src.email.schemas import EmailEnvioResponse
 from src.email.util import get_email_config, test_email_config
 from src.marcacoes.service import get_marcacao as obter_marcacao   # função helper no seu módulo
 from src.stock.service import verificar_alertas_stock
@@ -40,7 +41,7 @@ async def testar_email(
     return {"detail": "Configuração OK"}
 
 # ---------- Fatura --------------------------------------------------------
-@router.post("/fatura/{fatura_id}")
+@router.post("/fatura/{fatura_id}", status_code=status.HTTP_202_ACCEPTED)
 async def enviar_fatura_email(
     fatura_id: int,
     clinica_id: int = Query(...),
@@ -48,13 +49,15 @@ async def enviar_fatura_email(
     db: Session = Depends(get_db),
     current_user: Utilizador = Depends(get_current_user),
 ):
-    config = await get_email_config(clinica_id, db)
-    svc = EmailManager(db, config)
-    await svc.enviar_fatura(fatura_id, clinica_id, email_para)
-    return {"detail": "Fatura enviada"}
+    await get_email_config(clinica_id, db)
+    envio = outbox.enfileirar(
+        db, "fatura", clinica_id,
+        {"fatura_id": fatura_id, "email_para": email_para}, current_user.id,
+    )
+    return {"detail": "Envio da fatura agendado", "envio_id": envio.id}
 
 # ---------- Orçamento -----------------------------------------------------
-@router.post("/orcamento/{orcamento_id}")
+@router.post("/orcamento/{orcamento_id}", status_code=status.HTTP_202_ACCEPTED)
 async def enviar_orcamento_email(
     orcamento_id: int,
     clinica_id: int = Query(...),
@@ -62,10 +65,12 @@ async def enviar_orcamento_email(
     db: Session = Depends(get_db),
     current_user: Utilizador = Depends(get_current_user),
 ):
-    config = await get_email_config(clinica_id, db)
-    svc = EmailManager(db, config)
-    await svc.enviar_orcamento(orcamento_id, clinica_id, email_para)
-    return {"detail": "Orçamento enviado"}
+    await get_email_config(clinica_id, db)
+    envio = outbox.enfileirar(
+        db, "orcamento", clinica_id,
+        {"orcamento_id": orcamento_id, "email_para": email_para}, current_user.id,
+    )
+    return {"detail": "Envio do orçamento agendado", "envio_id": envio.id}
 
 # ---------- Lembrete de consulta -----------------------------------------
 @router.post("/marcacoes/{marc_id}/lembrete", status_code=status.HTTP_202_ACCEPTED)
@@ -75,10 +80,9 @@ async def enviar_lembrete_email(
     current_user: Utilizador = Depends(get_current_user),
 ):
     marc = obter_marcacao(db, marc_id)
-    config = await get_email_config(marc.clinic_id, db)
-    svc = EmailManager(db, config)
-    await svc.enviar_lembrete(marc)
-    return {"detail": "Lembrete enviado"}
+    await get_email_config(marc.clinic_id, db)
+    envio = outbox.enfileirar(db, "lembrete", marc.clinic_id, {"marcacao_id": marc_id}, current_user.id)
+    return {"detail": "Envio do lembrete agendado", "envio_id": envio.id}
 
 # ---------- Cancelamento de consulta -------------------------------------
 @router.post("/marcacoes/{marc_id}/cancelamento", status_code=status.HTTP_202_ACCEPTED)
@@ -91,13 +95,12 @@ async def enviar_cancelamento_email(
     if marc.estado != "cancelada":
         raise HTTPException(400, "Marcação não está cancelada")
 
-    config = await get_email_config(marc.clinic_id, db)
-    svc = EmailManager(db, config)
-    await svc.enviar_cancelamento(marc)
-    return {"detail": "Cancelamento enviado"}
+    await get_email_config(marc.clinic_id, db)
+    envio = outbox.enfileirar(db, "cancelamento", marc.clinic_id, {"marcacao_id": marc_id}, current_user.id)
+    return {"detail": "Envio do cancelamento agendado", "envio_id": envio.id}
 
 # ---------- Plano de Tratamento -------------------------------------------
-@router.post("/plano/{plano_id}")
+@router.post("/plano/{plano_id}", status_code=status.HTTP_202_ACCEPTED)
 async def enviar_plano_email(
     plano_id: int,
     clinica_id: int = Query(...),
@@ -105,13 +108,15 @@ async def enviar_plano_email(
     db: Session = Depends(get_db),
     current_user: Utilizador = Depends(get_current_user),
 ):
-    config = await get_email_config(clinica_id, db)
-    svc = EmailManager(db, config)
-    await svc.enviar_plano(plano_id, clinica_id, email_para)
-    return {"detail": "Plano de Tratamento enviado"}
+    await get_email_config(clinica_id, db)
+    envio = outbox.enfileirar(
+        db, "plano", clinica_id,
+        {"plano_id": plano_id, "email_para": email_para}, current_user.id,
+    )
+    return {"detail": "Envio do Plano de Tratamento agendado", "envio_id": envio.id}
 
 # ---------- Email para Utilizador -----------------------------------------
-@router.post("/utilizador/{utilizador_id}")
+@router.post("/utilizador/{utilizador_id}", status_code=status.HTTP_202_ACCEPTED)
 async def enviar_email_utilizador(
     utilizador_id: int,
     clinica_id: int = Query(...),
@@ -123,19 +128,21 @@ async def enviar_email_utilizador(
     Envia um email customizado para um utilizador específico.
     Pode usar o email do utilizador ou um email alternativo fornecido.
     """
-    config = await get_email_config(clinica_id, db)
-    svc = EmailManager(db, config)
-    await svc.enviar_email_utilizador(
-        utilizador_id=utilizador_id,
-        clinica_id=clinica_id,
-        assunto=email_data.assunto,
-        mensagem=email_data.mensagem,
-        email_para=email_data.email_para
+    await get_email_config(clinica_id, db)
+    envio = outbox.enfileirar(
+        db, "utilizador", clinica_id,
+        {
+            "utilizador_id": utilizador_id,
+            "assunto": email_data.assunto,
+            "mensagem": email_data.mensagem,
+            "email_para": email_data.email_para,
+        },
+        current_user.id,
     )
-    return {"detail": "Email enviado com sucesso"}
+    return {"detail": "Envio do email agendado", "envio_id": envio.id}
 
 # ---------- Alertas de Stock ----------------------------------------------
-@router.post("/alertas-stock")
+@router.post("/alertas-stock", status_code=status.HTTP_202_ACCEPTED)
 async def enviar_alertas_stock_email(
     clinica_id: int = Query(..., description="ID da clínica"),
     dias_expiracao: int = Query(30, description="Dias para alerta de expiração"),
@@ -163,17 +170,17 @@ async def enviar_alertas_stock_email(
             }
         }
 
-    # Enviar email para assistentes
-    config = await get_email_config(clinica_id, db)
-    svc = EmailManager(db, config)
-    await svc.enviar_alertas_stock(
-        clinica_id=clinica_id,
-        itens_baixo_stock=itens_baixo_stock,
-        itens_expirando=itens_expirando
+    # Agendar email para assistentes
+    await get_email_config(clinica_id, db)
+    envio = outbox.enfileirar(
+        db, "alertas_stock", clinica_id,
+        {"itens_baixo_stock": itens_baixo_stock, "itens_expirando": itens_expirando},
+        current_user.id,
     )
 
     return {
-        "detail": "Alertas enviados com sucesso",
+        "detail": "Envio dos alertas agendado",
+        "envio_id": envio.id,
         "alertas": {
             "itens_baixo_stock": len(itens_baixo_stock),
             "itens_expirando": len(itens_expirando),
@@ -201,3 +208,34 @@ async def executar_verificacao_alertas_agora(
         "detail": "Verificação de alertas iniciada em background para todas as clínicas",
         "message": "Os alertas serão processados e enviados em alguns instantes"
     }
+
+# ---------- Outbox (estado dos envios) ------------------------------------
+@router.get("/envios", response_model=List[EmailEnvioResponse])
+def listar_envios_email(
+    clinica_id: int = Query(..., description="ID da clínica"),
+    estado: Optional[str] = Query(None, description="pendente, em_envio, enviado ou falhado"),
+    limit: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db),
+    current_user: Utilizador = Depends(get_current_user),
+):
+    return outbox.listar_envios(db, clinica_id, estado, limit)
+
+
+@router.get("/envios/{envio_id}", response_model=EmailEnvioResponse)
+def obter_envio_email(
+    envio_id: int,
+    db: Session = Depends(get_db),
+    current_user: Utilizador = Depends(get_current_user),
+):
+    """Estado de um envio agendado (devolvido em `envio_id` pelos endpoints de envio)."""
+    return outbox.obter_envio(db, envio_id)
+
+
+@router.post("/envios/{envio_id}/reenviar", response_model=EmailEnvioResponse, status_code=status.HTTP_202_ACCEPTED)
+def reenviar_envio_email(
+    envio_id: int,
+    db: Session = Depends(get_db),
+    current_user: Utilizador = Depends(get_current_user),
+):
+    """Volta a agendar um envio falhado (esgotou as tentativas ou teve um erro definitivo)."""
+    return outbox.reenviar(db, envio_id)
@@ -1,4 +1,5 @@
 from pydantic import BaseModel, EmailStr, Field
+from datetime import datetime
 from typing import List, Optional
 
 class EmailAttachment(BaseModel):
@@ -31,4 +32,20 @@ class EmailConfig(BaseModel):
     ativo: Optional[bool] = True
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class EmailEnvioResponse(BaseModel):
+    """Estado de um e-mail na outbox."""
+    id: int
+    clinica_id: int
+    tipo: str
+    estado: str
+    tentativas: int
+    max_tentativas: int
+    proxima_tentativa_em: Optional[datetime] = None
+    ultimo_erro: Optional[str] = None
+    criado_em: datetime
+    enviado_em: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
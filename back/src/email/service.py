@@ -9,28 +9,56 @@ Usa a classe EmailService antiga     → importada como RawEmailService
 
 from __future__ import annotations
 
-from pathlib import Path
 from typing import List, Dict, Any, Optional
 
 from fastapi import HTTPException
 from sqlalchemy.orm import Session
-from jinja2 import Environment, FileSystemLoader
-
 from src.email.raw_service import EmailService as RawEmailService
 from src.email.schemas      import EmailAttachment, EmailConfig
 
 # --------- serviços/DAO da tua app -----------------------------
-from src.faturacao.service  import get_fatura
 from src.orcamento.service  import get_orcamento
 from src.pacientes.service  import obter_paciente
 from src.clinica.service    import obter_clinica_por_id
 from src.marcacoes.models   import Marcacao
-from src.pdf.service        import generate_fatura_pdf, generate_orcamento_pdf, generate_plano_pdf
+from src.pdf.service        import (
+    carregar_faturas_pdf, documento_fatura_carregada_async,
+    documento_orcamento_pdf_async, documento_plano_pdf_async,
+)
 
 # ------------------ Jinja env partilhado -----------------------
-TEMPLATE_DIR = Path(__file__).parent / "templates"
-env = Environment(loader=FileSystemLoader(TEMPLATE_DIR))
-env.filters["dt"] = lambda dt: dt.strftime("%d/%m/%Y %H:%M")
+from src.email.render import renderizar as renderizar_corpo   # usado pelo envio em massa
+
+
+# ------------------ Mensagens de marcações ---------------------
+# Usadas pelo envio individual (EmailManager) e pelo envio em massa
+def mensagem_lembrete(marc: Marcacao) -> Dict[str, Any]:
+    return dict(
+        assunto        = f"Lembrete da sua consulta – {marc.data_hora_inicio:%d/%m %H:%M}",
+        destinatarios  = [marc.paciente.email],
+        nome_template  = "lembrete_consulta.html",
+        dados_template = {
+            "clinica":  marc.clinic,
+            "paciente": marc.paciente,
+            "medico":   marc.medico,
+            "marcacao": marc,
+        },
+    )
+
+
+def mensagem_cancelamento(marc: Marcacao) -> Dict[str, Any]:
+    return dict(
+        assunto        = f"Consulta cancelada – {marc.data_hora_inicio:%d/%m %H:%M}",
+        destinatarios  = [marc.paciente.email],
+        nome_template  = "consulta_cancelada.html",
+        dados_template = {
+            "clinica":  marc.clinic,
+            "paciente": marc.paciente,
+            "medico":   marc.medico,
+            "marcacao": marc,
+        },
+    )
+
 
 # ------------------ Fachada principal --------------------------
 class EmailManager:
@@ -39,9 +67,9 @@ class EmailManager:
     Recebe DB session para poder fazer look-ups e gerar PDFs.
     """
 
-    def __init__(self, db: Session, cfg: EmailConfig):
+    def __init__(self, db: Session, cfg: EmailConfig, tentativas: int = 3):
         self.db   = db
-        self.mail = RawEmailService(cfg)   # ← a tua classe antiga
+        self.mail = RawEmailService(cfg, tentativas=tentativas)   # ← a tua classe antiga
 
     # ---------- Fatura -----------------------------------------
     async def enviar_fatura(
@@ -50,18 +78,19 @@ class EmailManager:
         clinica_id: int,
         email_para: Optional[str] = None
     ):
-        fatura = get_fatura(self.db, fatura_id)
-        if not fatura:
+        # Fatura com itens, parcelas, paciente e clínica (reutilizada no PDF)
+        faturas = carregar_faturas_pdf(self.db, [fatura_id])
+        if not faturas:
             raise HTTPException(404, "Fatura não encontrada")
-
-        paciente = obter_paciente(self.db, fatura.paciente_id)
+        fatura   = faturas[0]
+        paciente = fatura.paciente
         clinica  = obter_clinica_por_id(self.db, clinica_id, None)
 
         destinatario = email_para or paciente.email
         if not destinatario:
             raise HTTPException(400, "Paciente sem e-mail e parâmetro email_para ausente")
 
-        pdf  = generate_fatura_pdf(fatura_id, self.db)
+        pdf  = (await documento_fatura_carregada_async(fatura, self.db)).conteudo
         anexo = EmailAttachment(filename=f"fatura_{fatura_id}.pdf", content=pdf)
 
         await self.mail.enviar_email(
@@ -94,7 +123,7 @@ class EmailManager:
         if not destinatario:
             raise HTTPException(400, "Paciente sem e-mail e parâmetro email_para ausente")
 
-        pdf  = generate_orcamento_pdf(orcamento_id, self.db)
+        pdf  = (await documento_orcamento_pdf_async(orcamento_id, self.db)).conteudo
         anexo = EmailAttachment(filename=f"orcamento_{orcamento_id}.pdf", content=pdf)
 
         await self.mail.enviar_email(
@@ -111,33 +140,11 @@ class EmailManager:
 
     # ---------- Lembrete (sem anexo) ----------------------------
     async def enviar_lembrete(self, marc: Marcacao):
-        await self.mail.enviar_email(
-            assunto        = f"Lembrete da sua consulta – {marc.data_hora_inicio:%d/%m %H:%M}",
-            destinatarios  = [marc.paciente.email],
-            nome_template  = "lembrete_consulta.html",
-            dados_template = {
-                "clinica":  marc.clinic,
-                "paciente": marc.paciente,
-                "medico":   marc.medico,
-                "marcacao": marc,
-            },
-            anexos=[],
-        )
+        await self.mail.enviar_email(**mensagem_lembrete(marc), anexos=[])
 
     # ---------- Cancelamento (sem anexo) ------------------------
     async def enviar_cancelamento(self, marc: Marcacao):
-        await self.mail.enviar_email(
-            assunto        = f"Consulta cancelada – {marc.data_hora_inicio:%d/%m %H:%M}",
-            destinatarios  = [marc.paciente.email],
-            nome_template  = "consulta_cancelada.html",
-            dados_template = {
-                "clinica":  marc.clinic,
-                "paciente": marc.paciente,
-                "medico":   marc.medico,
-                "marcacao": marc,
-            },
-            anexos=[],
-        )
+        await self.mail.enviar_email(**mensagem_cancelamento(marc), anexos=[])
 
     # ---------- Plano de Tratamento (com anexo PDF) ------------
     async def enviar_plano(
@@ -159,7 +166,7 @@ class EmailManager:
         if not destinatario:
             raise HTTPException(400, "Paciente sem e-mail e parâmetro email_para ausente")
 
-        pdf  = generate_plano_pdf(plano_id, self.db)
+        pdf  = (await documento_plano_pdf_async(plano_id, self.db)).conteudo
         anexo = EmailAttachment(filename=f"plano_tratamento_{plano_id}.pdf", content=pdf)
 
         await self.mail.enviar_email(
@@ -187,9 +194,10 @@ class EmailManager:
         Envia um email customizado para um utilizador.
         Usa um template genérico com o conteúdo fornecido.
         """
-        from src.utilizadores.service import obter_utilizador
+        from src.utilizadores.models import Utilizador
 
-        utilizador = obter_utilizador(self.db, utilizador_id)
+        # Modelo (obter_utilizador devolve um dict para a API)
+        utilizador = self.db.get(Utilizador, utilizador_id)
         if not utilizador:
             raise HTTPException(404, "Utilizador não encontrado")
 
@@ -0,0 +1,126 @@
+"""
+Servidor SMTP local (sink) para desenvolvimento e testes.
+
+Aceita qualquer ligação (sem TLS; AUTH é sempre aceite), guarda as mensagens
+recebidas em memória e, opcionalmente, grava cada uma como .eml. Usado com
+EMAIL_SMTP_LOCAL=host:porta, que faz o EmailService e o envio em massa
+ignorarem o servidor configurado na clínica.
+
+    servidor = SmtpLocal()
+    porta = await servidor.iniciar()
+    ...
+    assert servidor.mensagens[0]["To"] == "paciente@example.com"
+    await servidor.parar()
+
+`recusar` permite simular destinatários rejeitados (550) e `atraso` a latência
+do servidor por mensagem.
+"""
+
+import asyncio
+import logging
+from email import message_from_bytes, policy
+from email.message import EmailMessage
+from pathlib import Path
+from typing import Iterable, List, Optional
+
+logger = logging.getLogger("app.email")
+
+
+class SmtpLocal:
+    def __init__(
+        self,
+        pasta: Optional[Path] = None,
+        atraso: float = 0.0,
+        recusar: Iterable[str] = (),
+    ):
+        self.pasta = Path(pasta) if pasta else None
+        self.atraso = atraso
+        self.recusar = set(recusar)
+        self.mensagens: List[EmailMessage] = []
+        self.ligacoes = 0
+        self._servidor: Optional[asyncio.AbstractServer] = None
+
+    async def iniciar(self, host: str = "127.0.0.1", porta: int = 0) -> int:
+        """Começa a aceitar ligações; devolve a porta (útil com porta=0)."""
+        if self.pasta:
+            self.pasta.mkdir(parents=True, exist_ok=True)
+        self._servidor = await asyncio.start_server(self._sessao, host, porta)
+        return self._servidor.sockets[0].getsockname()[1]
+
+    async def parar(self) -> None:
+        if self._servidor is not None:
+            self._servidor.close()
+            await self._servidor.wait_closed()
+            self._servidor = None
+
+    async def __aenter__(self) -> "SmtpLocal":
+        await self.iniciar()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.parar()
+
+    @property
+    def porta(self) -> Optional[int]:
+        return self._servidor.sockets[0].getsockname()[1] if self._servidor else None
+
+    def _guardar(self, dados: bytes) -> None:
+        mensagem = message_from_bytes(dados, policy=policy.default)
+        self.mensagens.append(mensagem)
+        if self.pasta:
+            ficheiro = self.pasta / f"{len(self.mensagens):05d}.eml"
+            ficheiro.write_bytes(dados)
+        logger.info(f"📨 SMTP local: \"{mensagem['Subject']}\" para {mensagem['To']}")
+
+    async def _sessao(self, leitor: asyncio.StreamReader, escritor: asyncio.StreamWriter) -> None:
+        self.ligacoes += 1
+
+        async def responder(linha: str) -> None:
+            escritor.write(linha.encode() + b"\r\n")
+            await escritor.drain()
+
+        await responder("220 smtp-local pronto")
+        corpo: Optional[List[bytes]] = None
+        try:
+            while True:
+                linha = await leitor.readline()
+                if not linha:
+                    break
+
+                if corpo is not None:
+                    if linha in (b".\r\n", b".\n"):
+                        if self.atraso:
+                            await asyncio.sleep(self.atraso)
+                        self._guardar(b"".join(corpo))
+                        corpo = None
+                        await responder("250 mensagem aceite")
+                    else:
+                        # Dot-stuffing (RFC 5321 §4.5.2)
+                        corpo.append(linha[1:] if linha.startswith(b"..") else linha)
+                    continue
+
+                comando = linha.decode(errors="replace").strip()
+                verbo = comando.split(" ", 1)[0].upper()
+                if verbo == "EHLO":
+                    await responder("250-smtp-local")
+                    await responder("250-8BITMIME")
+                    await responder("250 AUTH PLAIN LOGIN")
+                elif verbo == "HELO":
+                    await responder("250 smtp-local")
+                elif verbo == "AUTH":
+                    await responder("235 autenticado")
+                elif verbo == "RCPT" and any(r in comando for r in self.recusar):
+                    await responder("550 destinatario recusado")
+                elif verbo == "DATA":
+                    corpo = []
+                    await responder("354 terminar com <CRLF>.<CRLF>")
+                elif verbo == "QUIT":
+                    await responder("221 adeus")
+                    break
+                else:
+                    # MAIL, RCPT, RSET, NOOP, ...
+                    await responder("250 ok")
+        except ConnectionError:
+            pass
+        finally:
+            escritor.close()
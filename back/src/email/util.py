@@ -1,7 +1,8 @@
 from sqlalchemy.orm import Session
 from fastapi import HTTPException, Depends
-from typing import Optional
+from typing import Dict, Iterable, Optional
 
+from src.core.config import settings
 from src.database import SessionLocal
 from src.clinica.models import ClinicaEmail
 from src.email.schemas import EmailConfig
@@ -42,6 +43,42 @@ async def get_email_config(clinica_id: int, db: Session = Depends(get_db)) -> Em
     # Convert to Pydantic model
     return EmailConfig.model_validate(email_config)
 
+def obter_email_configs(db: Session, clinica_ids: Iterable[int]) -> Dict[int, EmailConfig]:
+    """
+    Active email configuration of several clinics in a single query.
+    Clinics without an active configuration are left out.
+    """
+    ids = set(clinica_ids)
+    if not ids:
+        return {}
+    rows = db.query(ClinicaEmail).filter(
+        ClinicaEmail.clinica_id.in_(ids),
+        ClinicaEmail.ativo == True
+    ).order_by(ClinicaEmail.id).all()
+
+    configs: Dict[int, EmailConfig] = {}
+    for row in rows:
+        # Same choice as get_email_config (.first()) when a clinic has several
+        configs.setdefault(row.clinica_id, EmailConfig.model_validate(row))
+    return configs
+
+def parametros_smtp(config: EmailConfig) -> dict:
+    """
+    SMTP server to use for a clinic's configuration. With EMAIL_SMTP_LOCAL
+    ("host:port") every message goes to that server instead, without TLS or
+    login (local stand-in for development and tests, see src.email.smtp_local).
+    """
+    if settings.EMAIL_SMTP_LOCAL:
+        host, _, porta = settings.EMAIL_SMTP_LOCAL.rpartition(":")
+        return {"host": host or "127.0.0.1", "porta": int(porta), "ssl": False, "starttls": False, "login": False}
+    return {
+        "host": config.smtp_host,
+        "porta": config.smtp_porta,
+        "ssl": bool(config.usar_ssl),
+        "starttls": bool(config.usar_tls),
+        "login": True,
+    }
+
 async def test_email_config(config: EmailConfig) -> bool:
     """
     Test if the email configuration is valid.
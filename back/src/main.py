@@ -1,6 +1,7 @@
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
+from starlette.concurrency import run_in_threadpool
 from starlette.middleware.base import BaseHTTPMiddleware
 from src.utilizadores.router import router as utilizadores_router
 from src.perfis.router import router as perfis_router
@@ -23,8 +24,14 @@ from src.email.router import router as email_router
 from src.mensagens.router import router as mensagens_router
 from src.relatorios.router import router as relatorios_router
 from src.contabilidade.router import router as contabilidade_router
+from src.metrics.router import router as metrics_router
 from src.auditoria.context import set_current_clinica_id, clear_current_clinica_id
-from src.utilizadores.jwt import verify_token
+from src.auditoria.writer import auditoria_writer
+from src.pdf.executor import pdf_render_pool
+from src.email.outbox import email_outbox
+from src.email.render import precompilar as precompilar_templates_email
+from src.core.config import settings
+from src.utilizadores.principal import resolver_principal
 from src.scheduler import start_scheduler, stop_scheduler
 
 
@@ -68,29 +75,13 @@ class AuditoriaContextMiddleware(BaseHTTPMiddleware):
         if auth_header.startswith("Bearer "):
             token = auth_header.replace("Bearer ", "")
             try:
-                # Verify and decode the JWT token
-                payload = verify_token(token)
-                clinica_id = payload.get("clinica_id")
-
-                # If clinica_id not in JWT, try to get from session table
-                if not clinica_id:
-                    user_id = payload.get("sub")
-                    if user_id:
-                        from src.database import SessionLocal
-                        from src.utilizadores.models import Sessao
-                        db = SessionLocal()
-                        try:
-                            sessao = db.query(Sessao).filter_by(
-                                token=token,
-                                utilizador_id=int(user_id),
-                                ativo=True
-                            ).first()
-                            if sessao and sessao.clinica_id:
-                                clinica_id = sessao.clinica_id
-                        finally:
-                            db.close()
-
-                # Set clinic ID in context if found
+                # Resolve the authenticated principal once per request; the auth
+                # dependencies reuse it from request.state
+                principal = await run_in_threadpool(resolver_principal, token)
+                request.state.principal = principal
+
+                # JWT clinic first, session clinic as fallback
+                clinica_id = principal.token_clinica_id or principal.sessao_clinica_id
                 if clinica_id:
                     set_current_clinica_id(clinica_id)
             except Exception as e:
@@ -165,6 +156,7 @@ app.include_router(email_router)
 app.include_router(mensagens_router)
 app.include_router(relatorios_router)
 app.include_router(contabilidade_router)
+app.include_router(metrics_router)
 
 
 # ========== Lifecycle Events ==========
@@ -178,8 +170,19 @@ async def startup_event():
     logger = logging.getLogger(__name__)
     logger.info("🚀 Iniciando aplicação FastAPI")
 
-    # Iniciar scheduler de alertas de stock
-    start_scheduler()
+    # Iniciar scheduler de tarefas automáticas (salvo se corre em processo próprio)
+    if settings.SCHEDULER_ENABLED:
+        start_scheduler()
+
+    # Arrancar já os processos de renderização de PDFs (WeasyPrint aquecido)
+    pdf_render_pool.iniciar()
+
+    # Compilar já os templates de e-mail
+    precompilar_templates_email()
+
+    # Workers da outbox de e-mails
+    if settings.EMAIL_OUTBOX_ENABLED:
+        email_outbox.iniciar()
 
 
 @app.on_event("shutdown")
@@ -192,9 +195,18 @@ async def shutdown_event():
     logger = logging.getLogger(__name__)
     logger.info("🛑 Encerrando aplicação FastAPI")
 
-    # Parar scheduler de alertas de stock
+    # Parar scheduler de tarefas automáticas
     stop_scheduler()
 
+    # Gravar registos de auditoria ainda em buffer
+    auditoria_writer.parar()
+
+    # Parar os workers da outbox (envios em curso voltam à fila quando o lease expirar)
+    await email_outbox.parar()
+
+    # Terminar os processos de renderização de PDFs
+    pdf_render_pool.parar()
+
 
 
 
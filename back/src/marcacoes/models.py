@@ -1,5 +1,5 @@
 from sqlalchemy import (
-    Column, Integer, String, DateTime, ForeignKey, Text, func
+    Column, Integer, String, DateTime, ForeignKey, Text, func, Index, UniqueConstraint
 )
 from sqlalchemy.orm import relationship
 from src.database import Base
@@ -29,4 +29,28 @@ class Marcacao(Base):
     medico       = relationship("Utilizador", foreign_keys=[medico_id])      
     clinic       = relationship("Clinica")
     agendador    = relationship("Utilizador", foreign_keys=[agendada_por])  
-    entidade     = relationship("Entidade")
\ No newline at end of file
+    entidade     = relationship("Entidade")
+
+    __table_args__ = (
+        # Lembretes automáticos: marcações agendadas numa janela de datas
+        Index("ix_marcacoes_estado_inicio", "estado", "data_hora_inicio"),
+    )
+
+
+class LembreteMarcacao(Base):
+    """
+    Lembretes automáticos já tratados (um por marcação e data de início: se a
+    consulta for remarcada, é enviado um novo lembrete).
+    """
+    __tablename__ = "LembreteMarcacao"
+
+    id               = Column(Integer, primary_key=True, index=True)
+    marcacao_id      = Column(Integer, ForeignKey("Marcacoes.id", ondelete="CASCADE"), nullable=False)
+    data_hora_inicio = Column(DateTime(timezone=True), nullable=False)
+    tentativas       = Column(Integer, nullable=False, default=0)
+    enviado_em       = Column(DateTime(timezone=True), nullable=True)
+    ultimo_erro      = Column(Text, nullable=True)
+
+    __table_args__ = (
+        UniqueConstraint("marcacao_id", "data_hora_inicio", name="uq_lembrete_marcacao_inicio"),
+    )
\ No newline at end of file
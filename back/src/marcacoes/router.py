@@ -1,13 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException, Response, status, Query
-from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.orm import Session, joinedload, selectinload
 from typing import List, Optional
 from datetime import date
 
 from src.database import SessionLocal
 from src.utilizadores.dependencies import get_current_user
 from src.utilizadores.models import Utilizador
-from src.email.service import EmailManager
-from src.email.util import get_email_config
+from src.email import outbox
+from src.email.service import mensagem_cancelamento, mensagem_lembrete, renderizar_corpo
+from src.email.util import get_email_config, obter_email_configs
+from src.email.envio_massa import MensagemEmail, enviar_em_massa
 
 from . import service, schemas
 from .models import Marcacao
@@ -171,7 +173,7 @@ def _get_marcacao_with_relations(db: Session, marc_id: int) -> Marcacao:
 @router.post(
     "/{marc_id}/lembrete",
     summary="Enviar lembrete de consulta",
-    status_code=status.HTTP_200_OK,
+    status_code=status.HTTP_202_ACCEPTED,
 )
 async def enviar_lembrete(
     marc_id: int,
@@ -189,17 +191,16 @@ async def enviar_lembrete(
             "Paciente não possui email cadastrado"
         )
 
-    config = await get_email_config(marc.clinic_id, db)
-    email_manager = EmailManager(db, config)
-    await email_manager.enviar_lembrete(marc)
+    await get_email_config(marc.clinic_id, db)
+    envio = outbox.enfileirar(db, "lembrete", marc.clinic_id, {"marcacao_id": marc_id}, utilizador_atual.id)
 
-    return {"detail": f"Lembrete enviado para {marc.paciente.email}"}
+    return {"detail": f"Envio do lembrete para {marc.paciente.email} agendado", "envio_id": envio.id}
 
 
 @router.post(
     "/{marc_id}/cancelamento",
     summary="Enviar notificação de cancelamento",
-    status_code=status.HTTP_200_OK,
+    status_code=status.HTTP_202_ACCEPTED,
 )
 async def enviar_cancelamento(
     marc_id: int,
@@ -217,54 +218,73 @@ async def enviar_cancelamento(
             "Paciente não possui email cadastrado"
         )
 
-    config = await get_email_config(marc.clinic_id, db)
-    email_manager = EmailManager(db, config)
-    await email_manager.enviar_cancelamento(marc)
+    await get_email_config(marc.clinic_id, db)
+    envio = outbox.enfileirar(db, "cancelamento", marc.clinic_id, {"marcacao_id": marc_id}, utilizador_atual.id)
 
-    return {"detail": f"Notificação de cancelamento enviada para {marc.paciente.email}"}
+    return {"detail": f"Envio da notificação de cancelamento para {marc.paciente.email} agendado", "envio_id": envio.id}
 
 
-@router.post(
-    "/lembretes/enviar-em-massa",
-    summary="Enviar lembretes em massa",
-    status_code=status.HTTP_200_OK,
-)
-async def enviar_lembretes_em_massa(
-    marcacao_ids: List[int],
-    db: Session = Depends(get_db),
-    utilizador_atual: Utilizador = Depends(get_current_user),
-):
+async def _enviar_em_massa(db: Session, marcacao_ids: List[int], construir_mensagem) -> dict:
     """
-    Envia lembretes de consulta para múltiplos pacientes.
+    Envia um e-mail por marcação: marcações (com paciente, médico e clínica)
+    e configurações de e-mail carregadas numa query cada, envio concorrente
+    com ligações SMTP reutilizadas (ver src.email.envio_massa).
     """
-    enviados = []
-    erros = []
-
-    for marc_id in marcacao_ids:
+    marcacoes = {
+        marc.id: marc
+        for marc in db.query(Marcacao)
+        .options(
+            joinedload(Marcacao.paciente),
+            joinedload(Marcacao.medico),
+            joinedload(Marcacao.clinic),
+        )
+        .filter(Marcacao.id.in_(marcacao_ids))
+        .all()
+    }
+    configs = obter_email_configs(db, {marc.clinic_id for marc in marcacoes.values()})
+
+    erros_por_id = {}
+    por_clinica = {}
+    for marc_id in dict.fromkeys(marcacao_ids):
+        marc = marcacoes.get(marc_id)
+        if not marc:
+            erros_por_id[marc_id] = "Marcação não encontrada"
+            continue
+        if not marc.paciente.email:
+            erros_por_id[marc_id] = "Paciente sem email"
+            continue
+        config = configs.get(marc.clinic_id)
+        if not config:
+            erros_por_id[marc_id] = "Configuração de email não encontrada ou inativa para esta clínica"
+            continue
         try:
-            marc = _get_marcacao_with_relations(db, marc_id)
-
-            if not marc.paciente.email:
-                erros.append({
-                    "marcacao_id": marc_id,
-                    "erro": "Paciente sem email"
-                })
-                continue
+            dados = construir_mensagem(marc)
+            html = renderizar_corpo(dados["nome_template"], dados["dados_template"])
+        except Exception as e:
+            erros_por_id[marc_id] = str(e)
+            continue
+        por_clinica.setdefault(marc.clinic_id, (config, []))[1].append(
+            MensagemEmail(id=marc_id, assunto=dados["assunto"], destinatario=marc.paciente.email, html=html)
+        )
 
-            config = await get_email_config(marc.clinic_id, db)
-            email_manager = EmailManager(db, config)
-            await email_manager.enviar_lembrete(marc)
+    resultados = await enviar_em_massa(por_clinica)
 
+    enviados = []
+    erros = []
+    for marc_id in dict.fromkeys(marcacao_ids):
+        erro = erros_por_id.get(marc_id) or resultados.get(marc_id)
+        if erro:
+            erros.append({
+                "marcacao_id": marc_id,
+                "erro": erro
+            })
+        else:
+            marc = marcacoes[marc_id]
             enviados.append({
                 "marcacao_id": marc_id,
                 "paciente": marc.paciente.nome,
                 "email": marc.paciente.email
             })
-        except Exception as e:
-            erros.append({
-                "marcacao_id": marc_id,
-                "erro": str(e)
-            })
 
     return {
         "total_enviados": len(enviados),
@@ -274,6 +294,24 @@ async def enviar_lembretes_em_massa(
     }
 
 
+@router.post(
+    "/lembretes/enviar-em-massa",
+    summary="Enviar lembretes em massa",
+    status_code=status.HTTP_200_OK,
+)
+async def enviar_lembretes_em_massa(
+    marcacao_ids: List[int],
+    db: Session = Depends(get_db),
+    utilizador_atual: Utilizador = Depends(get_current_user),
+):
+    """
+    Envia lembretes de consulta para múltiplos pacientes.
+    """
+    resultado = await _enviar_em_massa(db, marcacao_ids, mensagem_lembrete)
+    service.registar_lembretes_enviados(db, [enviado["marcacao_id"] for enviado in resultado["enviados"]])
+    return resultado
+
+
 @router.post(
     "/cancelamentos/enviar-em-massa",
     summary="Enviar cancelamentos em massa",
@@ -287,38 +325,4 @@ async def enviar_cancelamentos_em_massa(
     """
     Envia notificações de cancelamento para múltiplos pacientes.
     """
-    enviados = []
-    erros = []
-
-    for marc_id in marcacao_ids:
-        try:
-            marc = _get_marcacao_with_relations(db, marc_id)
-
-            if not marc.paciente.email:
-                erros.append({
-                    "marcacao_id": marc_id,
-                    "erro": "Paciente sem email"
-                })
-                continue
-
-            config = await get_email_config(marc.clinic_id, db)
-            email_manager = EmailManager(db, config)
-            await email_manager.enviar_cancelamento(marc)
-
-            enviados.append({
-                "marcacao_id": marc_id,
-                "paciente": marc.paciente.nome,
-                "email": marc.paciente.email
-            })
-        except Exception as e:
-            erros.append({
-                "marcacao_id": marc_id,
-                "erro": str(e)
-            })
-
-    return {
-        "total_enviados": len(enviados),
-        "total_erros": len(erros),
-        "enviados": enviados,
-        "erros": erros
-    }
\ No newline at end of file
+    return await _enviar_em_massa(db, marcacao_ids, mensagem_cancelamento)
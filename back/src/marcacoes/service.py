@@ -1,12 +1,13 @@
 from typing import Optional, List
-from datetime import date
+from datetime import date, datetime, timezone
 from fastapi import HTTPException, status
 from sqlalchemy.orm import Session
 from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
 
 from src.auditoria.utils import registrar_auditoria
 
-from src.marcacoes.models import Marcacao
+from src.marcacoes.models import LembreteMarcacao, Marcacao
 from src.marcacoes.schemas import (
     MarcacaoCreate,
     MarcacaoRead,
@@ -179,3 +180,32 @@ def delete_marcacao(
         f"Marcação #{marc_id} removida - Paciente ID: {paciente_id}, Médico ID: {medico_id}, Data: {data_hora}"
     )
 
+
+def registar_lembretes_enviados(db: Session, marcacao_ids: List[int]) -> None:
+    """
+    Regista em LembreteMarcacao os lembretes enviados manualmente (individuais
+    ou em massa), para o job de lembretes automáticos não os repetir.
+    """
+    if not marcacao_ids:
+        return
+    inicios = dict(
+        db.query(Marcacao.id, Marcacao.data_hora_inicio).filter(Marcacao.id.in_(marcacao_ids)).all()
+    )
+    existentes = {
+        registo.marcacao_id: registo
+        for registo in db.query(LembreteMarcacao).filter(LembreteMarcacao.marcacao_id.in_(inicios)).all()
+        if registo.data_hora_inicio == inicios[registo.marcacao_id]
+    }
+    agora = datetime.now(timezone.utc)
+    for marcacao_id, inicio in inicios.items():
+        registo = existentes.get(marcacao_id)
+        if registo is None:
+            db.add(LembreteMarcacao(marcacao_id=marcacao_id, data_hora_inicio=inicio, tentativas=0, enviado_em=agora))
+        elif registo.enviado_em is None:
+            registo.enviado_em = agora
+            registo.ultimo_erro = None
+    try:
+        db.commit()
+    except IntegrityError:
+        # O job registou a mesma marcação entretanto; o envio já foi feito
+        db.rollback()
@@ -0,0 +1,4 @@
+# src/metrics/__init__.py
+"""
+Módulo de métricas operacionais (pool de ligações, etc.).
+"""
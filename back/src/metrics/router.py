@@ -0,0 +1,77 @@
+# src/metrics/router.py
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session
+
+from src.database import SessionLocal, get_pool_status
+from src.pdf.executor import pdf_render_pool
+from src.utilizadores.dependencies import get_current_user
+from src.utilizadores.models import Utilizador
+from src.metrics import schemas
+from src.scheduler import jobs as scheduler_jobs
+
+
+router = APIRouter(
+    prefix="/metrics",
+    tags=["Métricas"],
+)
+
+
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@router.get("/db-pool", response_model=schemas.DbPoolMetrics, summary="Estado do pool de ligações")
+def get_db_pool_metrics(
+    user: Utilizador = Depends(get_current_user)
+):
+    """
+    Ligações em uso/livres/overflow e tempos de espera por uma ligação
+    (valores por worker).
+    """
+    return get_pool_status()
+
+
+@router.get("/pdf-render", response_model=schemas.PdfRenderMetrics, summary="Estado do pool de renderização de PDFs")
+def get_pdf_render_metrics(
+    user: Utilizador = Depends(get_current_user)
+):
+    """
+    Pedidos de PDF em fila/em execução e tempos de espera e de renderização
+    (valores por worker).
+    """
+    return pdf_render_pool.estado()
+
+
+@router.get("/scheduler", response_model=List[schemas.JobScheduler], summary="Jobs do scheduler")
+def get_scheduler_jobs(
+    db: Session = Depends(get_db),
+    user: Utilizador = Depends(get_current_user)
+):
+    """
+    Jobs registados, próxima execução (se o scheduler corre neste worker) e
+    última execução em qualquer instância.
+    """
+    return scheduler_jobs.estado_jobs(db)
+
+
+@router.get(
+    "/scheduler/{job_id}/execucoes",
+    response_model=List[schemas.ExecucaoJobResponse],
+    summary="Histórico de execuções de um job",
+)
+def get_scheduler_execucoes(
+    job_id: str,
+    limit: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db),
+    user: Utilizador = Depends(get_current_user)
+):
+    """Execuções mais recentes do job, com duração, estado e instância."""
+    if job_id not in scheduler_jobs.JOBS:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, "Job não encontrado")
+    return scheduler_jobs.historico_job(db, job_id, limit)
@@ -0,0 +1,63 @@
+# src/metrics/schemas.py
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+class DbPoolMetrics(BaseModel):
+    """Estado do pool de ligações à base de dados do worker atual"""
+    pool_size: int
+    max_overflow: int
+    checked_in: int
+    checked_out: int
+    overflow: int
+    timeout_segundos: float
+    total_checkouts: int
+    total_timeouts: int
+    espera_media_ms: float
+    espera_p50_ms: float
+    espera_p99_ms: float
+    espera_maxima_ms: float
+
+
+class PdfRenderMetrics(BaseModel):
+    """Estado do pool de renderização de PDFs do worker atual"""
+    workers: int
+    max_fila: int
+    em_fila: int
+    em_execucao: int
+    fila_maxima: int
+    total_concluidos: int
+    total_falhados: int
+    total_rejeitados: int
+    espera_media_ms: float
+    espera_p99_ms: float
+    render_medio_ms: float
+    render_p50_ms: float
+    render_p99_ms: float
+
+
+class ExecucaoJobResponse(BaseModel):
+    """Execução de um job do scheduler"""
+    id: int
+    job_id: str
+    agendado_para: datetime
+    iniciado_em: datetime
+    terminado_em: Optional[datetime] = None
+    duracao_ms: Optional[int] = None
+    estado: str
+    erro: Optional[str] = None
+    instancia: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+
+class JobScheduler(BaseModel):
+    """Job registado no scheduler, com a última execução no cluster"""
+    id: str
+    nome: str
+    trigger: str
+    proxima_execucao: Optional[datetime] = None
+    ultima_execucao: Optional[ExecucaoJobResponse] = None
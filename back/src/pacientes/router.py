@@ -71,15 +71,26 @@ def criar_paciente(
 @router.get(
     "",
     response_model=list[schemas.PacienteListItemResponse],
+    response_model_exclude_unset=True,
     summary="Listar pacientes da clínica"
 )
 def listar_pacientes_endpoint(
     clinica_id: int,
+    limit: Optional[int] = Query(None, ge=1, le=500, description="Número máximo de pacientes a devolver"),
+    after_nome: Optional[str] = Query(None, description="Nome do último paciente da página anterior"),
+    after_id: Optional[int] = Query(None, description="ID do último paciente da página anterior"),
+    fields: Optional[str] = Query(None, description="Campos a devolver, separados por vírgula (ex.: id,nome,telefone)"),
     db: Session = Depends(get_db),
     utilizador_atual: Utilizador = Depends(get_current_user),
 ):
     # (perm checks se precisares)
-    return service.listar_pacientes(db, clinica_id)
+    if (after_nome is None) != (after_id is None):
+        raise HTTPException(
+            status.HTTP_400_BAD_REQUEST,
+            "after_nome e after_id têm de ser enviados juntos"
+        )
+    campos = {c.strip() for c in fields.split(",") if c.strip()} if fields else None
+    return service.listar_pacientes(db, clinica_id, limit, after_nome, after_id, campos)
 
 @router.get("/search", response_model=list[schemas.PacienteMinimalResponse])
 def buscar_pacientes_endpoint(
@@ -291,7 +291,7 @@ class PacienteListItemResponse(BaseModel):
     validade_documento: Optional[date] = None
     pais_residencia: Optional[str] = None
     morada: Optional[str] = None
-    clinica: ClinicaMinimalResponse
+    clinica: Optional[ClinicaMinimalResponse] = None
     total_consultas: int = 0
     planos_ativos: int = 0
     tem_ficha_clinica: bool = False
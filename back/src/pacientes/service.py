@@ -2,12 +2,13 @@ from datetime import datetime, timedelta
 from typing import List, Optional
 
 from fastapi import HTTPException, status
-from sqlalchemy.orm import Session, selectinload
+from sqlalchemy.orm import Session, lazyload, selectinload
 
 from src.precos.models import Preco
 from src.pacientes import models, schemas
 from src.auditoria.utils import registrar_auditoria
-from sqlalchemy import func
+from sqlalchemy import exists, func, select, tuple_
+from src.clinica.models import Clinica
 from src.consultas.models import Consulta, ConsultaItem
 from src.orcamento.models import OrcamentoItem
 from datetime import datetime
@@ -51,63 +52,132 @@ def criar_paciente(
 
 
 
-def listar_pacientes(db: Session, clinica_id: int):
+CAMPOS_LISTA_PACIENTE = set(schemas.PacienteListItemResponse.model_fields)
+# Campos da listagem que são colunas diretas de Paciente
+_COLUNAS_LISTA_PACIENTE = CAMPOS_LISTA_PACIENTE & set(models.Paciente.__table__.columns.keys())
+
+
+def listar_pacientes(
+    db: Session,
+    clinica_id: int,
+    limit: Optional[int] = None,
+    after_nome: Optional[str] = None,
+    after_id: Optional[int] = None,
+    campos: Optional[set[str]] = None,
+) -> List[dict]:
     """
-    Lista todos os pacientes de uma clínica com informações resumidas:
+    Lista os pacientes de uma clínica com informações resumidas:
     - Total de consultas
     - Número de planos ativos
     - Indicação se tem ficha clínica
     - Próxima consulta agendada
+
+    Os campos derivados são calculados na própria query da listagem através
+    de subqueries correlacionadas; as próximas consultas são depois carregadas
+    todas de uma vez. O número de queries é constante, independentemente do
+    número de pacientes.
+
+    Paginação por keyset: passar o `nome` e o `id` do último paciente recebido
+    em `after_nome`/`after_id`. `campos` limita os campos devolvidos (e os
+    agregados calculados); `id` e `nome` são sempre incluídos.
     """
-   
-    
-    # Buscar pacientes da clínica
-    pacientes = (
-        db.query(models.Paciente)
-          .options(selectinload(models.Paciente.clinica))
-          .filter_by(clinica_id=clinica_id)
-          .order_by(models.Paciente.nome)
-          .all()
-    )
-    
-    # Enriquecer com dados derivados
-    for paciente in pacientes:
-        # Contar consultas
-        paciente.total_consultas = (
-            db.query(func.count(Consulta.id))
-            .filter(Consulta.paciente_id == paciente.id)
-            .scalar() or 0
+    if campos is None:
+        campos = CAMPOS_LISTA_PACIENTE
+    else:
+        invalidos = campos - CAMPOS_LISTA_PACIENTE
+        if invalidos:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Campos inválidos: {', '.join(sorted(invalidos))}."
+            )
+        campos = campos | {"id", "nome"}
+
+    Paciente = models.Paciente
+    colunas = [
+        getattr(Paciente, campo).label(campo)
+        for campo in sorted(campos & _COLUNAS_LISTA_PACIENTE)
+    ]
+
+    if "total_consultas" in campos:
+        colunas.append(
+            select(func.count(Consulta.id))
+            .where(Consulta.paciente_id == Paciente.id)
+            .correlate(Paciente)
+            .scalar_subquery()
+            .label("total_consultas")
         )
-        
-        # Contar planos ativos
-        paciente.planos_ativos = (
-            db.query(func.count(models.PlanoTratamento.id))
-            .filter(
-                models.PlanoTratamento.paciente_id == paciente.id,
+
+    if "planos_ativos" in campos:
+        colunas.append(
+            select(func.count(models.PlanoTratamento.id))
+            .where(
+                models.PlanoTratamento.paciente_id == Paciente.id,
                 models.PlanoTratamento.estado == "em_curso"
             )
-            .scalar() or 0
+            .correlate(Paciente)
+            .scalar_subquery()
+            .label("planos_ativos")
         )
-        
-        # Verificar se tem ficha clínica
-        paciente.tem_ficha_clinica = (
-            db.query(models.FichaClinica)
-            .filter(models.FichaClinica.paciente_id == paciente.id)
-            .first() is not None
+
+    if "tem_ficha_clinica" in campos:
+        colunas.append(
+            exists()
+            .where(models.FichaClinica.paciente_id == Paciente.id)
+            .correlate(Paciente)
+            .label("tem_ficha_clinica")
         )
-        
-        # Buscar próxima consulta
-        paciente.proxima_consulta = (
-            db.query(Consulta)
-            .filter(
-                Consulta.paciente_id == paciente.id,
+
+    if "proxima_consulta" in campos:
+        colunas.append(
+            select(Consulta.id)
+            .where(
+                Consulta.paciente_id == Paciente.id,
                 Consulta.estado == "agendada",
                 Consulta.data_inicio > datetime.now()
             )
             .order_by(Consulta.data_inicio)
-            .first()
+            .limit(1)
+            .correlate(Paciente)
+            .scalar_subquery()
+            .label("proxima_consulta_id")
         )
-    
+
+    query = db.query(*colunas).filter(Paciente.clinica_id == clinica_id)
+    if after_nome is not None and after_id is not None:
+        query = query.filter(tuple_(Paciente.nome, Paciente.id) > (after_nome, after_id))
+    query = query.order_by(Paciente.nome, Paciente.id)
+    if limit:
+        query = query.limit(limit)
+
+    pacientes = [row._asdict() for row in query.all()]
+
+    # Carregar as próximas consultas de todos os pacientes numa só query
+    if "proxima_consulta" in campos:
+        consulta_ids = [p.pop("proxima_consulta_id") for p in pacientes]
+        ids_validos = [cid for cid in consulta_ids if cid is not None]
+        consultas = {}
+        if ids_validos:
+            consultas = {
+                c.id: c
+                for c in db.query(Consulta)
+                    .options(
+                        lazyload(Consulta.paciente),
+                        selectinload(Consulta.medico),
+                        selectinload(Consulta.entidade),
+                        selectinload(Consulta.itens),
+                    )
+                    .filter(Consulta.id.in_(ids_validos))
+                    .all()
+            }
+        for paciente, consulta_id in zip(pacientes, consulta_ids):
+            paciente["proxima_consulta"] = consultas.get(consulta_id)
+
+    # Todos os pacientes pertencem à mesma clínica
+    if "clinica" in campos and pacientes:
+        clinica = db.get(Clinica, clinica_id)
+        for paciente in pacientes:
+            paciente["clinica"] = clinica
+
     return pacientes
 
 def obter_paciente(db: Session, paciente_id: int) -> models.Paciente:
@@ -0,0 +1,133 @@
+"""
+Cache em disco dos PDFs gerados.
+
+Cada PDF é guardado num ficheiro com o nome da sua chave (hash SHA-256 do
+HTML renderizado e das folhas de estilo), pelo que um documento que não
+mudou nunca volta a passar pelo WeasyPrint. A chave serve também de ETag.
+
+O tamanho total é limitado: quando é ultrapassado, os ficheiros menos
+usados recentemente (mtime, atualizado a cada leitura) são removidos.
+O diretório pode ser partilhado por vários workers; as escritas são
+atómicas (ficheiro temporário + os.replace).
+"""
+
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Iterable, Optional
+
+from src.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def chave_pdf(html: str, css: Iterable[bytes] = ()) -> str:
+    """Hash do documento: HTML renderizado + conteúdo das folhas de estilo."""
+    h = hashlib.sha256(html.encode("utf-8"))
+    for conteudo in css:
+        h.update(b"\0")
+        h.update(conteudo)
+    return h.hexdigest()
+
+
+class PdfCache:
+    def __init__(self, diretorio: Path, max_bytes: int):
+        self.diretorio = Path(diretorio)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._tamanho: Optional[int] = None
+
+    def _caminho(self, chave: str) -> Path:
+        return self.diretorio / f"{chave}.pdf"
+
+    def get(self, chave: str) -> Optional[bytes]:
+        caminho = self._caminho(chave)
+        try:
+            conteudo = caminho.read_bytes()
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(caminho)  # marca como usado recentemente (LRU)
+        except OSError:
+            pass
+        return conteudo
+
+    def set(self, chave: str, conteudo: bytes) -> None:
+        if len(conteudo) > self.max_bytes:
+            return
+        try:
+            self.diretorio.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.diretorio, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                f.write(conteudo)
+            os.replace(tmp, self._caminho(chave))
+        except OSError as e:
+            logger.warning(f"Não foi possível guardar PDF em cache: {e}")
+            return
+
+        with self._lock:
+            if self._tamanho is None:
+                self._tamanho = self._tamanho_em_disco()
+            else:
+                self._tamanho += len(conteudo)
+            if self._tamanho > self.max_bytes:
+                self._despejar()
+
+    def _ficheiros(self):
+        try:
+            return [p for p in self.diretorio.iterdir() if p.suffix == ".pdf"]
+        except FileNotFoundError:
+            return []
+
+    def _tamanho_em_disco(self) -> int:
+        total = 0
+        for p in self._ficheiros():
+            try:
+                total += p.stat().st_size
+            except FileNotFoundError:
+                pass
+        return total
+
+    def _despejar(self) -> None:
+        """Remove os PDFs menos usados até ficar abaixo de 90% do limite."""
+        ficheiros = []
+        for p in self._ficheiros():
+            try:
+                st = p.stat()
+            except FileNotFoundError:
+                continue
+            ficheiros.append((st.st_mtime, st.st_size, p))
+        ficheiros.sort()
+
+        total = sum(tamanho for _, tamanho, _ in ficheiros)
+        alvo = int(self.max_bytes * 0.9)
+        for _, tamanho, p in ficheiros:
+            if total <= alvo:
+                break
+            try:
+                p.unlink()
+                total -= tamanho
+            except FileNotFoundError:
+                total -= tamanho
+            except OSError:
+                pass
+        self._tamanho = total
+
+    def clear(self) -> None:
+        with self._lock:
+            for p in self._ficheiros():
+                try:
+                    p.unlink()
+                except OSError:
+                    pass
+            self._tamanho = 0
+
+
+pdf_cache: Optional[PdfCache] = (
+    PdfCache(Path(settings.PDF_CACHE_DIR), settings.PDF_CACHE_MAX_MB * 1024 * 1024)
+    if settings.PDF_CACHE_ENABLED
+    else None
+)
@@ -0,0 +1,210 @@
+"""
+Pool de renderização de PDFs fora do event loop.
+
+O WeasyPrint é CPU-bound e demora centenas de ms por documento; corrido no
+event loop (ou numa thread, a disputar o GIL) bloqueia os restantes pedidos
+e o tráfego dos websockets do chat. Este módulo envia a renderização para
+um pool de processos (ver `render_worker`), com o WeasyPrint já aquecido,
+e expõe uma API async usada pelo router de PDFs e pelo serviço de e-mail.
+
+No máximo PDF_RENDER_WORKERS renderizações correm em simultâneo; os pedidos
+seguintes esperam em fila (até PDF_RENDER_MAX_FILA, depois 503). Com
+PDF_RENDER_WORKERS=0 a renderização corre numa thread do próprio processo.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import BinaryIO, List, Optional
+
+from fastapi import HTTPException, status
+from starlette.concurrency import run_in_threadpool
+
+from src.core.config import settings
+from src.pdf import render_worker
+
+logger = logging.getLogger(__name__)
+
+TEMPLATES_DIR = Path(__file__).parent / "templates"
+ASSETS_DIR = TEMPLATES_DIR / "assets"
+
+# Folhas de estilo aplicadas a todos os documentos (pré-compiladas em cada processo)
+CSS_PADRAO = ["styles.css"]
+
+
+_local_lock = threading.Lock()
+_local_inicializado = False
+
+
+def renderizar_local(html: str, css_files: Optional[List[str]] = None, target: Optional[BinaryIO] = None):
+    """
+    Renderiza no próprio processo, reutilizando a configuração de fontes e o
+    CSS já compilado da thread atual (ver render_worker.escrever_pdf).
+    """
+    global _local_inicializado
+    if not _local_inicializado:
+        with _local_lock:
+            if not _local_inicializado:
+                render_worker.inicializar(str(ASSETS_DIR), str(TEMPLATES_DIR), CSS_PADRAO)
+                _local_inicializado = True
+    return render_worker.escrever_pdf(html, css_files, target)
+
+
+def _renderizar_local_medido(html: str, css_files: Optional[List[str]]):
+    inicio = time.perf_counter()
+    pdf_bytes = renderizar_local(html, css_files)
+    return pdf_bytes, time.perf_counter() - inicio
+
+
+class PdfRenderPool:
+    def __init__(self, workers: int, max_fila: int, janela: int = 512):
+        self.workers = workers
+        self.max_fila = max_fila
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        self._semaforo: Optional[asyncio.Semaphore] = None
+        self._semaforo_loop = None
+
+        # Métricas
+        self._lock = threading.Lock()
+        self._janela = janela
+        self._renders_ms: List[float] = []
+        self._esperas_ms: List[float] = []
+        self.em_fila = 0
+        self.em_execucao = 0
+        self.fila_maxima = 0
+        self.total_concluidos = 0
+        self.total_falhados = 0
+        self.total_rejeitados = 0
+
+    # ---------- execução ------------------------------------------
+    def _obter_executor(self) -> ProcessPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=render_worker.inicializar,
+                    initargs=(str(ASSETS_DIR), str(TEMPLATES_DIR), CSS_PADRAO),
+                )
+                logger.info(f"🖨️  Pool de renderização de PDFs iniciado ({self.workers} processo(s))")
+            return self._executor
+
+    def _obter_semaforo(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._semaforo is None or self._semaforo_loop is not loop:
+            self._semaforo = asyncio.Semaphore(max(self.workers, 1))
+            self._semaforo_loop = loop
+        return self._semaforo
+
+    def iniciar(self) -> None:
+        """Cria já os processos (evita o custo de arranque no primeiro PDF)."""
+        if self.workers > 0:
+            executor = self._obter_executor()
+            for _ in range(self.workers):
+                executor.submit(int)
+
+    async def renderizar(self, html: str, css_files: Optional[List[str]] = None) -> bytes:
+        """Converte HTML em PDF fora do event loop."""
+        with self._lock:
+            if self.em_fila >= self.max_fila:
+                self.total_rejeitados += 1
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Serviço de PDF sobrecarregado. Tente novamente dentro de instantes."
+                )
+            self.em_fila += 1
+            self.fila_maxima = max(self.fila_maxima, self.em_fila)
+
+        inicio = time.perf_counter()
+        entrou = False
+        try:
+            async with self._obter_semaforo():
+                espera = time.perf_counter() - inicio
+                with self._lock:
+                    self.em_fila -= 1
+                    self.em_execucao += 1
+                entrou = True
+                try:
+                    if self.workers > 0:
+                        loop = asyncio.get_running_loop()
+                        pdf_bytes, duracao = await loop.run_in_executor(
+                            self._obter_executor(), render_worker.renderizar, html, css_files
+                        )
+                    else:
+                        pdf_bytes, duracao = await run_in_threadpool(_renderizar_local_medido, html, css_files)
+                except BrokenProcessPool:
+                    # Um processo morreu (ex.: falta de memória): recriar o pool
+                    with self._executor_lock:
+                        self._executor = None
+                    raise
+                finally:
+                    with self._lock:
+                        self.em_execucao -= 1
+        except Exception:
+            with self._lock:
+                self.total_falhados += 1
+            raise
+        finally:
+            # Também em cancelamentos (CancelledError) à espera do semáforo
+            if not entrou:
+                with self._lock:
+                    self.em_fila -= 1
+
+        self._registar(espera, duracao)
+        return pdf_bytes
+
+    def parar(self) -> None:
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+    # ---------- métricas ------------------------------------------
+    def _registar(self, espera: float, duracao: float) -> None:
+        with self._lock:
+            self.total_concluidos += 1
+            for lista, valor in ((self._esperas_ms, espera * 1000), (self._renders_ms, duracao * 1000)):
+                lista.append(valor)
+                if len(lista) > self._janela:
+                    del lista[0]
+
+    def estado(self) -> dict:
+        with self._lock:
+            renders = sorted(self._renders_ms)
+            esperas = sorted(self._esperas_ms)
+            resumo = {
+                "workers": self.workers,
+                "max_fila": self.max_fila,
+                "em_fila": self.em_fila,
+                "em_execucao": self.em_execucao,
+                "fila_maxima": self.fila_maxima,
+                "total_concluidos": self.total_concluidos,
+                "total_falhados": self.total_falhados,
+                "total_rejeitados": self.total_rejeitados,
+            }
+
+        def percentil(valores: List[float], p: float) -> float:
+            if not valores:
+                return 0.0
+            return valores[min(len(valores) - 1, int(p * len(valores)))]
+
+        return {
+            **resumo,
+            "espera_media_ms": sum(esperas) / len(esperas) if esperas else 0.0,
+            "espera_p99_ms": percentil(esperas, 0.99),
+            "render_medio_ms": sum(renders) / len(renders) if renders else 0.0,
+            "render_p50_ms": percentil(renders, 0.50),
+            "render_p99_ms": percentil(renders, 0.99),
+        }
+
+
+pdf_render_pool = PdfRenderPool(
+    workers=settings.PDF_RENDER_WORKERS,
+    max_fila=settings.PDF_RENDER_MAX_FILA,
+)
@@ -0,0 +1,276 @@
+"""
+Exportação de PDFs em lote (faturas e orçamentos) para um arquivo ZIP.
+
+Um lote é executado em segundo plano no worker que o recebe: os documentos
+são carregados em blocos, cada bloco com um número fixo de queries (ver
+pdf.service.carregar_faturas_pdf / contextos_faturas), e os PDFs de cada
+bloco são renderizados em paralelo no pool de processos (src.pdf.executor),
+passando pela cache em disco. O ZIP é escrito em PDF_LOTES_DIR e depois
+enviado em streaming.
+
+O estado dos lotes fica na tabela LotePdf (progresso gravado a cada bloco) e
+PDF_LOTES_DIR tem de ser partilhada por todos os workers e instâncias (ex.:
+volume montado), pelo que o progresso e o download podem ser pedidos a
+qualquer worker. Um lote sem progresso há LOTE_SEM_PROGRESSO (o worker que o
+executava terminou) passa a "erro". Os lotes expiram ao fim de
+PDF_LOTE_TTL_SECONDS (a linha e o ficheiro são então removidos).
+"""
+
+import asyncio
+import logging
+import os
+import socket
+import uuid
+import zipfile
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List
+
+from fastapi import HTTPException, status
+from sqlalchemy.orm import Session, joinedload, selectinload
+from starlette.concurrency import run_in_threadpool
+
+from src.core.config import settings
+from src.database import SessionLocal
+from src.pdf import service as pdf_service
+from src.pdf.executor import pdf_render_pool
+from src.pdf.models import LotePdf
+from src.pdf.schemas import EstadoLote, LotePdfCreate, TipoDocumentoLote
+
+logger = logging.getLogger(__name__)
+
+LOTES_DIR = Path(settings.PDF_LOTES_DIR)
+
+# Documentos carregados e renderizados de cada vez
+LOTE_BLOCO = 50
+
+# Lote em curso sem progresso durante este tempo: o worker que o executava terminou
+LOTE_SEM_PROGRESSO = timedelta(minutes=10)
+
+INSTANCIA = f"{socket.gethostname()}:{os.getpid()}"[:100]
+
+# Referências às tarefas em curso (evita que sejam recolhidas pelo GC)
+_tarefas = set()
+
+
+def caminho_zip(lote_id: str) -> Path:
+    return LOTES_DIR / f"{lote_id}.zip"
+
+
+# ──────────────────────────────────────────────────────────────
+# Seleção e carregamento dos documentos
+# ──────────────────────────────────────────────────────────────
+
+def _ids_documentos(db: Session, pedido: LotePdfCreate) -> List[int]:
+    """IDs dos documentos pedidos (lista explícita e/ou filtro), por ordem."""
+    from src.faturacao.models import Fatura
+    from src.orcamento.models import Orcamento
+    from src.pacientes.models import Paciente
+
+    if pedido.tipo == TipoDocumentoLote.FATURA:
+        modelo, coluna_data = Fatura, Fatura.data_emissao
+    else:
+        modelo, coluna_data = Orcamento, Orcamento.data
+
+    query = db.query(modelo.id)
+    if pedido.ids:
+        query = query.filter(modelo.id.in_(pedido.ids))
+    if pedido.data_inicio:
+        query = query.filter(coluna_data >= pedido.data_inicio)
+    if pedido.data_fim:
+        query = query.filter(coluna_data < pedido.data_fim + timedelta(days=1))
+    if pedido.paciente_id:
+        query = query.filter(modelo.paciente_id == pedido.paciente_id)
+    if pedido.clinica_id:
+        query = query.join(Paciente, Paciente.id == modelo.paciente_id).filter(
+            Paciente.clinica_id == pedido.clinica_id
+        )
+    if pedido.estado:
+        query = query.filter(modelo.estado == pedido.estado)
+
+    return [id_ for (id_,) in query.order_by(coluna_data, modelo.id).all()]
+
+
+def _carregar_orcamentos(db: Session, ids: List[int]) -> list:
+    from src.orcamento.models import Orcamento, OrcamentoItem
+    from src.pacientes.models import Paciente
+
+    # Com a clínica do paciente: contexto_orcamento não faz queries por documento
+    return db.query(Orcamento).options(
+        selectinload(Orcamento.itens).joinedload(OrcamentoItem.artigo),
+        joinedload(Orcamento.paciente).joinedload(Paciente.clinica),
+        joinedload(Orcamento.entidade),
+    ).filter(Orcamento.id.in_(ids)).all()
+
+
+def _preparar_bloco(tipo: TipoDocumentoLote, ids: List[int]) -> Dict[int, tuple]:
+    """
+    Carrega um bloco de documentos (sessão própria) e devolve, por ID, o
+    resultado de preparar_documento: chave e PDF em cache ou HTML a renderizar.
+    Documentos inexistentes ou com erro no contexto ficam de fora.
+    """
+    db = SessionLocal()
+    try:
+        if tipo == TipoDocumentoLote.FATURA:
+            template = "fatura.html"
+            contextos = pdf_service.contextos_faturas(db, pdf_service.carregar_faturas_pdf(db, ids))
+        else:
+            template = "orcamento.html"
+            contextos = {}
+            for orcamento in _carregar_orcamentos(db, ids):
+                try:
+                    contextos[orcamento.id] = pdf_service.contexto_orcamento(orcamento, db)
+                except Exception as e:
+                    logger.warning(f"Falha ao preparar PDF orcamento {orcamento.id}: {e}")
+
+        preparados = {}
+        for id_, contexto in contextos.items():
+            try:
+                preparados[id_] = pdf_service.preparar_documento(
+                    template, contexto, css_files=pdf_service.CSS_PADRAO
+                )
+            except Exception as e:
+                logger.warning(f"Falha ao preparar PDF {tipo.value} {id_}: {e}")
+        return preparados
+    finally:
+        db.close()
+
+
+# ──────────────────────────────────────────────────────────────
+# Execução
+# ──────────────────────────────────────────────────────────────
+
+def _guardar_estado(lote_id: str, **campos) -> None:
+    """Grava o estado/progresso do lote (sessão própria, corre numa thread)."""
+    db = SessionLocal()
+    try:
+        db.query(LotePdf).filter(LotePdf.id == lote_id).update(
+            {**campos, "atualizado_em": datetime.now()}, synchronize_session=False
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+async def _executar_lote(lote_id: str, tipo: TipoDocumentoLote, ids: List[int]) -> None:
+    prefixo = tipo.value
+    concluidos = 0
+    falhados: List[int] = []
+    await run_in_threadpool(_guardar_estado, lote_id, estado=EstadoLote.EM_CURSO.value)
+    # Um pedido por processo do pool de cada vez: o lote não enche a fila
+    # e os PDFs pedidos pelos utilizadores continuam a ser servidos
+    semaforo = asyncio.Semaphore(max(pdf_render_pool.workers, 1))
+
+    async def concluir(preparado):
+        async with semaforo:
+            return await pdf_service.concluir_documento_async(*preparado, css_files=pdf_service.CSS_PADRAO)
+
+    ficheiro = caminho_zip(lote_id)
+    # Escrito com outro nome e renomeado no fim: outro worker nunca vê um ZIP incompleto
+    temporario = ficheiro.with_suffix(".zip.tmp")
+
+    try:
+        LOTES_DIR.mkdir(parents=True, exist_ok=True)
+        # PDFs já são comprimidos: ZIP_STORED evita gastar CPU sem ganho
+        with zipfile.ZipFile(temporario, "w", compression=zipfile.ZIP_STORED) as zf:
+            for i in range(0, len(ids), LOTE_BLOCO):
+                bloco = ids[i:i + LOTE_BLOCO]
+                preparados = await run_in_threadpool(_preparar_bloco, tipo, bloco)
+
+                ids_bloco = [id_ for id_ in bloco if id_ in preparados]
+                falhados.extend(id_ for id_ in bloco if id_ not in preparados)
+                documentos = await asyncio.gather(
+                    *[concluir(preparados[id_]) for id_ in ids_bloco],
+                    return_exceptions=True,
+                )
+
+                for id_, documento in zip(ids_bloco, documentos):
+                    if isinstance(documento, BaseException):
+                        logger.warning(f"Lote {lote_id}: falha no PDF {prefixo} {id_}: {documento}")
+                        falhados.append(id_)
+                        continue
+                    await run_in_threadpool(zf.writestr, f"{prefixo}_{id_}.pdf", documento.conteudo)
+                    concluidos += 1
+
+                await run_in_threadpool(
+                    _guardar_estado, lote_id, concluidos=concluidos, falhados=list(falhados)
+                )
+
+        temporario.replace(ficheiro)
+        await run_in_threadpool(
+            _guardar_estado, lote_id, estado=EstadoLote.CONCLUIDO.value, concluido_em=datetime.now()
+        )
+    except Exception as e:
+        logger.error(f"❌ Erro no lote de PDFs {lote_id}: {e}")
+        temporario.unlink(missing_ok=True)
+        await run_in_threadpool(
+            _guardar_estado, lote_id,
+            estado=EstadoLote.ERRO.value, erro=str(e), concluido_em=datetime.now(),
+        )
+
+
+def _limpar_expirados(db: Session) -> None:
+    limite = datetime.now() - timedelta(seconds=settings.PDF_LOTE_TTL_SECONDS)
+    expirados = [
+        lote_id for (lote_id,) in db.query(LotePdf.id).filter(
+            LotePdf.estado.in_([EstadoLote.CONCLUIDO.value, EstadoLote.ERRO.value]),
+            LotePdf.criado_em < limite,
+        ).all()
+    ]
+    if not expirados:
+        return
+    db.query(LotePdf).filter(LotePdf.id.in_(expirados)).delete(synchronize_session=False)
+    db.commit()
+    for lote_id in expirados:
+        caminho_zip(lote_id).unlink(missing_ok=True)
+
+
+def criar_lote(db: Session, pedido: LotePdfCreate) -> LotePdf:
+    """Seleciona os documentos e regista o lote (executado por iniciar_lote)."""
+    _limpar_expirados(db)
+
+    ids = _ids_documentos(db, pedido)
+    if not ids:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, detail="Nenhum documento corresponde ao pedido")
+    if len(ids) > settings.PDF_LOTE_MAX_DOCUMENTOS:
+        raise HTTPException(
+            status.HTTP_400_BAD_REQUEST,
+            detail=f"Máximo de {settings.PDF_LOTE_MAX_DOCUMENTOS} documentos por lote ({len(ids)} selecionados)"
+        )
+
+    lote = LotePdf(
+        id=uuid.uuid4().hex,
+        tipo=pedido.tipo.value,
+        ids=ids,
+        estado=EstadoLote.PENDENTE.value,
+        concluidos=0,
+        falhados=[],
+        instancia=INSTANCIA,
+    )
+    db.add(lote)
+    db.commit()
+    db.refresh(lote)
+    return lote
+
+
+def iniciar_lote(lote: LotePdf) -> None:
+    """Executa o lote em segundo plano no event loop atual."""
+    tarefa = asyncio.create_task(_executar_lote(lote.id, TipoDocumentoLote(lote.tipo), list(lote.ids)))
+    _tarefas.add(tarefa)
+    tarefa.add_done_callback(_tarefas.discard)
+
+
+def obter_lote(db: Session, lote_id: str) -> LotePdf:
+    lote = db.get(LotePdf, lote_id)
+    if not lote:
+        raise HTTPException(status.HTTP_404_NOT_FOUND, detail="Lote não encontrado ou expirado")
+    if (
+        lote.estado in (EstadoLote.PENDENTE.value, EstadoLote.EM_CURSO.value)
+        and lote.atualizado_em < datetime.now() - LOTE_SEM_PROGRESSO
+    ):
+        lote.estado = EstadoLote.ERRO.value
+        lote.erro = f"Lote interrompido: sem progresso desde {lote.atualizado_em:%Y-%m-%d %H:%M} ({lote.instancia})"
+        lote.concluido_em = datetime.now()
+        db.commit()
+        db.refresh(lote)
+    return lote
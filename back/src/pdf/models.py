@@ -0,0 +1,54 @@
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Index, Integer, JSON, String, Text
+
+from src.database import Base
+
+
+class LotePdf(Base):
+    """
+    Exportação de PDFs em ZIP (ver src.pdf.lotes). O lote é executado pelo
+    worker que o criou, mas o estado fica aqui e o ZIP em PDF_LOTES_DIR, pelo
+    que o progresso e o download podem ser pedidos a qualquer worker.
+    """
+    __tablename__ = "LotePdf"
+
+    id = Column(String(32), primary_key=True)
+    tipo = Column(String(20), nullable=False)           # fatura, orcamento
+    ids = Column(JSON, nullable=False, default=list)    # documentos, por ordem
+    estado = Column(String(20), nullable=False, default="pendente")  # pendente, em_curso, concluido, erro
+    concluidos = Column(Integer, nullable=False, default=0)
+    falhados = Column(JSON, nullable=False, default=list)
+    erro = Column(Text, nullable=True)
+    instancia = Column(String(100), nullable=True)      # host:pid do worker que executa o lote
+    criado_em = Column(DateTime, nullable=False, default=datetime.now)
+    atualizado_em = Column(DateTime, nullable=False, default=datetime.now)  # último progresso
+    concluido_em = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_lotepdf_criado_em", "criado_em"),
+    )
+
+    @property
+    def total(self) -> int:
+        return len(self.ids or [])
+
+    @property
+    def nome_zip(self) -> str:
+        prefixo = "faturas" if self.tipo == "fatura" else "orcamentos"
+        return f"{prefixo}_{self.criado_em:%Y%m%d_%H%M%S}.zip"
+
+    def resumo(self) -> dict:
+        processados = self.concluidos + len(self.falhados or [])
+        return {
+            "id": self.id,
+            "tipo": self.tipo,
+            "estado": self.estado,
+            "total": self.total,
+            "concluidos": self.concluidos,
+            "falhados": list(self.falhados or []),
+            "progresso": round(processados / self.total, 4) if self.total else 1.0,
+            "erro": self.erro,
+            "criado_em": self.criado_em,
+            "concluido_em": self.concluido_em,
+        }
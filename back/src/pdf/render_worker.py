@@ -0,0 +1,84 @@
+"""
+Código executado nos processos do pool de renderização de PDFs.
+
+Mantido propositadamente leve (só WeasyPrint e a biblioteca padrão) porque
+cada processo é criado com "spawn" e importa apenas este módulo. O
+inicializador deixa o WeasyPrint aquecido: importa a biblioteca, carrega a
+configuração de fontes e pré-compila as folhas de estilo, que ficam em
+memória para todos os PDFs seguintes desse processo.
+
+A configuração de fontes (um font map do Pango) não pode ser partilhada entre
+threads; quando se renderiza no próprio processo da aplicação (threadpool,
+PDF_RENDER_WORKERS=0) cada thread tem a sua, bem como a cache de CSS que
+depende dela.
+"""
+
+import os
+import threading
+from pathlib import Path
+from typing import BinaryIO, List, Optional, Tuple
+
+_local = threading.local()
+_assets_dir: Optional[Path] = None
+_base_url: Optional[str] = None
+
+
+def _estado_thread():
+    """Configuração de fontes e CSS compilado da thread atual (criados no primeiro uso)."""
+    if not hasattr(_local, "font_config"):
+        from weasyprint.text.fonts import FontConfiguration
+
+        _local.font_config = FontConfiguration()
+        _local.css = {}  # (nome, mtime) → CSS
+    return _local
+
+
+def inicializar(assets_dir: str, base_url: str, css_files: List[str]) -> None:
+    """Inicializador de cada processo: aquece o WeasyPrint e pré-carrega o CSS."""
+    global _assets_dir, _base_url
+
+    _assets_dir = Path(assets_dir)
+    _base_url = base_url
+    for css_name in css_files:
+        try:
+            _obter_css(css_name)
+        except FileNotFoundError:
+            pass
+
+
+def _obter_css(css_name: str):
+    """CSS compilado, recarregado apenas se o ficheiro mudar (mtime)."""
+    from weasyprint import CSS
+
+    css_path = _assets_dir / css_name
+    if not css_path.exists():
+        raise FileNotFoundError(f"CSS não encontrado: {css_path}")
+    estado = _estado_thread()
+    chave = (css_name, os.path.getmtime(css_path))
+    css = estado.css.get(chave)
+    if css is None:
+        css = CSS(filename=str(css_path), font_config=estado.font_config)
+        estado.css[chave] = css
+    return css
+
+
+def escrever_pdf(html: str, css_files: Optional[List[str]] = None, target: Optional[BinaryIO] = None):
+    """
+    Converte HTML (em memória, sem ficheiro temporário) em PDF. Com `target`
+    o PDF é escrito nesse ficheiro/buffer e devolve None; senão devolve os bytes.
+    """
+    from weasyprint import HTML
+
+    styles = [_obter_css(css_name) for css_name in (css_files or [])]
+    return HTML(string=html, base_url=_base_url).write_pdf(
+        target, stylesheets=styles, font_config=_estado_thread().font_config
+    )
+
+
+def renderizar(html: str, css_files: Optional[List[str]] = None) -> Tuple[bytes, float]:
+    """Converte HTML em PDF. Devolve (pdf, segundos de renderização)."""
+    import time
+
+    inicio = time.perf_counter()
+    pdf_bytes = escrever_pdf(html, css_files)
+    return pdf_bytes, time.perf_counter() - inicio
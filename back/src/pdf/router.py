@@ -1,10 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Response, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Response, Query, Header
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from src.database import SessionLocal
 from src.utilizadores.dependencies import get_current_user
-from src.pdf import service as pdf_service
+from src.pdf import service as pdf_service, lotes, schemas
 from typing import Optional
 
+ZIP_CHUNK_SIZE = 64 * 1024
+
 router = APIRouter(
     prefix="/pdf",
     tags=["PDF"]
@@ -17,10 +21,44 @@ def get_db():
     finally:
         db.close()
 
+def pdf_response(
+    documento: pdf_service.PdfDocumento,
+    filename: str,
+    download: bool,
+    if_none_match: Optional[str]
+) -> Response:
+    """
+    Build the PDF response with an ETag; returns 304 if the client already
+    has this version (If-None-Match).
+    """
+    etag = f'"{documento.etag}"'
+    headers = {
+        "ETag": etag,
+        # The document may change, so the browser must always revalidate
+        "Cache-Control": "private, no-cache",
+    }
+    if if_none_match and etag in [t.strip().removeprefix("W/") for t in if_none_match.split(",")]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    # Set appropriate headers based on download parameter
+    if download:
+        # For download: use attachment disposition
+        headers["Content-Disposition"] = f"attachment; filename={filename}"
+    else:
+        # For viewing: use inline disposition
+        headers["Content-Disposition"] = f"inline; filename={filename}"
+
+    return Response(
+        content=documento.conteudo,
+        media_type="application/pdf",
+        headers=headers
+    )
+
 @router.get("/orcamento/{orcamento_id}")
-def get_orcamento_pdf(
+async def get_orcamento_pdf(
     orcamento_id: int,
     download: Optional[bool] = Query(False, description="Set to true to download instead of view"),
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
@@ -29,22 +67,8 @@ def get_orcamento_pdf(
     Set download=true to download as file, or false (default) to view in browser.
     """
     try:
-        pdf_bytes = pdf_service.generate_orcamento_pdf(orcamento_id, db)
-        
-        # Set appropriate headers based on download parameter
-        headers = {}
-        if download:
-            # For download: use attachment disposition
-            headers["Content-Disposition"] = f"attachment; filename=orcamento_{orcamento_id}.pdf"
-        else:
-            # For viewing: use inline disposition
-            headers["Content-Disposition"] = f"inline; filename=orcamento_{orcamento_id}.pdf"
-        
-        return Response(
-            content=pdf_bytes,
-            media_type="application/pdf",
-            headers=headers
-        )
+        documento = await pdf_service.documento_orcamento_pdf_async(orcamento_id, db)
+        return pdf_response(documento, f"orcamento_{orcamento_id}.pdf", download, if_none_match)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -52,9 +76,10 @@ def get_orcamento_pdf(
         )
 
 @router.get("/fatura/{fatura_id}")
-def get_fatura_pdf(
+async def get_fatura_pdf(
     fatura_id: int,
     download: Optional[bool] = Query(False, description="Set to true to download instead of view"),
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
@@ -63,22 +88,8 @@ def get_fatura_pdf(
     Set download=true to download as file, or false (default) to view in browser.
     """
     try:
-        pdf_bytes = pdf_service.generate_fatura_pdf(fatura_id, db)
-
-        # Set appropriate headers based on download parameter
-        headers = {}
-        if download:
-            # For download: use attachment disposition
-            headers["Content-Disposition"] = f"attachment; filename=fatura_{fatura_id}.pdf"
-        else:
-            # For viewing: use inline disposition
-            headers["Content-Disposition"] = f"inline; filename=fatura_{fatura_id}.pdf"
-
-        return Response(
-            content=pdf_bytes,
-            media_type="application/pdf",
-            headers=headers
-        )
+        documento = await pdf_service.documento_fatura_pdf_async(fatura_id, db)
+        return pdf_response(documento, f"fatura_{fatura_id}.pdf", download, if_none_match)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -86,9 +97,10 @@ def get_fatura_pdf(
         )
 
 @router.get("/plano/{plano_id}")
-def get_plano_pdf(
+async def get_plano_pdf(
     plano_id: int,
     download: Optional[bool] = Query(False, description="Set to true to download instead of view"),
+    if_none_match: Optional[str] = Header(None),
     db: Session = Depends(get_db),
     current_user = Depends(get_current_user)
 ):
@@ -97,24 +109,65 @@ def get_plano_pdf(
     Set download=true to download as file, or false (default) to view in browser.
     """
     try:
-        pdf_bytes = pdf_service.generate_plano_pdf(plano_id, db)
-
-        # Set appropriate headers based on download parameter
-        headers = {}
-        if download:
-            # For download: use attachment disposition
-            headers["Content-Disposition"] = f"attachment; filename=plano_{plano_id}.pdf"
-        else:
-            # For viewing: use inline disposition
-            headers["Content-Disposition"] = f"inline; filename=plano_{plano_id}.pdf"
-
-        return Response(
-            content=pdf_bytes,
-            media_type="application/pdf",
-            headers=headers
-        )
+        documento = await pdf_service.documento_plano_pdf_async(plano_id, db)
+        return pdf_response(documento, f"plano_{plano_id}.pdf", download, if_none_match)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error generating treatment plan PDF: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+@router.post("/lote", response_model=schemas.LotePdfResponse, status_code=status.HTTP_202_ACCEPTED)
+async def criar_lote_pdf(
+    pedido: schemas.LotePdfCreate,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """
+    Start a ZIP export of invoice or budget PDFs, selected by a list of IDs
+    and/or a filter (date range, patient, clinic, state). Poll
+    GET /pdf/lote/{id} for progress and download the ZIP when it is done.
+    """
+    lote = await run_in_threadpool(lotes.criar_lote, db, pedido)
+    lotes.iniciar_lote(lote)
+    return lote.resumo()
+
+@router.get("/lote/{lote_id}", response_model=schemas.LotePdfResponse)
+def get_lote_pdf(
+    lote_id: str,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """Progress of a PDF ZIP export."""
+    return lotes.obter_lote(db, lote_id).resumo()
+
+@router.get("/lote/{lote_id}/download")
+def download_lote_pdf(
+    lote_id: str,
+    db: Session = Depends(get_db),
+    current_user = Depends(get_current_user)
+):
+    """Stream the ZIP archive of a finished PDF export."""
+    lote = lotes.obter_lote(db, lote_id)
+    if lote.estado != schemas.EstadoLote.CONCLUIDO.value:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Lote ainda não concluído (estado: {lote.estado})"
+        )
+    ficheiro = lotes.caminho_zip(lote.id)
+    if not ficheiro.exists():
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Ficheiro do lote não encontrado (PDF_LOTES_DIR tem de ser partilhada pelos workers)"
+        )
+
+    def ler_zip():
+        with open(ficheiro, "rb") as f:
+            while chunk := f.read(ZIP_CHUNK_SIZE):
+                yield chunk
+
+    return StreamingResponse(
+        ler_zip(),
+        media_type="application/zip",
+        headers={"Content-Disposition": f"attachment; filename={lote.nome_zip}"}
+    )
@@ -0,0 +1,52 @@
+from datetime import date, datetime
+from enum import Enum
+from typing import List, Optional
+
+from pydantic import BaseModel, model_validator
+
+
+class TipoDocumentoLote(str, Enum):
+    FATURA = "fatura"
+    ORCAMENTO = "orcamento"
+
+
+class EstadoLote(str, Enum):
+    PENDENTE = "pendente"
+    EM_CURSO = "em_curso"
+    CONCLUIDO = "concluido"
+    ERRO = "erro"
+
+
+class LotePdfCreate(BaseModel):
+    """Pedido de exportação em ZIP: lista de IDs ou filtro"""
+    tipo: TipoDocumentoLote
+    ids: Optional[List[int]] = None
+    data_inicio: Optional[date] = None
+    data_fim: Optional[date] = None
+    paciente_id: Optional[int] = None
+    clinica_id: Optional[int] = None
+    estado: Optional[str] = None
+
+    @model_validator(mode="after")
+    def validar_criterio(self):
+        if not self.ids and not any(
+            v is not None for v in (self.data_inicio, self.data_fim, self.paciente_id, self.clinica_id, self.estado)
+        ):
+            raise ValueError("Indique uma lista de IDs ou pelo menos um filtro")
+        if self.data_inicio and self.data_fim and self.data_inicio > self.data_fim:
+            raise ValueError("data_inicio posterior a data_fim")
+        return self
+
+
+class LotePdfResponse(BaseModel):
+    """Estado de uma exportação de PDFs em ZIP"""
+    id: str
+    tipo: TipoDocumentoLote
+    estado: EstadoLote
+    total: int
+    concluidos: int
+    falhados: List[int]
+    progresso: float
+    erro: Optional[str] = None
+    criado_em: datetime
+    concluido_em: Optional[datetime] = None
@@ -4,27 +4,22 @@ pdf_service.py  ·  Gerar PDFs (Fatura & Orçamento) com Jinja2 + WeasyPrint
 
 from __future__ import annotations
 
-import os
-import tempfile
+from dataclasses import dataclass
 from datetime import datetime
-from pathlib import Path
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, BinaryIO, List, Optional, Tuple
 
 from fastapi import HTTPException, status
+from starlette.concurrency import run_in_threadpool
 from jinja2 import Environment, FileSystemLoader, select_autoescape
-from weasyprint import HTML, CSS
 
 from src.clinica.models import Clinica
+from src.pdf.cache import chave_pdf, pdf_cache
+from src.pdf.executor import ASSETS_DIR, CSS_PADRAO, TEMPLATES_DIR, pdf_render_pool, renderizar_local
 
 # ──────────────────────────────────────────────────────────────
 # Configuração global
 # ──────────────────────────────────────────────────────────────
 
-TEMPLATES_DIR = Path(__file__).parent / "templates"
-ASSETS_DIR = TEMPLATES_DIR / "assets"
-PDF_TMP_DIR = Path(__file__).parent / "generated_pdfs"
-PDF_TMP_DIR.mkdir(exist_ok=True)
-
 env = Environment(
     loader=FileSystemLoader(str(TEMPLATES_DIR)),
     autoescape=select_autoescape(["html", "xml"]),
@@ -67,40 +62,119 @@ def render_template(name: str, context: Dict[str, Any]) -> str:
 def generate_pdf(
     html: str,
     css_files: Optional[List[str]] = None,
-) -> bytes:
-    """Transforma HTML em PDF, aplicando folhas de estilo opcionais."""
+    target: Optional[BinaryIO] = None,
+) -> Optional[bytes]:
+    """
+    Transforma HTML em PDF, aplicando folhas de estilo opcionais.
+
+    O HTML é lido diretamente da memória (base_url = pasta dos templates) e
+    as folhas de estilo e a configuração de fontes são reutilizadas entre
+    documentos. Com `target` (BytesIO, ficheiro temporário, ...) o PDF é
+    escrito aí e a função devolve None.
+    """
     try:
-        # 1) gravar HTML num ficheiro temporário
-        with tempfile.NamedTemporaryFile(
-            suffix=".html", delete=False, dir=str(PDF_TMP_DIR)
-        ) as tmp_html:
-            tmp_html.write(html.encode("utf-8"))
-            html_path = tmp_html.name
-
-        # 2) preparar CSS
-        styles: List[CSS] = []
-        for css_name in (css_files or []):
-            css_path = ASSETS_DIR / css_name
-            if css_path.exists():
-                styles.append(CSS(filename=str(css_path)))
-            else:
-                raise FileNotFoundError(f"CSS não encontrado: {css_path}")
-
-        # 3) gerar PDF
-        pdf_bytes = HTML(filename=html_path, base_url=str(TEMPLATES_DIR)).write_pdf(
-            stylesheets=styles
-        )
+        return renderizar_local(html, css_files, target)
+    except Exception as exc:
+        raise HTTPException(
+            status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Erro ao gerar PDF: {exc}",
+        ) from exc
+
+
+@dataclass(frozen=True)
+class PdfDocumento:
+    conteudo: bytes
+    etag: str  # chave do documento na cache (hash do HTML + CSS)
+
+
+def preparar_documento(
+    template: str,
+    context: Dict[str, Any],
+    css_files: Optional[List[str]] = None,
+) -> Tuple[str, Optional[bytes], Optional[str]]:
+    """
+    Calcula a chave do documento e procura-o na cache em disco.
+    Devolve (chave, pdf em cache, None) ou (chave, None, html a renderizar).
+
+    A chave ignora `data_geracao` (muda a cada minuto): um PDF em cache
+    mantém a data em que foi efetivamente gerado.
+    """
+    css = []
+    for css_name in (css_files or []):
+        css_path = ASSETS_DIR / css_name
+        if css_path.exists():
+            css.append(css_path.read_bytes())
+
+    if "data_geracao" in context:
+        html_estavel = render_template(template, {**context, "data_geracao": ""})
+    else:
+        html_estavel = render_template(template, context)
+    chave = chave_pdf(html_estavel, css)
+
+    if pdf_cache is not None:
+        conteudo = pdf_cache.get(chave)
+        if conteudo is not None:
+            return chave, conteudo, None
+
+    html = render_template(template, context) if "data_geracao" in context else html_estavel
+    return chave, None, html
+
+
+def gerar_pdf_documento(
+    template: str,
+    context: Dict[str, Any],
+    css_files: Optional[List[str]] = None,
+) -> PdfDocumento:
+    """
+    Renderiza o template e devolve o PDF, reutilizando o da cache em disco
+    quando o documento não mudou.
+    """
+    chave, conteudo, html = preparar_documento(template, context, css_files)
+    if conteudo is None:
+        conteudo = generate_pdf(html, css_files=css_files)
+        if pdf_cache is not None:
+            pdf_cache.set(chave, conteudo)
+    return PdfDocumento(conteudo, chave)
+
+
+async def gerar_pdf_documento_async(
+    template: str,
+    context: Dict[str, Any],
+    css_files: Optional[List[str]] = None,
+) -> PdfDocumento:
+    """
+    Como gerar_pdf_documento, mas sem bloquear o event loop: o WeasyPrint
+    corre no pool de processos (src.pdf.executor) e o acesso à cache numa
+    thread.
+    """
+    preparado = await run_in_threadpool(preparar_documento, template, context, css_files)
+    return await concluir_documento_async(*preparado, css_files=css_files)
 
-        # 4) limpar ficheiro temporário
-        os.unlink(html_path)
-        return pdf_bytes
 
+async def concluir_documento_async(
+    chave: str,
+    conteudo: Optional[bytes],
+    html: Optional[str],
+    css_files: Optional[List[str]] = None,
+) -> PdfDocumento:
+    """Renderiza no pool um documento devolvido por preparar_documento (se não estava em cache)."""
+    if conteudo is not None:
+        return PdfDocumento(conteudo, chave)
+
+    try:
+        conteudo = await pdf_render_pool.renderizar(html, css_files)
+    except HTTPException:
+        raise
     except Exception as exc:
         raise HTTPException(
             status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Erro ao gerar PDF: {exc}",
         ) from exc
 
+    if pdf_cache is not None:
+        await run_in_threadpool(pdf_cache.set, chave, conteudo)
+    return PdfDocumento(conteudo, chave)
+
 
 # ──────────────────────────────────────────────────────────────
 # Funções específicas · Fatura
@@ -108,56 +182,114 @@ def generate_pdf(
 
 def generate_fatura_pdf(fatura_id: int, db) -> bytes:
     """Gera PDF para a Fatura indicada."""
+    return documento_fatura_pdf(fatura_id, db).conteudo
+
+
+def documento_fatura_pdf(fatura_id: int, db) -> PdfDocumento:
+    """PDF (com ETag) da Fatura indicada, servido da cache quando possível."""
+    return gerar_pdf_documento("fatura.html", _contexto_fatura(fatura_id, db), css_files=CSS_PADRAO)
+
+
+async def documento_fatura_pdf_async(fatura_id: int, db) -> PdfDocumento:
+    """Como documento_fatura_pdf, mas renderiza no pool de processos."""
+    context = await run_in_threadpool(_contexto_fatura, fatura_id, db)
+    return await gerar_pdf_documento_async("fatura.html", context, css_files=CSS_PADRAO)
+
+
+async def documento_fatura_carregada_async(fatura, db) -> PdfDocumento:
+    """PDF de uma Fatura já carregada com carregar_faturas_pdf (ex.: serviço de e-mail)."""
+    contextos = await run_in_threadpool(contextos_faturas, db, [fatura])
+    return await gerar_pdf_documento_async("fatura.html", contextos[fatura.id], css_files=CSS_PADRAO)
+
+
+def carregar_faturas_pdf(db, fatura_ids: List[int]) -> list:
+    """
+    Faturas com tudo o que o PDF usa, em poucas queries: itens e parcelas
+    (selectinload), paciente e consulta com as respetivas clínicas e plano
+    (joinedload).
+    """
+    from sqlalchemy.orm import joinedload, selectinload
+    from src.consultas.models import Consulta
+    from src.faturacao.models import Fatura
+    from src.pacientes.models import Paciente
+
+    return db.query(Fatura).options(
+        selectinload(Fatura.itens),
+        selectinload(Fatura.parcelas),
+        joinedload(Fatura.paciente).joinedload(Paciente.clinica),
+        joinedload(Fatura.consulta).joinedload(Consulta.clinica),
+        joinedload(Fatura.plano),
+    ).filter(Fatura.id.in_(fatura_ids)).all()
+
+
+def _numeros_dente_origens(db, faturas) -> Dict[Tuple[str, int], Any]:
+    """numero_dente dos itens de origem das faturas: uma query IN por tipo de origem."""
     from src.consultas.models import ConsultaItem
     from src.pacientes.models import PlanoItem
-    from src.faturacao.service import get_fatura
+
+    modelos = {"consulta_item": ConsultaItem, "plano_item": PlanoItem}
+    origens: Dict[str, set] = {tipo: set() for tipo in modelos}
+    for fatura in faturas:
+        for item in fatura.itens:
+            if item.origem_tipo in origens:
+                origens[item.origem_tipo].add(item.origem_id)
+
+    numeros: Dict[Tuple[str, int], Any] = {}
+    for tipo, ids in origens.items():
+        if not ids:
+            continue
+        modelo = modelos[tipo]
+        for origem_id, numero_dente in db.query(modelo.id, modelo.numero_dente).filter(modelo.id.in_(ids)):
+            numeros[(tipo, origem_id)] = numero_dente
+    return numeros
+
+
+def _clinica_fatura(fatura):
+    """Clínica da fatura pelas relações já carregadas: paciente, consulta, plano."""
+    for origem in (fatura.paciente, fatura.consulta, fatura.plano):
+        clinica = getattr(origem, "clinica", None) if origem is not None else None
+        if clinica is not None:
+            return clinica
+    return None
+
+
+def contextos_faturas(db, faturas) -> Dict[int, Dict[str, Any]]:
+    """
+    Contextos Jinja2 dos PDFs de faturas carregadas com carregar_faturas_pdf.
+    Número fixo de queries, independente do número de faturas e de itens.
+    """
     from src.clinica.service import get_clinica_details
 
-    fatura = get_fatura(db, fatura_id)
-    if not fatura:
+    numeros_dente = _numeros_dente_origens(db, faturas)
+    clinica_padrao = None
+    contextos = {}
+    for fatura in faturas:
+        clinica = _clinica_fatura(fatura)
+        if clinica is None:
+            if clinica_padrao is None:
+                clinica_padrao = get_clinica_details(db)
+            clinica = clinica_padrao
+        contextos[fatura.id] = contexto_fatura(fatura, clinica, numeros_dente)
+    return contextos
+
+
+def _contexto_fatura(fatura_id: int, db) -> Dict[str, Any]:
+    """Contexto Jinja2 do PDF da Fatura indicada."""
+    faturas = carregar_faturas_pdf(db, [fatura_id])
+    if not faturas:
         raise HTTPException(
             status.HTTP_404_NOT_FOUND,
             detail=f"Fatura ID={fatura_id} não encontrada.",
         )
+    return contextos_faturas(db, faturas)[fatura_id]
 
-    clinica = None
-    if fatura.paciente:
-        # Try to get clinic_id from patient if available
-        paciente_id = fatura.paciente.id
-        paciente_clinica_id = getattr(fatura.paciente, 'clinica_id', None)
-        
-        if paciente_clinica_id:
-            clinica = db.query(Clinica).filter(Clinica.id == paciente_clinica_id).first()
-            print(f"Found clinic {clinica.nome} from patient association")
-
-    # If no clinic found via patient, try consulta or plano
-    if not clinica and fatura.consulta_id and fatura.consulta:
-        consulta_clinica_id = getattr(fatura.consulta, 'clinica_id', None)
-        if consulta_clinica_id:
-            clinica = db.query(Clinica).filter(Clinica.id == consulta_clinica_id).first()
-            print(f"Found clinic {clinica.nome} from consulta association")
-    
-    if not clinica and fatura.plano_id and fatura.plano:
-        plano_clinica_id = getattr(fatura.plano, 'clinica_id', None)
-        if plano_clinica_id:
-            clinica = db.query(Clinica).filter(Clinica.id == plano_clinica_id).first()
-            print(f"Found clinic {clinica.nome} from plano association")
-
-    # Fallback to default clinic if still not found
-    if not clinica:
-        clinica = get_clinica_details(db)
-        print(f"Using default clinic: {clinica.nome}")
 
+def contexto_fatura(fatura, clinica, numeros_dente: Dict[Tuple[str, int], Any]) -> Dict[str, Any]:
+    """Contexto Jinja2 do PDF de uma Fatura (sem acesso à base de dados)."""
     # ── 1. Preparar itens ────────────────────────────────────
     itens = []
     for item in fatura.itens:
-        numero_dente = None
-        if item.origem_tipo == "consulta_item":
-            ci = db.get(ConsultaItem, item.origem_id)
-            numero_dente = getattr(ci, "numero_dente", None)
-        elif item.origem_tipo == "plano_item":
-            pi = db.get(PlanoItem, item.origem_id)
-            numero_dente = getattr(pi, "numero_dente", None)
+        numero_dente = numeros_dente.get((item.origem_tipo, item.origem_id))
 
         itens.append(
             {
@@ -236,9 +368,7 @@ def generate_fatura_pdf(fatura_id: int, db) -> bytes:
         else None,
     }
 
-    # ── 5. Renderizar & gerar PDF ────────────────────────────
-    html = render_template("fatura.html", context)
-    return generate_pdf(html, css_files=["styles.css"])
+    return context
 
 
 # ──────────────────────────────────────────────────────────────
@@ -247,8 +377,23 @@ def generate_fatura_pdf(fatura_id: int, db) -> bytes:
 
 def generate_orcamento_pdf(orcamento_id: int, db) -> bytes:
     """Gera PDF para Orçamento."""
+    return documento_orcamento_pdf(orcamento_id, db).conteudo
+
+
+def documento_orcamento_pdf(orcamento_id: int, db) -> PdfDocumento:
+    """PDF (com ETag) do Orçamento indicado, servido da cache quando possível."""
+    return gerar_pdf_documento("orcamento.html", _contexto_orcamento(orcamento_id, db), css_files=CSS_PADRAO)
+
+
+async def documento_orcamento_pdf_async(orcamento_id: int, db) -> PdfDocumento:
+    """Como documento_orcamento_pdf, mas renderiza no pool de processos."""
+    context = await run_in_threadpool(_contexto_orcamento, orcamento_id, db)
+    return await gerar_pdf_documento_async("orcamento.html", context, css_files=CSS_PADRAO)
+
+
+def _contexto_orcamento(orcamento_id: int, db) -> Dict[str, Any]:
+    """Contexto Jinja2 do PDF do Orçamento indicado."""
     from src.orcamento.service import get_orcamento
-    from src.clinica.service import get_clinica_details
 
     orcamento = get_orcamento(db, orcamento_id)
     if not orcamento:
@@ -256,27 +401,17 @@ def generate_orcamento_pdf(orcamento_id: int, db) -> bytes:
             status.HTTP_404_NOT_FOUND,
             detail=f"Orçamento ID={orcamento_id} não encontrado.",
         )
+    return contexto_orcamento(orcamento, db)
 
-    clinica = None
-    if orcamento.paciente:
-        # Try to get clinic_id from patient
-        paciente_clinica_id = getattr(orcamento.paciente, 'clinica_id', None)
-        
-        if paciente_clinica_id:
-            clinica = db.query(Clinica).filter(Clinica.id == paciente_clinica_id).first()
-            print(f"Found clinic {clinica.nome} from patient association")
 
-    # Fallback to direct orçamento association
-    if not clinica:
-        orcamento_clinica_id = getattr(orcamento, 'clinica_id', None)
-        if orcamento_clinica_id:
-            clinica = db.query(Clinica).filter(Clinica.id == orcamento_clinica_id).first()
-            print(f"Found clinic {clinica.nome} from orcamento association")
+def contexto_orcamento(orcamento, db) -> Dict[str, Any]:
+    """Contexto Jinja2 do PDF de um Orçamento já carregado (itens, artigos, paciente, entidade)."""
+    from src.clinica.service import get_clinica_details
 
-    # Fallback to default clinic if still not found
-    if not clinica:
+    # Clínica do paciente (já carregada no lote: Orcamento.paciente.clinica)
+    clinica = getattr(orcamento.paciente, "clinica", None) if orcamento.paciente else None
+    if clinica is None:
         clinica = get_clinica_details(db)
-        print(f"Using default clinic: {clinica.nome}")
 
     # Totais separados
     total_tratamentos = 0.0
@@ -330,9 +465,7 @@ def generate_orcamento_pdf(orcamento_id: int, db) -> bytes:
         if (ASSETS_DIR / "logo.png").exists()
         else None,
     }
-    print(f"Contexto para orçamento {orcamento_id}: {context}")
-    html = render_template("orcamento.html", context)
-    return generate_pdf(html, css_files=["styles.css"])
+    return context
 
 
 # ──────────────────────────────────────────────────────────────
@@ -341,6 +474,22 @@ def generate_orcamento_pdf(orcamento_id: int, db) -> bytes:
 
 def generate_plano_pdf(plano_id: int, db) -> bytes:
     """Gera PDF para Plano de Tratamento."""
+    return documento_plano_pdf(plano_id, db).conteudo
+
+
+def documento_plano_pdf(plano_id: int, db) -> PdfDocumento:
+    """PDF (com ETag) do Plano de Tratamento indicado, servido da cache quando possível."""
+    return gerar_pdf_documento("plano.html", _contexto_plano(plano_id, db), css_files=CSS_PADRAO)
+
+
+async def documento_plano_pdf_async(plano_id: int, db) -> PdfDocumento:
+    """Como documento_plano_pdf, mas renderiza no pool de processos."""
+    context = await run_in_threadpool(_contexto_plano, plano_id, db)
+    return await gerar_pdf_documento_async("plano.html", context, css_files=CSS_PADRAO)
+
+
+def _contexto_plano(plano_id: int, db) -> Dict[str, Any]:
+    """Contexto Jinja2 do PDF do Plano de Tratamento indicado."""
     from src.pacientes.service import get_plano_tratamento
     from src.clinica.service import get_clinica_details
 
@@ -357,14 +506,14 @@ def generate_plano_pdf(plano_id: int, db) -> bytes:
         paciente_clinica_id = getattr(plano.paciente, 'clinica_id', None)
 
         if paciente_clinica_id:
-            clinica = db.query(Clinica).filter(Clinica.id == paciente_clinica_id).first()
+            clinica = db.get(Clinica, paciente_clinica_id)
             print(f"Found clinic {clinica.nome} from patient association")
 
     # Fallback to direct plano association
     if not clinica:
         plano_clinica_id = getattr(plano, 'clinica_id', None)
         if plano_clinica_id:
-            clinica = db.query(Clinica).filter(Clinica.id == plano_clinica_id).first()
+            clinica = db.get(Clinica, plano_clinica_id)
             print(f"Found clinic {clinica.nome} from plano association")
 
     # Fallback to default clinic if still not found
@@ -428,5 +577,4 @@ def generate_plano_pdf(plano_id: int, db) -> bytes:
     }
 
     print(f"Contexto para plano {plano_id}: {context}")
-    html = render_template("plano.html", context)
-    return generate_pdf(html, css_files=["styles.css"])
+    return context
@@ -2,6 +2,6 @@
 Módulo de schedulers para tarefas automáticas.
 """
 
-from .stock_alerts import start_scheduler, stop_scheduler, run_now
+from .jobs import start_scheduler, stop_scheduler, run_now, executar_job, JOBS
 
-__all__ = ["start_scheduler", "stop_scheduler", "run_now"]
+__all__ = ["start_scheduler", "stop_scheduler", "run_now", "executar_job", "JOBS"]
@@ -0,0 +1,33 @@
+"""
+Job de manutenção da tabela AuditoriaResumoDiario.
+Executa diariamente logo após a meia-noite (UTC) e resume os dias fechados,
+para que os dashboards de contabilidade não tenham de recontar a tabela
+Auditoria a cada pedido.
+"""
+
+import logging
+
+from sqlalchemy.orm import Session
+
+from src.database import SessionLocal
+from src.auditoria.service import atualizar_resumo_diario
+
+logger = logging.getLogger(__name__)
+
+
+def atualizar_resumo_auditoria():
+    """
+    Atualiza o resumo diário de auditoria até ontem.
+    Chamada automaticamente pelo scheduler (corre numa thread do executor).
+    """
+    db: Session = SessionLocal()
+    try:
+        desde = atualizar_resumo_diario(db)
+        if desde:
+            logger.info(f"📊 Resumo diário de auditoria atualizado desde {desde.isoformat()}")
+    except Exception as e:
+        db.rollback()
+        logger.error(f"❌ Erro ao atualizar resumo de auditoria: {e}", exc_info=True)
+        raise
+    finally:
+        db.close()
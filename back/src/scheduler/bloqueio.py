@@ -0,0 +1,85 @@
+"""
+Exclusão mútua entre workers para os jobs do scheduler.
+
+Com vários workers (ou instâncias) cada um tem o seu scheduler; um job que
+envia e-mails não pode correr em dois ao mesmo tempo. Em PostgreSQL usa-se um
+advisory lock de sessão (pg_try_advisory_lock) numa ligação dedicada, libertado
+no fim do job ou, se o processo morrer, quando a ligação fecha. Noutras bases
+de dados (desenvolvimento) o bloqueio é apenas dentro do processo.
+"""
+
+import hashlib
+import logging
+import threading
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from starlette.concurrency import run_in_threadpool
+
+from src.database import engine
+
+logger = logging.getLogger(__name__)
+
+_locais: Dict[str, threading.Lock] = {}
+_locais_lock = threading.Lock()
+
+
+def chave_bloqueio(nome: str) -> int:
+    """Chave bigint (com sinal) estável para um nome de job."""
+    return int.from_bytes(hashlib.sha1(nome.encode()).digest()[:8], "big", signed=True)
+
+
+def _obter(nome: str):
+    """Tenta obter o bloqueio (bloqueante: corre numa thread). Devolve o que `_libertar` precisa, ou None."""
+    if engine.dialect.name != "postgresql":
+        with _locais_lock:
+            local = _locais.setdefault(nome, threading.Lock())
+        return local if local.acquire(blocking=False) else None
+
+    chave = chave_bloqueio(nome)
+    conn = engine.connect()
+    try:
+        obtido = bool(conn.execute(text("SELECT pg_try_advisory_lock(:chave)"), {"chave": chave}).scalar())
+        conn.commit()
+    except Exception:
+        conn.close()
+        raise
+    if not obtido:
+        conn.close()
+        return None
+    return conn
+
+
+def _libertar(nome: str, bloqueio) -> None:
+    if isinstance(bloqueio, Connection):
+        try:
+            bloqueio.execute(text("SELECT pg_advisory_unlock(:chave)"), {"chave": chave_bloqueio(nome)})
+            bloqueio.commit()
+        except Exception as e:
+            # Ligação perdida: o servidor já libertou o bloqueio
+            logger.warning(f"Falha ao libertar o bloqueio '{nome}': {e}")
+            bloqueio.invalidate()
+        finally:
+            bloqueio.close()
+    else:
+        bloqueio.release()
+
+
+@asynccontextmanager
+async def bloqueio_exclusivo(nome: str) -> AsyncIterator[bool]:
+    """
+    Tenta obter o bloqueio `nome` sem esperar; devolve True se o obteve.
+    A ligação e o lock/unlock correm numa thread, fora do event loop.
+
+        async with bloqueio_exclusivo("lembretes_marcacoes") as obtido:
+            if not obtido:
+                return   # outro worker está a correr o job
+    """
+    bloqueio = await run_in_threadpool(_obter, nome)
+    try:
+        yield bloqueio is not None
+    finally:
+        if bloqueio is not None:
+            await run_in_threadpool(_libertar, nome, bloqueio)
@@ -0,0 +1,309 @@
+"""
+Registo dos jobs do scheduler e coordenação entre instâncias.
+
+Cada worker (ou contentor) que arranca o scheduler agenda os mesmos jobs; para
+cada job correr uma única vez por execução agendada no cluster, todos passam
+por `executar_job`:
+
+1. advisory lock "job:<id>" (src.scheduler.bloqueio), sem esperar: uma
+   instância que encontre o job a correr noutra não faz nada;
+2. linha em ExecucaoJob com (job_id, agendado_para) único: a primeira
+   instância a registar a execução agendada fica com ela; as restantes, mesmo
+   que cheguem depois de a primeira ter terminado, encontram a linha e saltam;
+3. estado, duração e erro ficam no histórico (GET /metrics/scheduler).
+
+`agendado_para` é a hora prevista pelo trigger (a mesma em todas as
+instâncias: os triggers de intervalo partem de uma origem fixa). Execuções
+fora da grelha — no arranque ou manuais — usam a hora atual e só são
+protegidas pelo lock.
+
+O scheduler pode correr nos workers web (SCHEDULER_ENABLED) ou num processo
+próprio: python -m src.scheduler.worker.
+"""
+
+import asyncio
+import logging
+import os
+import socket
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional
+
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.triggers.base import BaseTrigger
+from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from src.core.config import settings
+from src.database import SessionLocal
+from src.email.outbox import limpar_enviados as limpar_outbox_email
+from src.scheduler.auditoria_resumo import atualizar_resumo_auditoria
+from src.scheduler.bloqueio import bloqueio_exclusivo
+from src.scheduler.lembretes import enviar_lembretes_automaticos
+from src.scheduler.models import ExecucaoJob
+from src.scheduler.stock_alerts import enviar_alertas_todas_clinicas
+
+logger = logging.getLogger(__name__)
+
+# Origem comum dos triggers de intervalo: todas as instâncias têm a mesma grelha
+ORIGEM_INTERVALOS = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+INSTANCIA = f"{socket.gethostname()}:{os.getpid()}"[:100]
+
+
+@dataclass
+class JobDefinicao:
+    id: str
+    nome: str
+    funcao: Callable            # síncrona (corre numa thread) ou async
+    trigger: BaseTrigger
+    args: tuple = field(default_factory=tuple)
+    arrancar_ja: bool = False   # executar também quando o scheduler arranca
+
+
+def limpar_historico_jobs(dias: int) -> int:
+    """Remove o histórico de execuções com mais de `dias` dias."""
+    db = SessionLocal()
+    try:
+        removidas = db.query(ExecucaoJob).filter(
+            ExecucaoJob.iniciado_em < datetime.now(timezone.utc) - timedelta(days=dias)
+        ).delete(synchronize_session=False)
+        db.commit()
+        return removidas
+    finally:
+        db.close()
+
+
+def _definicoes() -> Dict[str, JobDefinicao]:
+    jobs = [
+        # Todos os dias às 8h da manhã
+        JobDefinicao(
+            "stock_alerts_daily", "Alertas de Stock Diários",
+            enviar_alertas_todas_clinicas,
+            CronTrigger(hour=8, minute=0, timezone="Europe/Lisbon"),  # Ajustar para o timezone da clínica
+        ),
+        # Resumo diário de auditoria (dias fechados, em UTC); também corre no arranque
+        JobDefinicao(
+            "auditoria_resumo_daily", "Resumo Diário de Auditoria",
+            atualizar_resumo_auditoria,
+            CronTrigger(hour=0, minute=10, timezone="UTC"),
+            arrancar_ja=True,
+        ),
+        # Limpeza diária dos e-mails já enviados da outbox
+        JobDefinicao(
+            "email_outbox_limpeza_daily", "Limpeza da Outbox de E-mails",
+            limpar_outbox_email,
+            CronTrigger(hour=3, minute=30, timezone="UTC"),
+            args=(settings.EMAIL_OUTBOX_RETENCAO_DIAS,),
+        ),
+        # Limpeza diária do histórico de execuções
+        JobDefinicao(
+            "scheduler_historico_limpeza_daily", "Limpeza do Histórico do Scheduler",
+            limpar_historico_jobs,
+            CronTrigger(hour=3, minute=45, timezone="UTC"),
+            args=(settings.SCHEDULER_HISTORICO_DIAS,),
+        ),
+    ]
+    # Lembretes automáticos de consulta
+    if settings.LEMBRETES_ENABLED:
+        jobs.append(JobDefinicao(
+            "lembretes_marcacoes", "Lembretes Automáticos de Consulta",
+            enviar_lembretes_automaticos,
+            IntervalTrigger(minutes=settings.LEMBRETES_INTERVALO_MINUTOS, start_date=ORIGEM_INTERVALOS),
+        ))
+    return {job.id: job for job in jobs}
+
+
+JOBS: Dict[str, JobDefinicao] = _definicoes()
+
+# Scheduler global
+scheduler: Optional[AsyncIOScheduler] = None
+# Referências às execuções manuais em curso (evita que sejam recolhidas pelo GC)
+_tarefas = set()
+
+
+# ──────────────────────────────────────────────────────────────
+# Coordenação
+# ──────────────────────────────────────────────────────────────
+
+def _hora_agendada(job: JobDefinicao, agora: datetime) -> datetime:
+    """
+    Hora prevista pelo trigger para a execução atual. O scheduler só corre um
+    job até SCHEDULER_MISFIRE_GRACE_SECONDS depois da hora prevista, pelo que
+    esta é a primeira hora do trigger a partir de agora - tolerância.
+    """
+    tolerancia = timedelta(seconds=settings.SCHEDULER_MISFIRE_GRACE_SECONDS)
+    prevista = job.trigger.get_next_fire_time(None, agora - tolerancia)
+    if prevista is None or prevista > agora:
+        # Fora da grelha (arranque ou execução manual)
+        return agora
+    return prevista
+
+
+def _registar_inicio(job_id: str, agendado_para: datetime) -> Optional[int]:
+    """Regista a execução; None se outra instância já tem esta execução agendada."""
+    db: Session = SessionLocal()
+    try:
+        execucao = ExecucaoJob(
+            job_id=job_id,
+            agendado_para=agendado_para,
+            iniciado_em=datetime.now(timezone.utc),
+            estado="em_execucao",
+            instancia=INSTANCIA,
+        )
+        try:
+            db.add(execucao)
+            db.flush()
+            execucao_id = execucao.id
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            return None
+        return execucao_id
+    finally:
+        db.close()
+
+
+def _registar_fim(execucao_id: int, duracao_ms: int, erro: Optional[str]) -> None:
+    db: Session = SessionLocal()
+    try:
+        db.query(ExecucaoJob).filter(ExecucaoJob.id == execucao_id).update({
+            ExecucaoJob.terminado_em: datetime.now(timezone.utc),
+            ExecucaoJob.duracao_ms: duracao_ms,
+            ExecucaoJob.estado: "erro" if erro else "sucesso",
+            ExecucaoJob.erro: erro,
+        }, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+async def executar_job(job_id: str, manual: bool = False) -> bool:
+    """
+    Executa um job registado, no máximo uma vez por execução agendada no
+    cluster. Devolve True se correu nesta instância.
+    """
+    job = JOBS[job_id]
+    agora = datetime.now(timezone.utc)
+    agendado_para = agora if manual else _hora_agendada(job, agora)
+
+    async with bloqueio_exclusivo(f"job:{job_id}") as obtido:
+        if not obtido:
+            logger.info(f"⏭️  Job '{job_id}' já em execução noutra instância")
+            return False
+
+        execucao_id = await run_in_threadpool(_registar_inicio, job_id, agendado_para)
+        if execucao_id is None:
+            logger.info(f"⏭️  Job '{job_id}' ({agendado_para:%Y-%m-%d %H:%M}) já executado noutra instância")
+            return False
+
+        inicio = time.perf_counter()
+        erro = None
+        try:
+            if asyncio.iscoroutinefunction(job.funcao):
+                await job.funcao(*job.args)
+            else:
+                await run_in_threadpool(job.funcao, *job.args)
+        except Exception as e:
+            erro = str(e) or e.__class__.__name__
+            logger.error(f"❌ Erro no job '{job_id}': {e}", exc_info=True)
+
+        duracao_ms = int((time.perf_counter() - inicio) * 1000)
+        await run_in_threadpool(_registar_fim, execucao_id, duracao_ms, erro)
+        return True
+
+
+# ──────────────────────────────────────────────────────────────
+# Consulta do registo e histórico
+# ──────────────────────────────────────────────────────────────
+
+def estado_jobs(db: Session) -> List[dict]:
+    """Jobs registados, próxima execução (neste processo) e última execução (cluster)."""
+    ultimas_ids = db.query(func.max(ExecucaoJob.id)).group_by(ExecucaoJob.job_id).subquery()
+    ultimas = {
+        execucao.job_id: execucao
+        for execucao in db.query(ExecucaoJob).filter(ExecucaoJob.id.in_(ultimas_ids.select())).all()
+    }
+    resultado = []
+    for job in JOBS.values():
+        agendado = scheduler.get_job(job.id) if scheduler is not None else None
+        resultado.append({
+            "id": job.id,
+            "nome": job.nome,
+            "trigger": str(job.trigger),
+            "proxima_execucao": agendado.next_run_time if agendado else None,
+            "ultima_execucao": ultimas.get(job.id),
+        })
+    return resultado
+
+
+def historico_job(db: Session, job_id: str, limit: int = 50) -> List[ExecucaoJob]:
+    return db.query(ExecucaoJob).filter(
+        ExecucaoJob.job_id == job_id
+    ).order_by(ExecucaoJob.iniciado_em.desc()).limit(limit).all()
+
+
+# ──────────────────────────────────────────────────────────────
+# Ciclo de vida
+# ──────────────────────────────────────────────────────────────
+
+def start_scheduler():
+    """
+    Inicia o scheduler com todos os jobs registados.
+    Chamado no startup da aplicação FastAPI (SCHEDULER_ENABLED) ou pelo
+    processo próprio do scheduler.
+    """
+    global scheduler
+
+    if scheduler is not None:
+        logger.warning("Scheduler já está em execução")
+        return
+
+    scheduler = AsyncIOScheduler(job_defaults={
+        "coalesce": True,
+        "max_instances": 1,
+        "misfire_grace_time": settings.SCHEDULER_MISFIRE_GRACE_SECONDS,
+    })
+
+    for job in JOBS.values():
+        opcoes = {"next_run_time": datetime.now(timezone.utc)} if job.arrancar_ja else {}
+        scheduler.add_job(
+            executar_job,
+            trigger=job.trigger,
+            args=[job.id],
+            id=job.id,
+            name=job.nome,
+            replace_existing=True,
+            **opcoes
+        )
+
+    scheduler.start()
+    logger.info(f"📅 Scheduler iniciado com {len(JOBS)} job(s) ({INSTANCIA})")
+
+
+def stop_scheduler():
+    """
+    Para o scheduler.
+    Deve ser chamado no shutdown da aplicação FastAPI.
+    """
+    global scheduler
+
+    if scheduler is not None:
+        scheduler.shutdown(wait=False)
+        scheduler = None
+        logger.info("📅 Scheduler parado")
+
+
+def run_now(job_id: str = "stock_alerts_daily"):
+    """
+    Executa um job imediatamente (útil para testes), com registo no histórico.
+    """
+    tarefa = asyncio.create_task(executar_job(job_id, manual=True))
+    _tarefas.add(tarefa)
+    tarefa.add_done_callback(_tarefas.discard)
+    logger.info(f"🔔 Execução manual do job '{job_id}' iniciada")
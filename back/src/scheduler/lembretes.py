@@ -0,0 +1,146 @@
+"""
+Lembretes automáticos de consulta.
+
+A cada LEMBRETES_INTERVALO_MINUTOS o job seleciona, numa única query (índice
+ix_marcacoes_estado_inicio), as marcações agendadas que começam dentro da
+janela de antecedência de cada clínica (configuração
+"lembrete_horas_antecedencia") e que ainda não têm lembrete enviado na tabela
+LembreteMarcacao. Os e-mails seguem pelo envio em massa (src.email.envio_massa),
+com ligações SMTP reutilizadas.
+
+Cada lembrete é registado (tentativas + 1) antes do envio e marcado como
+enviado depois; uma falha é repetida nas execuções seguintes até
+LEMBRETES_MAX_TENTATIVAS. O registo torna o job idempotente entre reinícios;
+a exclusão entre workers é feita pelo scheduler (src.scheduler.jobs).
+"""
+
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List
+
+from sqlalchemy import and_, exists, or_
+from sqlalchemy.orm import Session, contains_eager, joinedload
+
+from src.core.config import settings
+from src.database import SessionLocal
+from src.clinica.models import Clinica
+from src.clinica.service import get_lembrete_settings_clinicas
+from src.email.envio_massa import MensagemEmail, enviar_em_massa
+from src.email.service import mensagem_lembrete, renderizar_corpo
+from src.email.util import obter_email_configs
+from src.marcacoes.models import LembreteMarcacao, Marcacao
+from src.pacientes.models import Paciente
+
+logger = logging.getLogger(__name__)
+
+
+def _marcacoes_a_lembrar(db: Session, janelas: Dict[int, List[int]], agora: datetime) -> List[Marcacao]:
+    """
+    Marcações agendadas dentro da janela da sua clínica e sem lembrete tratado,
+    com paciente, médico e clínica (uma query). `janelas`: horas → clínicas.
+    """
+    tratado = exists().where(
+        LembreteMarcacao.marcacao_id == Marcacao.id,
+        LembreteMarcacao.data_hora_inicio == Marcacao.data_hora_inicio,
+        or_(
+            LembreteMarcacao.enviado_em.isnot(None),
+            LembreteMarcacao.tentativas >= settings.LEMBRETES_MAX_TENTATIVAS,
+        ),
+    )
+    na_janela = or_(*[
+        and_(Marcacao.clinic_id.in_(clinica_ids), Marcacao.data_hora_inicio <= agora + timedelta(hours=horas))
+        for horas, clinica_ids in janelas.items()
+    ])
+    return db.query(Marcacao).join(Marcacao.paciente).options(
+        contains_eager(Marcacao.paciente),
+        joinedload(Marcacao.medico),
+        joinedload(Marcacao.clinic),
+    ).filter(
+        Marcacao.estado == "agendada",
+        Marcacao.data_hora_inicio > agora,
+        na_janela,
+        Paciente.email.isnot(None),
+        Paciente.email != "",
+        ~tratado,
+    ).order_by(Marcacao.data_hora_inicio).limit(settings.LEMBRETES_MAX_POR_EXECUCAO).all()
+
+
+def _registar_tentativas(db: Session, marcacoes: List[Marcacao]) -> Dict[int, int]:
+    """
+    Regista uma tentativa por marcação (linhas novas ou falhas anteriores,
+    lidas numa query) e devolve marcacao_id → id do LembreteMarcacao.
+    """
+    inicio_por_marcacao = {marc.id: marc.data_hora_inicio for marc in marcacoes}
+    existentes = {
+        registo.marcacao_id: registo
+        for registo in db.query(LembreteMarcacao).filter(
+            LembreteMarcacao.marcacao_id.in_(inicio_por_marcacao)
+        ).all()
+        if registo.data_hora_inicio == inicio_por_marcacao[registo.marcacao_id]
+    }
+    registos = {}
+    for marcacao_id, inicio in inicio_por_marcacao.items():
+        registo = existentes.get(marcacao_id)
+        if registo is None:
+            registo = LembreteMarcacao(marcacao_id=marcacao_id, data_hora_inicio=inicio, tentativas=0)
+            db.add(registo)
+        registo.tentativas += 1
+        registos[marcacao_id] = registo
+    db.flush()
+    ids = {marcacao_id: registo.id for marcacao_id, registo in registos.items()}
+    db.commit()
+    return ids
+
+
+async def enviar_lembretes_automaticos() -> int:
+    """Envia os lembretes de consulta em falta. Chamada pelo scheduler."""
+    agora = datetime.now(timezone.utc)
+    db: Session = SessionLocal()
+    try:
+        clinica_ids = [clinica_id for (clinica_id,) in db.query(Clinica.id).all()]
+        lembrete_settings = get_lembrete_settings_clinicas(db, clinica_ids)
+        ativas = [cid for cid in clinica_ids if lembrete_settings[cid]["lembrete_automatico"]]
+        # Clínicas sem configuração de e-mail ativa ficam de fora
+        configs = obter_email_configs(db, ativas)
+
+        janelas: Dict[int, List[int]] = defaultdict(list)
+        for clinica_id in configs:
+            janelas[lembrete_settings[clinica_id]["lembrete_horas_antecedencia"]].append(clinica_id)
+        if not janelas:
+            return 0
+
+        marcacoes = _marcacoes_a_lembrar(db, janelas, agora)
+        if not marcacoes:
+            return 0
+
+        # Renderizar antes do commit (que expira as marcações carregadas)
+        por_clinica = {clinica_id: (config, []) for clinica_id, config in configs.items()}
+        for marc in marcacoes:
+            dados = mensagem_lembrete(marc)
+            por_clinica[marc.clinic_id][1].append(MensagemEmail(
+                id=marc.id,
+                assunto=dados["assunto"],
+                destinatario=marc.paciente.email,
+                html=renderizar_corpo(dados["nome_template"], dados["dados_template"]),
+            ))
+
+        registos = _registar_tentativas(db, marcacoes)
+        resultados = await enviar_em_massa(por_clinica)
+
+        enviado_em = datetime.now(timezone.utc)
+        db.bulk_update_mappings(LembreteMarcacao, [
+            {
+                "id": registos[marcacao_id],
+                "enviado_em": enviado_em if erro is None else None,
+                "ultimo_erro": erro,
+            }
+            for marcacao_id, erro in resultados.items()
+        ])
+        db.commit()
+
+        enviados = sum(1 for erro in resultados.values() if erro is None)
+        logger.info(f"⏰ Lembretes automáticos: {enviados} enviado(s), {len(resultados) - enviados} falha(s)")
+        return enviados
+    finally:
+        db.close()
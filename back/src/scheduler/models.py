@@ -0,0 +1,29 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import Column, DateTime, Index, Integer, String, Text, UniqueConstraint
+
+from src.database import Base
+
+
+class ExecucaoJob(Base):
+    """
+    Histórico das execuções dos jobs do scheduler. A unicidade de
+    (job_id, agendado_para) garante que cada execução agendada corre numa
+    única instância, mesmo com vários workers/contentores a correr o scheduler.
+    """
+    __tablename__ = "ExecucaoJob"
+
+    id            = Column(Integer, primary_key=True, index=True)
+    job_id        = Column(String(100), nullable=False)
+    agendado_para = Column(DateTime(timezone=True), nullable=False)
+    iniciado_em   = Column(DateTime(timezone=True), nullable=False, default=lambda: datetime.now(timezone.utc))
+    terminado_em  = Column(DateTime(timezone=True), nullable=True)
+    duracao_ms    = Column(Integer, nullable=True)
+    estado        = Column(String(20), nullable=False, default="em_execucao")  # em_execucao, sucesso, erro
+    erro          = Column(Text, nullable=True)
+    instancia     = Column(String(100), nullable=True)   # host:pid que executou
+
+    __table_args__ = (
+        UniqueConstraint("job_id", "agendado_para", name="uq_execucaojob_job_agendado"),
+        Index("ix_execucaojob_job_inicio", "job_id", "iniciado_em"),
+    )
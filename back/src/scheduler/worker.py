@@ -0,0 +1,44 @@
+"""
+Processo próprio do scheduler.
+
+Com vários workers web ou contentores, o scheduler pode sair do processo web
+(SCHEDULER_ENABLED=false na API) e correr aqui, num único processo:
+
+    python -m src.scheduler.worker
+
+Os jobs são os mesmos (src.scheduler.jobs) e continuam coordenados pela base
+de dados, pelo que correr mais do que um processo destes é seguro.
+"""
+
+import asyncio
+import logging
+import signal
+
+# Garantir que todos os modelos referenciados pelas FKs estão registados
+import src.main  # noqa: F401
+from src.auditoria.writer import auditoria_writer
+from src.email.render import precompilar as precompilar_templates_email
+from src.scheduler.jobs import JOBS, start_scheduler, stop_scheduler
+
+logger = logging.getLogger("src.scheduler.worker")
+
+
+async def main() -> None:
+    parar = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sinal in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sinal, parar.set)
+
+    precompilar_templates_email()
+    start_scheduler()
+    logger.info(f"📅 Processo do scheduler em execução ({len(JOBS)} job(s)); Ctrl+C para terminar")
+    try:
+        await parar.wait()
+    finally:
+        stop_scheduler()
+        auditoria_writer.parar()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    asyncio.run(main())
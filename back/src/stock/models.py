@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, Boolean, Date, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, Text, Boolean, Date, ForeignKey, DateTime, UniqueConstraint
 from sqlalchemy.orm import relationship
 from src.database import Base
 from datetime import datetime
@@ -19,6 +19,7 @@ class ItemStock(Base):
     movimentos = relationship("MovimentoStock", back_populates="item")
     filiais = relationship("ItemFilial", back_populates="item")
     lotes = relationship("ItemLote", back_populates="item")  
+    saldo = relationship("ItemStockSaldo", back_populates="item", uselist=False)
     
 class MovimentoStock(Base):
     __tablename__ = "MovimentoStock"
@@ -52,5 +53,24 @@ class ItemLote(Base):
     lote = Column(String(50), nullable=False)
     validade = Column(Date, nullable=False)
     quantidade = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("item_id", "lote", "validade", name="uq_itemlote_item_lote_validade"),
+    )
+
     # Relacionamento com o item
-    item = relationship("ItemStock", back_populates="lotes")
\ No newline at end of file
+    item = relationship("ItemStock", back_populates="lotes")
+
+class ItemStockSaldo(Base):
+    """
+    Saldo atual de cada item (soma das quantidades dos lotes), mantido pelas
+    funções de movimento de stock na mesma transação que altera os lotes.
+    Verificável com `scripts/reconciliar_saldos_stock.py`.
+    """
+    __tablename__ = "ItemStockSaldo"
+    item_id = Column(Integer, ForeignKey("ItemStock.id"), primary_key=True)
+    clinica_id = Column(Integer, ForeignKey("Clinica.id"), index=True)
+    quantidade = Column(Integer, nullable=False, default=0)
+    atualizado_em = Column(DateTime, default=datetime.utcnow)
+
+    item = relationship("ItemStock", back_populates="saldo")
@@ -1,6 +1,8 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, File, Form, UploadFile
 from sqlalchemy.orm import Session
+from typing import Optional
 from src.database import SessionLocal
+from src.core.config import settings
 from . import service, schemas
 from src.utilizadores.dependencies import get_current_user
 
@@ -32,10 +34,15 @@ def criar_item(
 @router.get("/items/{clinica_id}", response_model=list[schemas.ItemStockResponse])
 def listar_itens(
     clinica_id: int,
+    ativo: Optional[bool] = Query(None, description="Filtrar por itens ativos/inativos"),
+    abaixo_minimo: bool = Query(False, description="Apenas itens abaixo da quantidade mínima"),
+    fornecedor: Optional[str] = Query(None, description="Filtrar por fornecedor"),
     db: Session = Depends(get_db),
     user = Depends(get_current_user)  
 ):
-    return service.listar_itens_stock(db, clinica_id)
+    return service.listar_itens_stock(
+        db, clinica_id, ativo=ativo, abaixo_minimo=abaixo_minimo, fornecedor=fornecedor
+    )
 
 @router.get("/item/{item_id}", response_model=schemas.ItemStockResponse)
 def obter_item_por_id(
@@ -71,6 +78,44 @@ def criar_movimento(
     return service.criar_movimento_stock(db, movimento)
 
 
+def _importar_entradas(db: Session, clinica_id: int, linhas: list, user):
+    if len(linhas) > settings.STOCK_IMPORTACAO_MAX_LINHAS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Máximo de {settings.STOCK_IMPORTACAO_MAX_LINHAS} linhas por importação."
+        )
+    return service.importar_entradas_stock(db, clinica_id, linhas, user.id)
+
+@router.post("/movimentos/entradas", response_model=schemas.EntradaStockLoteResponse)
+def importar_entradas(
+    dados: schemas.EntradaStockLoteCreate,
+    db: Session = Depends(get_db),
+    user = Depends(get_current_user)
+):
+    """
+    Importa várias entradas de stock de uma vez. Se alguma linha for
+    inválida nada é gravado; o relatório indica o estado de cada linha.
+    """
+    return _importar_entradas(db, dados.clinica_id, dados.linhas, user)
+
+@router.post("/movimentos/entradas/csv", response_model=schemas.EntradaStockLoteResponse)
+def importar_entradas_csv(
+    clinica_id: int = Form(...),
+    ficheiro: UploadFile = File(...),
+    db: Session = Depends(get_db),
+    user = Depends(get_current_user)
+):
+    """
+    Importa entradas de stock a partir de um CSV com as colunas
+    item_id, lote, validade, quantidade e (opcional) justificacao.
+    """
+    try:
+        linhas = service.ler_entradas_csv(ficheiro.file.read())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return _importar_entradas(db, clinica_id, linhas, user)
+
+
 @router.get("/movimentos/{item_id}", response_model=list[schemas.MovimentoStockResponse])
 def listar_movimentos(
     item_id: int,
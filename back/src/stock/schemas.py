@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import Optional, List
+from pydantic import BaseModel, Field, field_validator
+from typing import Optional, List, Dict, Any
 from datetime import date, datetime
 
 class ItemLoteBase(BaseModel):
@@ -83,4 +83,43 @@ class ItemFilialBase(BaseModel):
 
 class ItemFilialResponse(ItemFilialBase):
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+class EntradaStockLinha(BaseModel):
+    item_id: int
+    lote: str = Field(..., min_length=1, max_length=50)
+    validade: date
+    quantidade: int = Field(..., gt=0)
+    justificacao: Optional[str] = None
+
+    @field_validator("lote")
+    @classmethod
+    def lote_maiusculas(cls, v: str) -> str:
+        return v.strip().upper()
+
+    @field_validator("validade", mode="before")
+    @classmethod
+    def validade_formato_pt(cls, v):
+        # Aceita também dd/mm/aaaa (formato habitual das guias de remessa)
+        if isinstance(v, str) and "/" in v:
+            return datetime.strptime(v.strip(), "%d/%m/%Y").date()
+        return v
+
+class EntradaStockLoteCreate(BaseModel):
+    clinica_id: int
+    # Linhas em bruto: são validadas uma a uma para o relatório por linha
+    linhas: List[Dict[str, Any]]
+
+class EntradaStockLinhaResultado(BaseModel):
+    linha: int
+    item_id: Optional[Any] = None
+    lote: Optional[Any] = None
+    estado: str  # "importada", "erro" ou "nao_importada"
+    erro: Optional[str] = None
+
+class EntradaStockLoteResponse(BaseModel):
+    total_linhas: int
+    importadas: int
+    rejeitadas: int
+    resultados: List[EntradaStockLinhaResultado]
+
@@ -1,15 +1,51 @@
+import csv
+import io
 from datetime import date, timedelta
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import case, func, insert, select, true
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from pydantic import ValidationError
 
 from src.auditoria.utils import registrar_auditoria
 from . import models, schemas
 
 
 def get_quantidade_atual(db: Session, item_id: int) -> int:
-    total = db.query(func.sum(models.ItemLote.quantidade)).filter_by(item_id=item_id).scalar()
+    total = db.query(models.ItemStockSaldo.quantidade).filter_by(item_id=item_id).scalar()
     return total or 0
 
+def ajustar_saldo(db: Session, item_id: int, delta: int) -> None:
+    """
+    Soma `delta` ao saldo materializado do item (ItemStockSaldo), criando a
+    linha se não existir. Deve ser chamado na mesma transação que altera
+    as quantidades dos lotes.
+    """
+    ajustar_saldos(db, {item_id: delta})
+
+def ajustar_saldos(db: Session, deltas: Dict[int, int]) -> None:
+    """Versão em lote de `ajustar_saldo`: um único upsert para {item_id: delta}."""
+    deltas = {item_id: delta for item_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    # Ordenados por item para bloquear as linhas sempre pela mesma ordem
+    stmt = pg_insert(models.ItemStockSaldo).values([
+        {
+            "item_id": item_id,
+            "clinica_id": select(models.ItemStock.clinica_id).where(models.ItemStock.id == item_id).scalar_subquery(),
+            "quantidade": delta,
+            "atualizado_em": func.now(),
+        }
+        for item_id, delta in sorted(deltas.items())
+    ])
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[models.ItemStockSaldo.item_id],
+        set_={
+            "quantidade": models.ItemStockSaldo.quantidade + stmt.excluded.quantidade,
+            "atualizado_em": stmt.excluded.atualizado_em,
+        }
+    ))
+
 # --------- ITEM STOCK ---------
 def criar_item_stock(db: Session, item: schemas.ItemStockCreate, user_id: int):
     db_item = models.ItemStock(**item.dict())
@@ -21,13 +57,39 @@ def criar_item_stock(db: Session, item: schemas.ItemStockCreate, user_id: int):
     )
     return db_item
 
-def obter_item_stock_por_id(db: Session, item_id: int):
-    item = db.query(models.ItemStock).filter_by(id=item_id).first()
-    if not item:
-        return None
-    quantidade_atual = get_quantidade_atual(db, item.id)
-    lotes = [schemas.ItemLoteResponse.model_validate(lote) for lote in item.lotes]
-    proximo_lote = get_proximo_lote(db, item.id)
+def _query_itens_stock(db: Session):
+    """
+    Itens de stock com a quantidade atual (saldo materializado) e o próximo
+    lote a expirar, numa única query, mais um selectinload dos lotes.
+    Devolve a query e a expressão da quantidade atual (para filtros).
+
+    O próximo lote é um LATERAL correlacionado com cada item (LIMIT 1 pelo
+    índice de item_id): só são lidos os lotes dos itens devolvidos, e não a
+    tabela ItemLote inteira.
+    """
+    proximo = (
+        select(models.ItemLote.lote, models.ItemLote.validade)
+        .where(models.ItemLote.item_id == models.ItemStock.id)
+        .order_by(models.ItemLote.validade, models.ItemLote.id)
+        .limit(1)
+        .lateral("proximo")
+    )
+    quantidade_atual = func.coalesce(models.ItemStockSaldo.quantidade, 0)
+
+    query = (
+        db.query(
+            models.ItemStock,
+            quantidade_atual.label("quantidade_atual"),
+            proximo.c.lote,
+            proximo.c.validade
+        )
+        .outerjoin(models.ItemStockSaldo, models.ItemStockSaldo.item_id == models.ItemStock.id)
+        .outerjoin(proximo, true())
+        .options(selectinload(models.ItemStock.lotes))
+    )
+    return query, quantidade_atual
+
+def _item_stock_dict(item: models.ItemStock, quantidade_atual: int, lote_proximo, validade_proxima) -> dict:
     return {
         "id": item.id,
         "clinica_id": item.clinica_id,
@@ -38,33 +100,42 @@ def obter_item_stock_por_id(db: Session, item_id: int):
         "fornecedor": item.fornecedor,
         "ativo": item.ativo,
         "quantidade_atual": quantidade_atual,
-        "lote_proximo": proximo_lote.lote if proximo_lote else None,
-        "validade_proxima": proximo_lote.validade if proximo_lote else None,
-        "lotes": lotes
+        "lote_proximo": lote_proximo,
+        "validade_proxima": validade_proxima,
+        "lotes": [schemas.ItemLoteResponse.model_validate(lote) for lote in item.lotes]
     }
 
-def listar_itens_stock(db: Session, clinica_id: int):
-    itens = db.query(models.ItemStock).filter_by(clinica_id=clinica_id).all()
-    result = []
-    for item in itens:
-        quantidade_atual = get_quantidade_atual(db, item.id)
-        lotes = [schemas.ItemLoteResponse.model_validate(lote) for lote in item.lotes]
-        proximo_lote = get_proximo_lote(db, item.id)
-        result.append({
-            "id": item.id,
-            "clinica_id": item.clinica_id,
-            "nome": item.nome,
-            "descricao": item.descricao,
-            "quantidade_minima": item.quantidade_minima,
-            "tipo_medida": item.tipo_medida,
-            "fornecedor": item.fornecedor,
-            "ativo": item.ativo,
-            "quantidade_atual": quantidade_atual,
-            "lote_proximo": proximo_lote.lote if proximo_lote else None,
-            "validade_proxima": proximo_lote.validade if proximo_lote else None,
-            "lotes": lotes
-        })
-    return result
+def obter_item_stock_por_id(db: Session, item_id: int):
+    query, _ = _query_itens_stock(db)
+    row = query.filter(models.ItemStock.id == item_id).first()
+    if not row:
+        return None
+    return _item_stock_dict(*row)
+
+def listar_itens_stock(
+    db: Session,
+    clinica_id: int,
+    ativo: Optional[bool] = None,
+    abaixo_minimo: bool = False,
+    fornecedor: Optional[str] = None
+):
+    """
+    Lista os itens de uma clínica num número constante de queries.
+
+    Filtros opcionais: ativo/inativo, apenas itens abaixo da quantidade
+    mínima e fornecedor (pesquisa parcial, sem distinguir maiúsculas).
+    """
+    query, quantidade_atual = _query_itens_stock(db)
+    query = query.filter(models.ItemStock.clinica_id == clinica_id)
+    if ativo is not None:
+        query = query.filter(models.ItemStock.ativo == ativo)
+    if abaixo_minimo:
+        query = query.filter(quantidade_atual < models.ItemStock.quantidade_minima)
+    if fornecedor:
+        query = query.filter(models.ItemStock.fornecedor.ilike(f"%{fornecedor}%"))
+
+    rows = query.order_by(models.ItemStock.id).all()
+    return [_item_stock_dict(*row) for row in rows]
 
 def atualizar_item_stock(db: Session, item_id: int, item: schemas.ItemStockUpdate, user_id: int):
     db_item = db.query(models.ItemStock).filter_by(id=item_id).first()
@@ -82,35 +153,47 @@ def atualizar_item_stock(db: Session, item_id: int, item: schemas.ItemStockUpdat
 
 # --------- MOVIMENTO STOCK ---------
 def criar_movimento_stock(db: Session, movimento: schemas.MovimentoStockCreate):
+    """
+    Regista um movimento de stock. As alterações aos lotes e todos os
+    MovimentoStock gerados são gravados numa única transação: em caso de
+    erro (ex.: stock insuficiente) nada é alterado.
+    """
     item = db.query(models.ItemStock).filter_by(id=movimento.item_id).first()
     if not item:
         raise ValueError("Item de estoque não encontrado.")
 
-    if movimento.tipo_movimento == "entrada":
-        if not movimento.lote or not movimento.validade:
-            raise ValueError("Lote e validade são obrigatórios para entrada de estoque.")
-        entrada_lote(
-            db,
-            item_id=movimento.item_id,
-            lote=movimento.lote,
-            validade=movimento.validade,
-            quantidade=movimento.quantidade
-        )
-    elif movimento.tipo_movimento in ["saida", "ajuste"]:
-        saida_lote(
-            db,
-            item_id=movimento.item_id,
-            quantidade=movimento.quantidade
-        )
-    elif movimento.tipo_movimento == "transferencia":
-        transferencia(db, movimento, item)
-    else:
-        raise ValueError("Tipo de movimento inválido.")
+    try:
+        if movimento.tipo_movimento == "entrada":
+            if not movimento.lote or not movimento.validade:
+                raise ValueError("Lote e validade são obrigatórios para entrada de estoque.")
+            entrada_lote(
+                db,
+                item_id=movimento.item_id,
+                lote=movimento.lote,
+                validade=movimento.validade,
+                quantidade=movimento.quantidade,
+                commit=False
+            )
+        elif movimento.tipo_movimento in ["saida", "ajuste"]:
+            saida_lote(
+                db,
+                item_id=movimento.item_id,
+                quantidade=movimento.quantidade,
+                commit=False
+            )
+        elif movimento.tipo_movimento == "transferencia":
+            transferencia(db, movimento, item, commit=False)
+        else:
+            raise ValueError("Tipo de movimento inválido.")
+
+        mov_dict = movimento.dict(exclude={"lote", "validade","destino_id"})
+        db_mov = models.MovimentoStock(**mov_dict)
+        db.add(db_mov)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
 
-    mov_dict = movimento.dict(exclude={"lote", "validade","destino_id"})
-    db_mov = models.MovimentoStock(**mov_dict)
-    db.add(db_mov)
-    db.commit()
     db.refresh(db_mov)
     db.refresh(item)
 
@@ -158,58 +241,88 @@ def listar_item_filial(db: Session, item_id: int):
     return db.query(models.ItemFilial).filter_by(item_id=item_id).all()
 
 # --------- LOTES ---------
-def entrada_lote(db: Session, item_id: int, lote: str, validade: date, quantidade: int):
+def entrada_lote(db: Session, item_id: int, lote: str, validade: date, quantidade: int, commit: bool = True):
     lote = lote.upper()
-    item_lote = db.query(models.ItemLote).filter_by(item_id=item_id, lote=lote, validade=validade).first()
+    item_lote = db.query(models.ItemLote).filter_by(
+        item_id=item_id, lote=lote, validade=validade
+    ).with_for_update().first()
     if item_lote:
         item_lote.quantidade += quantidade
     else:
         item_lote = models.ItemLote(item_id=item_id, lote=lote, validade=validade, quantidade=quantidade)
         db.add(item_lote)
-    db.commit()
-    db.refresh(item_lote)
+    db.flush()
+    ajustar_saldo(db, item_id, quantidade)
+    if commit:
+        db.commit()
+        db.refresh(item_lote)
     return item_lote
 
-def saida_lote(db: Session, item_id: int, quantidade: int):
-    lotes = db.query(models.ItemLote).filter_by(item_id=item_id).order_by(models.ItemLote.validade).all()
+def alocar_fefo(db: Session, item_id: int, quantidade: int) -> List[Tuple[models.ItemLote, int]]:
+    """
+    Reserva `quantidade` de um item pelos lotes com validade mais próxima
+    (FEFO - first expiry, first out).
+
+    Os lotes com stock são bloqueados (SELECT ... FOR UPDATE, sempre pela
+    mesma ordem) até ao fim da transação, pelo que saídas concorrentes do
+    mesmo item são serializadas e nunca deixam stock negativo. A alocação é
+    calculada em memória; se o stock não chegar é lançado ValueError antes
+    de qualquer alteração. Devolve [(lote, quantidade_a_retirar)].
+    """
+    lotes = db.query(models.ItemLote).filter(
+        models.ItemLote.item_id == item_id,
+        models.ItemLote.quantidade > 0
+    ).order_by(
+        models.ItemLote.validade, models.ItemLote.id
+    ).with_for_update().all()
+
+    alocacao = []
     restante = quantidade
     for lote in lotes:
-        if lote.quantidade >= restante:
-            lote.quantidade -= restante
-            restante = 0
-            db.commit()
-            db.refresh(lote)
+        if restante <= 0:
             break
-        else:
-            restante -= lote.quantidade
-            lote.quantidade = 0
-            db.commit()
-            db.refresh(lote)
+        retirar = min(lote.quantidade, restante)
+        alocacao.append((lote, retirar))
+        restante -= retirar
     if restante > 0:
         raise ValueError("Estoque insuficiente nos lotes para a saída solicitada.")
+    return alocacao
+
+def saida_lote(db: Session, item_id: int, quantidade: int, commit: bool = True):
+    for lote, retirar in alocar_fefo(db, item_id, quantidade):
+        lote.quantidade -= retirar
+    db.flush()
+    ajustar_saldo(db, item_id, -quantidade)
+    if commit:
+        db.commit()
     return True
 
-def transferencia(db: Session, movimento: schemas.MovimentoStockCreate, item):
+def transferencia(db: Session, movimento: schemas.MovimentoStockCreate, item, commit: bool = True):
     if not movimento.destino_id:
         raise ValueError("Destino da transferência não informado.")
-    lotes_origem = db.query(models.ItemLote).filter_by(item_id=movimento.item_id).order_by(models.ItemLote.validade).all()
-    restante = movimento.quantidade
+    try:
+        alocacao = alocar_fefo(db, movimento.item_id, movimento.quantidade)
+    except ValueError:
+        raise ValueError("Estoque insuficiente para transferência.")
+
+    justificacao = movimento.justificacao or "Transferência"
+    movimentos = []
     lotes_transferidos = []
-    for lote in lotes_origem:
-        if restante <= 0:
-            break
-        transferir = min(lote.quantidade, restante)
+    for lote, transferir in alocacao:
         lote.quantidade -= transferir
-        lote_nome_upper = lote.lote.upper()
-        lote.lote = lote_nome_upper
-        lotes_transferidos.append((lote_nome_upper, lote.validade, transferir))
-        # Registra movimento de saída para cada lote
-        registrar_movimento_saida(db, item.id, transferir, movimento.utilizador_id, movimento.justificacao or "Transferência", lote.lote, lote.validade)
-        restante -= transferir
-        db.commit()
-        db.refresh(lote)
-    if restante > 0:
-        raise ValueError("Estoque insuficiente para transferência.")
+        lote.lote = lote.lote.upper()
+        lotes_transferidos.append((lote.lote, lote.validade, transferir))
+        # Movimento de saída para cada lote
+        movimentos.append({
+            "item_id": item.id,
+            "tipo_movimento": "saida",
+            "quantidade": transferir,
+            "utilizador_id": movimento.utilizador_id,
+            "justificacao": justificacao,
+        })
+
+    db.flush()
+    ajustar_saldo(db, item.id, -movimento.quantidade)
 
     item_destino = db.query(models.ItemStock).filter_by(nome=item.nome, clinica_id=movimento.destino_id).first()
     if not item_destino:
@@ -223,22 +336,26 @@ def transferencia(db: Session, movimento: schemas.MovimentoStockCreate, item):
             clinica_id=movimento.destino_id
         )
         db.add(item_destino)
-        db.commit()
-        db.refresh(item_destino)
+        db.flush()
 
     for lote_nome, validade, qtd in lotes_transferidos:
-        lote_nome = lote_nome.upper()
-        lote_destino = db.query(models.ItemLote).filter_by(item_id=item_destino.id, lote=lote_nome, validade=validade).first()
-        if lote_destino:
-            lote_destino.quantidade += qtd
-        else:
-            lote_destino = models.ItemLote(item_id=item_destino.id, lote=lote_nome, validade=validade, quantidade=qtd)
-            db.add(lote_destino)
+        entrada_lote(db, item_destino.id, lote_nome, validade, qtd, commit=False)
+        # Movimento de entrada para cada lote
+        movimentos.append({
+            "item_id": item_destino.id,
+            "tipo_movimento": "entrada",
+            "quantidade": qtd,
+            "utilizador_id": movimento.utilizador_id,
+            "justificacao": justificacao,
+        })
+
+    db.execute(insert(models.MovimentoStock), movimentos)
+
+    if commit:
         db.commit()
-        db.refresh(lote_destino)
-        # Registra movimento de entrada para cada lote
-        registrar_movimento_entrada(db, item_destino.id, qtd, movimento.utilizador_id, movimento.justificacao or "Transferência", lote_nome, validade)
-        
+    else:
+        db.flush()
+
 def registrar_movimento_entrada(db: Session, item_id: int, quantidade: int, user_id: int, justificacao: str, lote: str, validade: date):
     mov_entrada = models.MovimentoStock(
         item_id=item_id,
@@ -269,53 +386,284 @@ def registrar_movimento_saida(db: Session, item_id: int, quantidade: int, user_i
 def get_proximo_lote(db: Session, item_id: int):
     return db.query(models.ItemLote).filter_by(item_id=item_id).order_by(models.ItemLote.validade).first()
 
+def importar_entradas_stock(db: Session, clinica_id: int, linhas: List[dict], user_id: int) -> dict:
+    """
+    Importa várias entradas de stock (ex.: uma entrega de fornecedor) de uma vez.
+
+    Todas as linhas são validadas em conjunto (formato e itens da clínica,
+    carregados numa só query). Se alguma for inválida nada é gravado; caso
+    contrário os lotes são atualizados com um único INSERT ... ON CONFLICT,
+    os MovimentoStock inseridos em bloco e é registada uma única entrada de
+    auditoria, tudo na mesma transação. Devolve um relatório por linha.
+    """
+    resultados = []
+    validas = []
+    for numero, dados in enumerate(linhas, start=1):
+        try:
+            linha = schemas.EntradaStockLinha.model_validate(dados)
+        except ValidationError as e:
+            erro = "; ".join(
+                f"{'.'.join(str(loc) for loc in err['loc'])}: {err['msg']}" for err in e.errors()
+            )
+            resultados.append({"linha": numero, "item_id": dados.get("item_id"), "lote": dados.get("lote"), "estado": "erro", "erro": erro})
+            continue
+        resultados.append({"linha": numero, "item_id": linha.item_id, "lote": linha.lote, "estado": "importada", "erro": None})
+        validas.append((resultados[-1], linha))
+
+    item_ids = {linha.item_id for _, linha in validas}
+    itens = {
+        item.id: item
+        for item in db.query(models.ItemStock).filter(models.ItemStock.id.in_(item_ids)).all()
+    } if item_ids else {}
+    for resultado, linha in validas:
+        item = itens.get(linha.item_id)
+        if not item:
+            resultado.update(estado="erro", erro="Item de estoque não encontrado.")
+        elif item.clinica_id != clinica_id:
+            resultado.update(estado="erro", erro="Item não pertence a esta clínica.")
+
+    rejeitadas = sum(1 for r in resultados if r["estado"] == "erro")
+    if rejeitadas or not validas:
+        for resultado in resultados:
+            if resultado["estado"] == "importada":
+                resultado["estado"] = "nao_importada"
+        return {"total_linhas": len(resultados), "importadas": 0, "rejeitadas": rejeitadas, "resultados": resultados}
+
+    # Linhas do mesmo lote são somadas: o upsert não pode tocar a mesma linha duas vezes
+    por_lote: Dict[Tuple[int, str, date], int] = {}
+    deltas: Dict[int, int] = {}
+    movimentos = []
+    for _, linha in validas:
+        chave = (linha.item_id, linha.lote, linha.validade)
+        por_lote[chave] = por_lote.get(chave, 0) + linha.quantidade
+        deltas[linha.item_id] = deltas.get(linha.item_id, 0) + linha.quantidade
+        movimentos.append({
+            "item_id": linha.item_id,
+            "tipo_movimento": "entrada",
+            "quantidade": linha.quantidade,
+            "utilizador_id": user_id,
+            "justificacao": linha.justificacao,
+        })
+
+    try:
+        stmt = pg_insert(models.ItemLote).values([
+            {"item_id": item_id, "lote": lote, "validade": validade, "quantidade": quantidade}
+            for (item_id, lote, validade), quantidade in sorted(por_lote.items())
+        ])
+        db.execute(stmt.on_conflict_do_update(
+            constraint="uq_itemlote_item_lote_validade",
+            set_={"quantidade": models.ItemLote.quantidade + stmt.excluded.quantidade}
+        ))
+        ajustar_saldos(db, deltas)
+        db.execute(insert(models.MovimentoStock), movimentos)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    total_quantidade = sum(deltas.values())
+    registrar_auditoria(
+        db, user_id, "Entrada", "MovimentoStock", None,
+        f"Importação de {len(movimentos)} entrada(s) de stock ({total_quantidade} unidade(s)) em {len(deltas)} item(ns).",
+        clinica_id=clinica_id
+    )
+    return {"total_linhas": len(resultados), "importadas": len(movimentos), "rejeitadas": 0, "resultados": resultados}
+
+def ler_entradas_csv(conteudo: bytes) -> List[dict]:
+    """
+    Lê um CSV de entradas (separado por ',' ou ';', com cabeçalho
+    item_id, lote, validade, quantidade e, opcionalmente, justificacao).
+    """
+    try:
+        texto = conteudo.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise ValueError("O ficheiro CSV deve estar em UTF-8.")
+    try:
+        dialeto = csv.Sniffer().sniff(texto.split("\n", 1)[0], delimiters=",;")
+    except csv.Error:
+        dialeto = csv.excel
+    leitor = csv.DictReader(io.StringIO(texto), dialect=dialeto)
+    obrigatorias = {"item_id", "lote", "validade", "quantidade"}
+    colunas = {c.strip().lower() for c in (leitor.fieldnames or [])}
+    if not obrigatorias <= colunas:
+        raise ValueError(f"Colunas obrigatórias em falta: {', '.join(sorted(obrigatorias - colunas))}.")
+    return [
+        {(k or "").strip().lower(): (v.strip() if isinstance(v, str) else v) or None for k, v in row.items()}
+        for row in leitor
+    ]
+
+# --------- SALDOS ---------
+def reconciliar_saldos(db: Session, clinica_id: Optional[int] = None, corrigir: bool = False) -> List[dict]:
+    """
+    Compara o saldo materializado (ItemStockSaldo) de cada item com a soma
+    dos lotes e com o saldo calculado a partir do histórico de MovimentoStock
+    (entradas menos saídas/ajustes; as linhas "transferencia" são ignoradas
+    porque a transferência já regista uma saída por lote).
+
+    Devolve os itens em que o saldo materializado difere dos lotes ou os
+    movimentos diferem dos lotes. Com `corrigir=True` os saldos divergentes
+    são recalculados a partir dos lotes (fonte de verdade).
+    """
+    total_lotes = (
+        select(models.ItemLote.item_id, func.sum(models.ItemLote.quantidade).label("quantidade"))
+        .group_by(models.ItemLote.item_id)
+        .subquery()
+    )
+    total_movimentos = (
+        select(
+            models.MovimentoStock.item_id,
+            func.sum(case(
+                (models.MovimentoStock.tipo_movimento == "entrada", models.MovimentoStock.quantidade),
+                (models.MovimentoStock.tipo_movimento.in_(["saida", "ajuste"]), -models.MovimentoStock.quantidade),
+                else_=0
+            )).label("quantidade")
+        )
+        .group_by(models.MovimentoStock.item_id)
+        .subquery()
+    )
+    saldo = func.coalesce(models.ItemStockSaldo.quantidade, 0)
+    lotes = func.coalesce(total_lotes.c.quantidade, 0)
+    movimentos = func.coalesce(total_movimentos.c.quantidade, 0)
+
+    query = db.query(
+        models.ItemStock.id,
+        models.ItemStock.clinica_id,
+        models.ItemStock.nome,
+        saldo.label("saldo"),
+        lotes.label("lotes"),
+        movimentos.label("movimentos")
+    ).outerjoin(
+        models.ItemStockSaldo, models.ItemStockSaldo.item_id == models.ItemStock.id
+    ).outerjoin(
+        total_lotes, total_lotes.c.item_id == models.ItemStock.id
+    ).outerjoin(
+        total_movimentos, total_movimentos.c.item_id == models.ItemStock.id
+    ).filter(
+        (saldo != lotes) | (movimentos != lotes)
+    )
+    if clinica_id is not None:
+        query = query.filter(models.ItemStock.clinica_id == clinica_id)
+
+    divergencias = [
+        {
+            "item_id": row.id,
+            "clinica_id": row.clinica_id,
+            "nome": row.nome,
+            "saldo": row.saldo,
+            "lotes": row.lotes,
+            "movimentos": row.movimentos,
+        }
+        for row in query.order_by(models.ItemStock.id).all()
+    ]
+
+    a_corrigir = [d["item_id"] for d in divergencias if d["saldo"] != d["lotes"]]
+    if corrigir and a_corrigir:
+        recalculo = select(
+            models.ItemStock.id,
+            models.ItemStock.clinica_id,
+            func.coalesce(func.sum(models.ItemLote.quantidade), 0),
+            func.now()
+        ).outerjoin(
+            models.ItemLote, models.ItemLote.item_id == models.ItemStock.id
+        ).where(
+            models.ItemStock.id.in_(a_corrigir)
+        ).group_by(models.ItemStock.id)
+        stmt = pg_insert(models.ItemStockSaldo).from_select(
+            ["item_id", "clinica_id", "quantidade", "atualizado_em"], recalculo
+        )
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=[models.ItemStockSaldo.item_id],
+            set_={"quantidade": stmt.excluded.quantidade, "atualizado_em": stmt.excluded.atualizado_em}
+        ))
+        db.commit()
+
+    return divergencias
+
 # --------- ALERTAS DE STOCK ---------
+def verificar_alertas_stock_clinicas(db: Session, dias_por_clinica: Dict[int, int]) -> Dict[int, dict]:
+    """
+    Avalia os alertas de stock de várias clínicas de uma só vez.
+
+    `dias_por_clinica` indica, para cada clínica, quantos dias antes da
+    validade um lote deve ser alertado. São feitas duas queries (stock
+    baixo, a partir do saldo materializado, e lotes a expirar)
+    independentemente do número de clínicas e de itens. Devolve {clinica_id: {"itens_baixo_stock", "itens_expirando"}}.
+    """
+    resultado = {
+        clinica_id: {"itens_baixo_stock": [], "itens_expirando": []}
+        for clinica_id in dias_por_clinica
+    }
+    if not dias_por_clinica:
+        return resultado
+
+    clinica_ids = list(dias_por_clinica)
+    hoje = date.today()
+
+    # Stock baixo: saldo materializado comparado com a quantidade mínima
+    quantidade_atual = func.coalesce(models.ItemStockSaldo.quantidade, 0)
+    baixo_stock = db.query(
+        models.ItemStock.id,
+        models.ItemStock.clinica_id,
+        models.ItemStock.nome,
+        models.ItemStock.quantidade_minima,
+        models.ItemStock.tipo_medida,
+        quantidade_atual.label("quantidade_atual")
+    ).outerjoin(
+        models.ItemStockSaldo, models.ItemStockSaldo.item_id == models.ItemStock.id
+    ).filter(
+        models.ItemStock.clinica_id.in_(clinica_ids),
+        models.ItemStock.ativo == True,
+        quantidade_atual < models.ItemStock.quantidade_minima
+    ).order_by(models.ItemStock.id).all()
+
+    for row in baixo_stock:
+        resultado[row.clinica_id]["itens_baixo_stock"].append({
+            "id": row.id,
+            "nome": row.nome,
+            "quantidade_atual": row.quantidade_atual,
+            "quantidade_minima": row.quantidade_minima,
+            "tipo_medida": row.tipo_medida
+        })
+
+    # Lotes a expirar, com a data limite de cada clínica
+    data_limite = case(
+        {clinica_id: hoje + timedelta(days=dias) for clinica_id, dias in dias_por_clinica.items()},
+        value=models.ItemStock.clinica_id
+    )
+    lotes_expirando = db.query(
+        models.ItemStock.id,
+        models.ItemStock.clinica_id,
+        models.ItemStock.nome,
+        models.ItemStock.tipo_medida,
+        models.ItemLote.lote,
+        models.ItemLote.quantidade,
+        models.ItemLote.validade
+    ).join(
+        models.ItemLote, models.ItemLote.item_id == models.ItemStock.id
+    ).filter(
+        models.ItemStock.clinica_id.in_(clinica_ids),
+        models.ItemStock.ativo == True,
+        models.ItemLote.quantidade > 0,
+        models.ItemLote.validade >= hoje,
+        models.ItemLote.validade <= data_limite
+    ).order_by(models.ItemStock.id, models.ItemLote.validade).all()
+
+    for row in lotes_expirando:
+        resultado[row.clinica_id]["itens_expirando"].append({
+            "id": row.id,
+            "nome": row.nome,
+            "lote": row.lote,
+            "quantidade": row.quantidade,
+            "validade": row.validade,
+            "dias_restantes": (row.validade - hoje).days,
+            "tipo_medida": row.tipo_medida
+        })
+
+    return resultado
+
 def verificar_alertas_stock(db: Session, clinica_id: int, dias_expiracao: int = 30):
     """
     Verifica itens com stock baixo e itens com lotes a expirar.
     Retorna um dicionário com duas listas: itens_baixo_stock e itens_expirando.
     """
-    itens = db.query(models.ItemStock).filter_by(clinica_id=clinica_id, ativo=True).all()
-
-    itens_baixo_stock = []
-    itens_expirando = []
-    data_limite = date.today() + timedelta(days=dias_expiracao)
-
-    for item in itens:
-        quantidade_atual = get_quantidade_atual(db, item.id)
-
-        # Verificar stock baixo
-        if quantidade_atual < item.quantidade_minima:
-            itens_baixo_stock.append({
-                "id": item.id,
-                "nome": item.nome,
-                "quantidade_atual": quantidade_atual,
-                "quantidade_minima": item.quantidade_minima,
-                "tipo_medida": item.tipo_medida
-            })
-
-        # Verificar lotes a expirar
-        lotes_expirando = db.query(models.ItemLote).filter(
-            models.ItemLote.item_id == item.id,
-            models.ItemLote.quantidade > 0,
-            models.ItemLote.validade <= data_limite,
-            models.ItemLote.validade >= date.today()
-        ).all()
-
-        if lotes_expirando:
-            for lote in lotes_expirando:
-                dias_restantes = (lote.validade - date.today()).days
-                itens_expirando.append({
-                    "id": item.id,
-                    "nome": item.nome,
-                    "lote": lote.lote,
-                    "quantidade": lote.quantidade,
-                    "validade": lote.validade,
-                    "dias_restantes": dias_restantes,
-                    "tipo_medida": item.tipo_medida
-                })
-
-    return {
-        "itens_baixo_stock": itens_baixo_stock,
-        "itens_expirando": itens_expirando
-    }
\ No newline at end of file
+    return verificar_alertas_stock_clinicas(db, {clinica_id: dias_expiracao})[clinica_id]
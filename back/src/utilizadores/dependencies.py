@@ -1,8 +1,6 @@
-from datetime import datetime
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from sqlalchemy.orm import Session
-from src.utilizadores.jwt import verify_token
-from src.utilizadores.models import Utilizador, Sessao
+from src.utilizadores.principal import obter_principal
 from src.database import SessionLocal
 from fastapi.security import OAuth2PasswordBearer
 
@@ -16,29 +14,18 @@ def get_db():
         db.close()
 
 def get_current_user(
+    request: Request,
     token: str = Depends(oauth2_scheme),
     db: Session = Depends(get_db)
 ):
-    payload = verify_token(token)
-    user_id = int(payload.get("sub"))
+    # Sessão e utilizador já validados pelo middleware (ou pelo cache de principals)
+    principal = obter_principal(request, token)
 
-    # Verifique se a sessão está ativa e não expirada
-    sessao = db.query(Sessao).filter_by(token=token, utilizador_id=user_id, ativo=True).first()
-    if not sessao or sessao.data_expiracao < datetime.utcnow():
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Sessão expirada ou inválida."
-        )
-
-    utilizador = db.query(Utilizador).filter(Utilizador.id == user_id).first()
-    if not utilizador or not utilizador.ativo:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Utilizador não encontrado ou inativo."
-        )
-    return utilizador
+    # Anexa o utilizador em cache a esta sessão sem nova query
+    return db.merge(principal.utilizador, load=False)
 
 def get_current_user_with_clinic(
+    request: Request,
     token: str = Depends(oauth2_scheme),
     db: Session = Depends(get_db)
 ):
@@ -46,34 +33,17 @@ def get_current_user_with_clinic(
     Get current user along with their active clinic from the session.
     Returns tuple of (utilizador, clinica_id).
     """
-    payload = verify_token(token)
-    user_id = int(payload.get("sub"))
-
-    # Get clinic_id from JWT token if present
-    clinica_id = payload.get("clinica_id")
-
-    # Verify session is active and get clinic from session
-    sessao = db.query(Sessao).filter_by(token=token, utilizador_id=user_id, ativo=True).first()
-    if not sessao or sessao.data_expiracao < datetime.utcnow():
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Sessão expirada ou inválida."
-        )
+    principal = obter_principal(request, token)
 
     # Use clinic from session if available, otherwise from JWT
-    active_clinic_id = sessao.clinica_id or clinica_id
+    active_clinic_id = principal.sessao_clinica_id or principal.token_clinica_id
 
-    utilizador = db.query(Utilizador).filter(Utilizador.id == user_id).first()
-    if not utilizador or not utilizador.ativo:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Utilizador não encontrado ou inativo."
-        )
+    utilizador = db.merge(principal.utilizador, load=False)
 
     # If no active clinic, get user's first clinic as default
     if not active_clinic_id:
         from src.utilizadores.models import UtilizadorClinica
-        user_clinic = db.query(UtilizadorClinica).filter_by(utilizador_id=user_id, ativo=True).first()
+        user_clinic = db.query(UtilizadorClinica).filter_by(utilizador_id=principal.utilizador_id, ativo=True).first()
         if user_clinic:
             active_clinic_id = user_clinic.clinica_id
         else:
@@ -82,4 +52,4 @@ def get_current_user_with_clinic(
                 detail="Utilizador não tem acesso a nenhuma clínica."
             )
 
-    return utilizador, active_clinic_id
\ No newline at end of file
+    return utilizador, active_clinic_id
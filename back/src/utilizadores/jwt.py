@@ -7,8 +7,8 @@ from src.core.config import settings
 from src.utilizadores.models import Utilizador, UtilizadorClinica
 from src.database import SessionLocal
 from fastapi.security import OAuth2PasswordBearer
-from src.clinica.models import Clinica, ClinicaConfiguracao
-from sqlalchemy.orm import joinedload
+from src.clinica.models import Clinica
+from src.clinica.configuracoes import obter_configuracoes_clinicas
 
 
 
@@ -28,64 +28,28 @@ def get_token_duration_for_user(user_id: int, db: Session) -> int:
     4. Return the first valid duration found (parent clinics prioritized)
     
     Returns default duration if no configuration is found.
+    The user's clinics are read with one query; the configuration values
+    come from the in-process clinic configuration cache.
     """
-    default_duration = ACCESS_TOKEN_EXPIRE_MINUTES
-    
-    
-    user_clinicas = db.query(UtilizadorClinica).filter(
+    clinicas = db.query(Clinica.id, Clinica.clinica_pai_id).join(
+        UtilizadorClinica, UtilizadorClinica.clinica_id == Clinica.id
+    ).filter(
         UtilizadorClinica.utilizador_id == user_id
     ).all()
-    
-    if not user_clinicas:
-        print(f"No clinics found for user {user_id}, using default duration {default_duration}")
-        return default_duration
-    
-    clinic_ids = [uc.clinica_id for uc in user_clinicas]
-    
-    clinics = db.query(Clinica).filter(Clinica.id.in_(clinic_ids)).all()
-    
-    parent_clinic_ids = []
-    direct_clinic_ids = []
-    
-    for clinic in clinics:
-        if clinic.clinica_pai_id:
-            parent_clinic_ids.append(clinic.clinica_pai_id)
-        else:
-            direct_clinic_ids.append(clinic.id)
-    
-    all_clinic_ids = parent_clinic_ids + direct_clinic_ids
-    
-    if not all_clinic_ids:
-        print(f"No valid clinic IDs found for user {user_id}, using default duration {default_duration}")
-        return default_duration
-    
-    configs = db.query(ClinicaConfiguracao).filter(
-        ClinicaConfiguracao.clinica_id.in_(all_clinic_ids),
-        ClinicaConfiguracao.chave == "tempo_duracao_token"
-    ).all()
-    
-    if not configs:
-        print(f"No token duration configs found for clinics {all_clinic_ids}, using default duration {default_duration}")
-        return default_duration
-    
-    durations_by_clinic = {}
-    for config in configs:
-        try:
-            durations_by_clinic[config.clinica_id] = int(config.valor)
-        except (ValueError, TypeError):
-            print(f"Invalid token duration value in config: {config.valor}")
-    
-    for clinic_id in all_clinic_ids:
-        if clinic_id in durations_by_clinic:
-            duration = durations_by_clinic[clinic_id]
-            print(f"Using token duration {duration} minutes from clinic {clinic_id}")
-            return duration
-    
-    print(f"No valid duration found in configs, using default duration {default_duration}")
-    return default_duration
 
+    if not clinicas:
+        return ACCESS_TOKEN_EXPIRE_MINUTES
+
+    # Clinics with a parent first (they use the parent's configuration)
+    ordenadas = [c.id for c in clinicas if c.clinica_pai_id] + [c.id for c in clinicas if not c.clinica_pai_id]
+    configuracoes = obter_configuracoes_clinicas(db, ordenadas)
 
+    for clinica_id in ordenadas:
+        duracao = configuracoes[clinica_id].duracao_token()
+        if duracao is not None:
+            return duracao
 
+    return ACCESS_TOKEN_EXPIRE_MINUTES
 
 
 def create_access_token(data: dict, db: Session = None, user_id: int = None, expires_delta: timedelta = None, clinica_id: int = None):
@@ -0,0 +1,130 @@
+"""
+Principal autenticado de cada pedido.
+
+O token é validado uma única vez por pedido (no `AuditoriaContextMiddleware`)
+e o resultado fica em `request.state.principal`, onde as dependências
+`get_current_user`/`get_current_user_with_clinic` o vão buscar.
+
+Os principals resolvidos são guardados num cache TTL/LRU em memória,
+indexado pelo hash do token, para que pedidos seguintes com o mesmo token
+não voltem a consultar `Sessao` e `Utilizador`. As entradas expiram com a
+sessão e são invalidadas no logout, na suspensão do utilizador e quando a
+sessão muda de clínica.
+"""
+
+import hashlib
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+from fastapi import HTTPException, Request, status
+
+from src.core.cache import TTLCache
+from src.core.config import settings
+from src.database import SessionLocal
+from src.utilizadores.jwt import verify_token
+from src.utilizadores.models import Sessao, Utilizador
+
+
+@dataclass(frozen=True)
+class Principal:
+    token_hash: str
+    utilizador_id: int
+    # Instância desligada da sessão SQLAlchemy (apenas colunas carregadas)
+    utilizador: Utilizador
+    sessao_id: int
+    sessao_clinica_id: Optional[int]
+    token_clinica_id: Optional[int]
+    expira_em: datetime
+
+
+_cache = TTLCache(
+    max_entries=settings.AUTH_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.AUTH_CACHE_TTL_SECONDS,
+)
+
+
+def hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def resolver_principal(token: str) -> Principal:
+    """
+    Valida o token e devolve o principal correspondente.
+    Só consulta a base de dados (uma query) quando o token não está em cache.
+
+    Raises:
+        HTTPException 401 se o token ou a sessão forem inválidos,
+        403 se o utilizador estiver inativo.
+    """
+    payload = verify_token(token)
+    token_hash = hash_token(token)
+
+    principal = _cache.get(token_hash)
+    if principal is not None:
+        return principal
+
+    user_id = int(payload.get("sub"))
+
+    db = SessionLocal()
+    try:
+        resultado = (
+            db.query(Sessao, Utilizador)
+            .join(Utilizador, Utilizador.id == Sessao.utilizador_id)
+            .filter(
+                Sessao.token == token,
+                Sessao.utilizador_id == user_id,
+                Sessao.ativo == True
+            )
+            .first()
+        )
+    finally:
+        db.close()
+
+    agora = datetime.utcnow()
+    if not resultado or not resultado[0].data_expiracao or resultado[0].data_expiracao < agora:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Sessão expirada ou inválida."
+        )
+
+    sessao, utilizador = resultado
+    if not utilizador.ativo:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Utilizador não encontrado ou inativo."
+        )
+
+    principal = Principal(
+        token_hash=token_hash,
+        utilizador_id=user_id,
+        utilizador=utilizador,
+        sessao_id=sessao.id,
+        sessao_clinica_id=sessao.clinica_id,
+        token_clinica_id=payload.get("clinica_id"),
+        expira_em=sessao.data_expiracao,
+    )
+    _cache.set(token_hash, principal, ttl_seconds=(sessao.data_expiracao - agora).total_seconds())
+    return principal
+
+
+def obter_principal(request: Request, token: str) -> Principal:
+    """
+    Devolve o principal já resolvido pelo middleware para este pedido,
+    ou resolve-o agora (ex.: o middleware não conseguiu validar o token).
+    """
+    principal = getattr(request.state, "principal", None)
+    if principal is None or principal.token_hash != hash_token(token):
+        principal = resolver_principal(token)
+        request.state.principal = principal
+    return principal
+
+
+def invalidar_token(token: str) -> None:
+    """Remove do cache o principal associado a um token (ex.: logout)."""
+    _cache.delete(hash_token(token))
+
+
+def invalidar_utilizador(utilizador_id: int) -> None:
+    """Remove do cache todos os principals de um utilizador."""
+    _cache.delete_where(lambda _, principal: principal.utilizador_id == utilizador_id)
@@ -11,6 +11,7 @@ from src.utilizadores.utils import is_master_admin
 from datetime import datetime, timedelta
 from fastapi import Request
 from src.utilizadores.jwt import get_token_duration_for_user
+from src.utilizadores.principal import invalidar_token, invalidar_utilizador
 
 
 
@@ -67,9 +68,6 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depend
     expira_em = datetime.utcnow() + expires_delta
     service.criar_sessao(db, utilizador.id, token, expira_em, default_clinic_id)
 
-    # Log the token duration for debugging
-    print(f"Token created for user {utilizador.id} with duration of {token_duration_minutes} minutes, clinic: {default_clinic_id}")
-
     # Return the token response with user info
     return {
         "access_token": token,
@@ -113,6 +111,7 @@ def select_clinic(
         session.clinica_id = request.clinica_id
 
     db.commit()
+    invalidar_utilizador(current_user.id)
 
     return {
         "success": True,
@@ -148,6 +147,7 @@ def refresh_token(
         session.token = new_token
         session.data_expiracao = nova_data_expiracao
         db.commit()
+        invalidar_token(old_token)
     else:
         clinica_id = None
         user_clinica = db.query(models.UtilizadorClinica).filter(
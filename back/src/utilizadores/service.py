@@ -3,6 +3,7 @@ from sqlalchemy import func
 from fastapi import HTTPException, status
 from src.utilizadores import models, schemas, utils
 from src.utilizadores.utils import is_master_admin
+from src.utilizadores.principal import invalidar_token, invalidar_utilizador
 from src.auditoria.utils import registrar_auditoria
 from datetime import datetime, timedelta
 
@@ -211,6 +212,7 @@ def atualizar_utilizador(db: Session, user_id: int, dados: schemas.UtilizadorUpd
     utilizador.telefone = dados.telefone
     db.commit()
     db.refresh(utilizador)
+    invalidar_utilizador(user_id)
     registrar_auditoria(
         db,
         user_id,
@@ -231,6 +233,7 @@ def admin_atualizar_utilizador(db: Session, user_id: int, dados: schemas.Utiliza
         utilizador.ativo = dados.ativo
     db.commit()
     db.refresh(utilizador)
+    invalidar_utilizador(user_id)
     registrar_auditoria(
         db,
         admin_id,
@@ -249,6 +252,7 @@ def suspender_utilizador(db: Session, user_id: int, admin_id: int) -> models.Uti
     utilizador.ativo = False
     db.commit()
     db.refresh(utilizador)
+    invalidar_utilizador(user_id)
     registrar_auditoria(
         db, admin_id, "Suspensão", "Utilizador", user_id,
         f"Conta do utilizador {user_id} suspensa."
@@ -350,6 +354,7 @@ def logout(db: Session, utilizador_id: int, token: str):
         raise HTTPException(status_code=404, detail="Sessão não encontrada ou já encerrada.")
     sessao.ativo = False
     db.commit()
+    invalidar_token(token)
     from src.auditoria.utils import registrar_auditoria
     registrar_auditoria(
         db,
@@ -171,7 +171,9 @@ export function useAuditoria() {
       const blob = new Blob([response], {
         type: format === ExportFormat.EXCEL
           ? 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-          : 'application/pdf'
+          : format === ExportFormat.CSV
+            ? 'text/csv'
+            : 'application/pdf'
       });
 
       const url = window.URL.createObjectURL(blob);
@@ -179,7 +181,7 @@ export function useAuditoria() {
       link.href = url;
 
       const timestamp = new Date().toISOString().slice(0, 19).replace(/[:-]/g, '');
-      const extension = format === ExportFormat.EXCEL ? 'xlsx' : 'pdf';
+      const extension = format === ExportFormat.EXCEL ? 'xlsx' : format === ExportFormat.CSV ? 'csv' : 'pdf';
       link.download = `auditoria_export_${timestamp}.${extension}`;
 
       document.body.appendChild(link);
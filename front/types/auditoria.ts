@@ -50,6 +50,7 @@ export interface AuditoriaMetadata {
 
 export enum ExportFormat {
   EXCEL = "excel",
+  CSV = "csv",
   PDF = "pdf"
 }
 